@@ -0,0 +1,24 @@
+"""
+Headless core for the Arose Finance loan origination workflow.
+
+Modules in this package hold the business logic used by the Streamlit pages
+so it can be imported without rendering any UI:
+
+    criteria, values      compiled lender criteria and typed cell values
+    matching, flags,      lender scoring, hard-constraint prefilter and
+    ranges, batch         range queries, one client or a whole book at once
+    clients, backtest     historical client book and matcher backtests
+    learning              adjustment of matches from historical outcomes
+    pdf_text, page_cache  page-parallel PDF text and its per-page cache
+    extraction, prompts   KYC field extraction and verification, LLM
+    providers             prompts and token usage, and the OpenAI,
+                          Anthropic and local backends behind them
+    statements,           local rule-based bank statement and utility
+    utility_bills         bill parsers
+    kyc_batch, rate_limit unattended KYC runs over many client packs
+    transcripts           lender appetite from recorded call transcripts
+    search                offline search over transcripts and criteria notes
+    meeting_transcripts   question-set answers from client call transcripts
+    communication         lender application emails
+    app_store             persistent applications and per-step workflow state
+"""
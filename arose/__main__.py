@@ -0,0 +1,3 @@
+from arose.cli import main
+
+main()
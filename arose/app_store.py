@@ -0,0 +1,352 @@
+"""
+Persistent store for loan applications and the state of each workflow step.
+
+The Streamlit pages used to keep a case only in st.session_state, so a
+browser refresh lost it and two brokers could not work on the same one.
+ApplicationStore is the system of record instead: every application has an
+ID, and each workflow step has its own table keyed by that ID, with one
+column per section of the step (STEP_SCHEMAS), e.g. fact_find_data has
+meeting_details, client_profile, property_details and so on. Sections are
+stored as JSON text, so a step can be read back into the dict the pages
+already use.
+
+Writes are write-behind: write() only records the latest value of a section
+in memory, and a background thread flushes everything pending every
+flush_interval seconds in one transaction, one upsert per (application,
+step) row. A widget that triggers a rerun on every keystroke therefore costs
+one row write per interval rather than one per edit. Reads overlay the
+pending writes, so a caller always sees its own edits; flush() forces them
+out, e.g. before switching application.
+
+Backends are pluggable. SQLiteBackend (the default) keeps a small pool of
+connections to a WAL-mode database file, so the flusher and page reads don't
+block each other; SQLAlchemyBackend takes any SQLAlchemy URL and uses the
+engine's connection pool. The SQL is kept to what SQLite and PostgreSQL both
+accept (ON CONFLICT upserts).
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, time as time_of_day
+
+import numpy as np
+
+DEFAULT_STORE_PATH = "data/app_store.sqlite"
+DEFAULT_POOL_SIZE = 4
+DEFAULT_FLUSH_INTERVAL = 0.5
+
+
+@dataclass(frozen=True)
+class StepSchema:
+    """Table of one workflow step: its session state key and the sections stored as columns."""
+    name: str
+    sections: tuple
+
+
+# One table per workflow step, named after the session state key the pages use
+STEP_SCHEMAS = {schema.name: schema for schema in (
+    StepSchema("application_data", ("initial_call", "question_set", "personal_info", "loan_info", "follow_up")),
+    StepSchema("form_responses", ("personal_details", "property_details", "financial_details", "employment_details")),
+    StepSchema("fact_find_data", ("meeting_details", "client_profile", "property_details", "financial_situation",
+                                  "loan_requirements", "risk_profile", "additional_notes")),
+    StepSchema("broker_verification", ("verified", "edits_made", "approval_timestamp", "broker_notes")),
+    StepSchema("verified_profile", ("client_profile", "loan_requirements", "property_details", "financial_profile")),
+    StepSchema("lender_matching", ("matched_lenders", "research_matrix_results", "unstructured_criteria_results",
+                                   "final_probabilities")),
+    StepSchema("algorithm_learning", ("historical_outcomes", "learning_events", "algorithm_updates")),
+    StepSchema("lender_communication", ("emails_sent", "lender_responses", "feedback_collected", "template_updates")),
+    StepSchema("client_communication", ("email_template", "email_sent", "email_timestamp", "selected_offers")),
+)}
+
+_APPLICATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS applications (
+    application_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    created_at DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL
+)
+"""
+
+
+def _step_table(schema):
+    columns = "".join(f"    {section} TEXT,\n" for section in schema.sections)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {schema.name} (\n"
+        f"    application_id TEXT PRIMARY KEY REFERENCES applications (application_id),\n"
+        f"{columns}"
+        f"    updated_at DOUBLE PRECISION NOT NULL\n"
+        f")"
+    )
+
+
+def _to_json(value):
+    if isinstance(value, (datetime, date, time_of_day)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if hasattr(value, "to_dict"):
+        # pandas Series and DataFrames
+        return value.to_dict()
+    raise TypeError(f"Cannot store {type(value).__name__} values")
+
+
+def encode(value):
+    """JSON text a section is stored as; dates become ISO strings and numpy values plain numbers."""
+    return json.dumps(value, default=_to_json)
+
+
+class SQLiteBackend:
+    """A fixed pool of connections to one SQLite file in WAL mode."""
+    placeholder = "?"
+
+    def __init__(self, path=DEFAULT_STORE_PATH, pool_size=DEFAULT_POOL_SIZE):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection, committed on success and rolled back on error."""
+        conn = self._pool.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get().close()
+
+
+class SQLAlchemyBackend:
+    """Any database SQLAlchemy can reach, through the engine's connection pool."""
+
+    def __init__(self, url, pool_size=DEFAULT_POOL_SIZE):
+        import sqlalchemy
+
+        options = {} if url.startswith("sqlite") else {"pool_size": pool_size, "pool_pre_ping": True}
+        self.engine = sqlalchemy.create_engine(url, **options)
+        # The store's SQL is written with qmark parameters; rewrite them for format-style drivers
+        self.placeholder = "?" if self.engine.dialect.paramstyle == "qmark" else "%s"
+
+    @contextmanager
+    def connection(self):
+        conn = self.engine.raw_connection()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def close(self):
+        self.engine.dispose()
+
+
+def open_backend(url=None, pool_size=DEFAULT_POOL_SIZE):
+    """SQLiteBackend for None, a file path or a sqlite:/// URL; SQLAlchemyBackend for any other URL."""
+    if not url:
+        return SQLiteBackend(pool_size=pool_size)
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):], pool_size)
+    if "://" not in url:
+        return SQLiteBackend(url, pool_size)
+    return SQLAlchemyBackend(url, pool_size)
+
+
+class ApplicationStore:
+    """Applications and their per-step state, with write-behind batching of section writes."""
+
+    def __init__(self, backend, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        # (application_id, step) -> {section: JSON text}, the latest value of each unflushed section
+        self._pending = {}
+        # The batch flush() is writing, still overlaid on reads until its transaction commits
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        self.writes = 0
+        self.flushed_rows = 0
+        self.last_error = None
+        with self._connection() as (conn, sql):
+            conn.cursor().execute(sql(_APPLICATIONS_TABLE))
+            for schema in STEP_SCHEMAS.values():
+                conn.cursor().execute(sql(_step_table(schema)))
+
+    @contextmanager
+    def _connection(self):
+        """A pooled connection and a function turning the store's qmark SQL into the backend's paramstyle."""
+        placeholder = self.backend.placeholder
+        with self.backend.connection() as conn:
+            yield conn, (lambda statement: statement if placeholder == "?" else statement.replace("?", placeholder))
+
+    def create_application(self, name="", application_id=None):
+        """Add an application, under application_id if given (see new_application_id), and return its ID."""
+        application_id = application_id or new_application_id()
+        now = time.time()
+        with self._connection() as (conn, sql):
+            conn.cursor().execute(
+                sql("INSERT INTO applications (application_id, name, created_at, updated_at) VALUES (?, ?, ?, ?)"),
+                (application_id, name, now, now),
+            )
+        return application_id
+
+    def rename_application(self, application_id, name):
+        with self._connection() as (conn, sql):
+            conn.cursor().execute(sql("UPDATE applications SET name = ? WHERE application_id = ?"), (name, application_id))
+
+    def get_application(self, application_id):
+        """{application_id, name, created_at, updated_at}, or None for an unknown ID."""
+        with self._connection() as (conn, sql):
+            cursor = conn.cursor()
+            cursor.execute(
+                sql("SELECT application_id, name, created_at, updated_at FROM applications WHERE application_id = ?"),
+                (application_id,),
+            )
+            row = cursor.fetchone()
+        return dict(zip(("application_id", "name", "created_at", "updated_at"), row)) if row else None
+
+    def list_applications(self):
+        """Every application, most recently updated first."""
+        with self._connection() as (conn, sql):
+            cursor = conn.cursor()
+            cursor.execute("SELECT application_id, name, created_at, updated_at FROM applications ORDER BY updated_at DESC")
+            rows = cursor.fetchall()
+        return [dict(zip(("application_id", "name", "created_at", "updated_at"), row)) for row in rows]
+
+    def write(self, application_id, step, section, value):
+        """Queue the new value of one section; the flusher writes it within flush_interval seconds."""
+        schema = STEP_SCHEMAS[step]
+        if section not in schema.sections:
+            raise KeyError(f"{step} has no section {section!r}")
+        encoded = encode(value)
+        with self._lock:
+            self._pending.setdefault((application_id, step), {})[section] = encoded
+            self.writes += 1
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="app-store-flusher", daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # Left pending and retried on the next interval
+                self.last_error = e
+
+    def flush(self):
+        """Write every pending section now, one upsert per (application, step) row in a single transaction."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+            now = time.time()
+            try:
+                with self._connection() as (conn, sql):
+                    cursor = conn.cursor()
+                    for (application_id, step), sections in batch.items():
+                        columns = sorted(sections)
+                        cursor.execute(
+                            sql(f"INSERT INTO {step} (application_id, {', '.join(columns)}, updated_at) "
+                                f"VALUES ({', '.join('?' * (len(columns) + 2))}) "
+                                f"ON CONFLICT (application_id) DO UPDATE SET "
+                                f"{', '.join(f'{column} = excluded.{column}' for column in columns)}, "
+                                f"updated_at = excluded.updated_at"),
+                            (application_id, *(sections[column] for column in columns), now),
+                        )
+                    cursor.executemany(
+                        sql("UPDATE applications SET updated_at = ? WHERE application_id = ?"),
+                        [(now, application_id) for application_id in {key[0] for key in batch}],
+                    )
+            except Exception:
+                # Put the batch back under anything written since, which is newer
+                with self._lock:
+                    for key, sections in batch.items():
+                        self._pending[key] = {**sections, **self._pending.get(key, {})}
+                    self._inflight = {}
+                raise
+            with self._lock:
+                self._inflight = {}
+            self.flushed_rows += len(batch)
+            self.last_error = None
+            return len(batch)
+
+    def pending(self):
+        """Number of sections written but not yet flushed."""
+        with self._lock:
+            return sum(len(sections) for sections in self._pending.values())
+
+    def read(self, application_id, step):
+        """{section: value} of one step, with pending writes applied; None if nothing is stored."""
+        schema = STEP_SCHEMAS[step]
+        # Taken before the SELECT: a flush committing in between then only makes the row agree with it
+        with self._lock:
+            key = (application_id, step)
+            pending = {**self._inflight.get(key, {}), **self._pending.get(key, {})}
+        with self._connection() as (conn, sql):
+            cursor = conn.cursor()
+            cursor.execute(
+                sql(f"SELECT {', '.join(schema.sections)} FROM {step} WHERE application_id = ?"), (application_id,)
+            )
+            row = cursor.fetchone()
+        if row is None and not pending:
+            return None
+        stored = dict(zip(schema.sections, row or (None,) * len(schema.sections)))
+        stored.update(pending)
+        # SQL NULL marks a section never written, as opposed to a stored JSON null
+        return {section: json.loads(stored[section]) for section in schema.sections if stored[section] is not None}
+
+    def load(self, application_id):
+        """{step: {section: value}} of every step the application has data for."""
+        steps = {}
+        for step in STEP_SCHEMAS:
+            sections = self.read(application_id, step)
+            if sections is not None:
+                steps[step] = sections
+        return steps
+
+    def close(self):
+        """Stop the flusher, write what is pending and close the backend."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self.backend.close()
+
+
+def new_application_id():
+    """A fresh application ID, for an application not yet added to the store."""
+    return uuid.uuid4().hex[:12]
+
+
+def open_store(url=None, pool_size=DEFAULT_POOL_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+    """ApplicationStore over open_backend(url)."""
+    return ApplicationStore(open_backend(url, pool_size), flush_interval)
@@ -0,0 +1,286 @@
+"""
+Concurrent KYC extraction with AsyncOpenAI.
+
+All uploaded documents are extracted at once, bounded by an adaptive
+concurrency limit, each request with its own timeout and retried with
+jittered exponential backoff on timeouts, connection errors and server
+errors. A 429 halves the concurrency limit and waits as long as the
+response's rate-limit headers ask; with a rate_limit.RateLimiter, requests
+are paced to requests- and tokens-per-minute budgets so that 429s are rare
+in the first place (see rate_limit.py). Verification
+starts as soon as the first bank statement and utility bill have resolved,
+so a full KYC pass takes roughly as long as the slowest extraction plus the
+verification call rather than the sum of all calls.
+
+Documents longer than the chunk token budget are split (see chunking.py),
+their chunks extracted concurrently under the same limit, and the
+partial results merged and reconciled locally.
+
+Bank statements are first parsed locally (see statements.py). When the
+parser resolves every field the LLM is not called at all; otherwise it is
+asked only for the missing fields, and the locally parsed values take
+precedence over its answer.
+
+base_url points the client at any OpenAI-compatible server (e.g. a local
+mock); it defaults to the OPENAI_BASE_URL environment variable like the
+OpenAI client itself.
+"""
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+import openai
+from openai import AsyncOpenAI
+from openai._constants import DEFAULT_CONNECTION_LIMITS
+
+from arose.chunking import DEFAULT_CHUNK_TOKENS, chunk_text, count_tokens, merge_extractions
+from arose.extraction import DEFAULT_MODEL, KYC_PROMPT_PATH, load_prompt
+from arose.llm_cache import cache_key
+from arose.prompts import (CallUsage, chunk_extraction_prompt, extraction_prompt, missing_fields_prompt, usage_from_response,
+                           verification_prompt)
+from arose.rate_limit import AdaptiveConcurrency, retry_after
+from arose.statements import parse_statement
+
+BANK_STATEMENT = "bank statement"
+UTILITY_BILL = "utility bill"
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_RETRIES = 3
+
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_EXPIRY_SECONDS = 30
+
+# Completion tokens reserved against a tokens-per-minute budget before the real usage is known
+ESTIMATED_COMPLETION_TOKENS = 1000
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+@dataclass(frozen=True)
+class KYCDocument:
+    """One uploaded document: a display name, its type ("bank statement", "utility bill") and its text."""
+    name: str
+    document_type: str
+    text: str
+
+
+@dataclass
+class KYCResult:
+    """Extracted data per document name, the verification report, errors and elapsed ms per document or step."""
+    extracted: dict = field(default_factory=dict)
+    verification: dict = None
+    errors: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+
+
+def overlay_extraction(result, local):
+    """An LLM extraction result with every field the local parser resolved taking precedence."""
+    data = dict(result.get("extracted_data") or {})
+    data.update({key: value for key, value in local["extracted_data"].items() if value is not None})
+    missing = [name for name in result.get("missing_fields") or [] if data.get(name) is None]
+    return dict(
+        result,
+        extracted_data=data,
+        missing_fields=missing,
+        warnings=list(local["warnings"]) + list(result.get("warnings") or []),
+    )
+
+
+def backoff_delay(attempt, base=0.5, cap=20.0):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AsyncExtractor:
+    """
+    Shared client, adaptive concurrency limit, optional rate_limit.RateLimiter,
+    timeout and retry policy for a batch of LLM calls.
+    """
+
+    def __init__(self, api_key, model=DEFAULT_MODEL, base_url=None, concurrency=DEFAULT_CONCURRENCY,
+                 timeout=DEFAULT_TIMEOUT_SECONDS, max_retries=DEFAULT_MAX_RETRIES, cache=None,
+                 prompt_path=KYC_PROMPT_PATH, max_chunk_tokens=DEFAULT_CHUNK_TOKENS, usage_log=None,
+                 rate_limiter=None):
+        # One pooled transport sized to the concurrency limit, so every request in flight reuses a kept-alive connection.
+        # The limits take the type of the SDK's own defaults, whichever HTTP library the installed SDK is built on.
+        http_client = openai.DefaultAsyncHttpxClient(limits=type(DEFAULT_CONNECTION_LIMITS)(
+            max_connections=concurrency, max_keepalive_connections=concurrency, keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ))
+        # Retries are handled here, with jitter, rather than by the client
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+                                  http_client=http_client)
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+        self.max_chunk_tokens = max_chunk_tokens
+        self.usage_log = usage_log
+        self.rate_limiter = rate_limiter
+        self.system_prompt = load_prompt(prompt_path)
+        self._concurrency = AdaptiveConcurrency(concurrency)
+
+    async def complete_json(self, user_prompt):
+        key = cache_key(self.model, self.system_prompt, user_prompt)
+        if self.cache is not None:
+            started = time.perf_counter()
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                self._record(CallUsage(self.model, 0, 0, 0, (time.perf_counter() - started) * 1000, from_cache=True))
+                return cached
+
+        estimated_tokens = count_tokens(self.system_prompt + user_prompt, self.model) + ESTIMATED_COMPLETION_TOKENS
+        for attempt in range(self.max_retries + 1):
+            raw = None
+            reserved = False
+            try:
+                try:
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.acquire(estimated_tokens)
+                        reserved = True
+                    async with self._concurrency:
+                        started = time.perf_counter()
+                        raw = await asyncio.wait_for(
+                            self.client.chat.completions.with_raw_response.create(
+                                model=self.model,
+                                messages=[
+                                    {"role": "system", "content": self.system_prompt},
+                                    {"role": "user", "content": user_prompt}
+                                ],
+                                response_format={"type": "json_object"}
+                            ),
+                            self.timeout,
+                        )
+                        self._concurrency.on_success()
+                finally:
+                    # A failed attempt used none of the tokens it reserved; refund them before any
+                    # rate-limit headers below adjust the budget
+                    if reserved and raw is None:
+                        self.rate_limiter.settle(estimated_tokens, 0)
+                break
+            except openai.RateLimitError as e:
+                self._concurrency.on_rate_limited()
+                delay = retry_after(e.response.headers)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.update_from_headers(e.response.headers)
+                    if delay:
+                        self.rate_limiter.pause(delay)
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(delay or backoff_delay(attempt))
+            except RETRYABLE_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                # Sleep outside the concurrency limit so waiting retries don't hold a slot
+                await asyncio.sleep(backoff_delay(attempt))
+
+        response = raw.parse()
+        if self.rate_limiter is not None:
+            self.rate_limiter.update_from_headers(raw.headers)
+            self.rate_limiter.settle(estimated_tokens, response.usage.total_tokens if response.usage else None)
+        self._record(usage_from_response(self.model, response, (time.perf_counter() - started) * 1000))
+        result = json.loads(response.choices[0].message.content)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, key, result, self.model)
+        return result
+
+    def _record(self, call):
+        if self.usage_log is not None:
+            self.usage_log.record(call)
+
+    async def extract(self, document):
+        if document.document_type == BANK_STATEMENT:
+            parsed = await asyncio.to_thread(parse_statement, document.text)
+            local = parsed.to_extraction()
+            if not parsed.missing:
+                return local
+            return overlay_extraction(await self._extract_llm(document, parsed.missing), local)
+        return await self._extract_llm(document)
+
+    async def _extract_llm(self, document, fields=None):
+        chunks = chunk_text(document.text, self.max_chunk_tokens, self.model)
+        if len(chunks) <= 1:
+            if fields:
+                return await self.complete_json(missing_fields_prompt(document.text, document.document_type, fields))
+            return await self.complete_json(extraction_prompt(document.text, document.document_type))
+
+        partials = await asyncio.gather(*(
+            self.complete_json(chunk_extraction_prompt(chunk, document.document_type, part, len(chunks)))
+            for part, chunk in enumerate(chunks, start=1)
+        ))
+        return merge_extractions(partials)
+
+    async def verify(self, bank_statement_data, utility_bill_data, image_analyses=None):
+        return await self.complete_json(verification_prompt(bank_statement_data, utility_bill_data, image_analyses))
+
+    async def close(self):
+        await self.client.close()
+
+
+async def run_kyc_pipeline(extractor, documents, image_analyses=None, verify=True):
+    """
+    Extract every KYCDocument concurrently and, once the first bank statement
+    and utility bill are both extracted, verify them while any remaining
+    extractions finish. A failed document is recorded in KYCResult.errors
+    instead of cancelling the others.
+    """
+    result = KYCResult()
+    started = time.perf_counter()
+    tasks = {document.name: asyncio.create_task(extractor.extract(document)) for document in documents}
+
+    async def extracted(document):
+        try:
+            result.extracted[document.name] = await tasks[document.name]
+        except Exception as e:
+            result.errors[document.name] = str(e)
+        result.timings[document.name] = (time.perf_counter() - started) * 1000
+
+    async def verification():
+        pair = [
+            next((d for d in documents if d.document_type == t), None) for t in (BANK_STATEMENT, UTILITY_BILL)
+        ]
+        if None in pair:
+            return
+        try:
+            bank_statement_data, utility_bill_data = await asyncio.gather(*(tasks[d.name] for d in pair))
+            verify_started = time.perf_counter()
+            result.verification = await extractor.verify(bank_statement_data, utility_bill_data, image_analyses)
+            result.timings["verification"] = (time.perf_counter() - verify_started) * 1000
+        except Exception as e:
+            result.errors["verification"] = str(e)
+
+    steps = [extracted(document) for document in documents]
+    if verify:
+        steps.append(verification())
+    await asyncio.gather(*steps)
+    return result
+
+
+def extract_document_sync(text, document_type, api_key, **extractor_options):
+    """Extract a single document, chunking it if it is long; raises on failure."""
+    document = KYCDocument(document_type, document_type, text)
+    result = run_kyc_pipeline_sync([document], api_key, verify=False, **extractor_options)
+    if document.name in result.errors:
+        raise RuntimeError(result.errors[document.name])
+    return result.extracted[document.name]
+
+
+def run_kyc_pipeline_sync(documents, api_key, image_analyses=None, verify=True, **extractor_options):
+    """Blocking wrapper around run_kyc_pipeline for callers without an event loop (e.g. Streamlit pages)."""
+    async def main():
+        extractor = AsyncExtractor(api_key, **extractor_options)
+        try:
+            return await run_kyc_pipeline(extractor, documents, image_analyses, verify)
+        finally:
+            await extractor.close()
+
+    return asyncio.run(main())
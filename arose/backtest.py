@@ -0,0 +1,107 @@
+"""
+Backtest of the matcher against historical outcomes.
+
+Every client in the client book is replayed through the matcher and the
+rank of the lender that actually completed the deal is recorded. Accuracy is
+reported as hit@k and mean reciprocal rank (MRR), and speed as per-client
+latency and the throughput of a batch replay of the whole book. Results are
+plain JSON so a change to the ranking can be compared against a baseline run
+and only accepted if accuracy improves without speed regressing.
+"""
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from arose.batch import match_book
+
+DEFAULT_KS = (1, 3, 5, 10)
+
+# Relative slowdown tolerated before a run counts as a speed regression;
+# timings on a three-client book are noisy
+DEFAULT_SPEED_TOLERANCE = 0.25
+
+
+def _rank_of(ranking, lender_name):
+    """1-based position of a lender in a ranking DataFrame, or None if it was not ranked."""
+    positions = np.flatnonzero(ranking["lender_name"].to_numpy() == lender_name)
+    return int(positions[0]) + 1 if len(positions) else None
+
+
+def run_backtest(matcher, book, ks=DEFAULT_KS, repeat=5):
+    """
+    Replay a client book (list of clients.ClientRecord) through the matcher.
+
+    Each client is scored on its own repeat times to measure latency (the
+    best time is kept), then the whole book is scored as one batch for
+    throughput. Returns a JSON-serialisable dict of per-client results and
+    summary metrics.
+    """
+    clients = []
+    for record in book:
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            ranking = match_book(matcher, [record.client_data]).ranking(0)
+            latencies.append(time.perf_counter() - started)
+
+        rank = _rank_of(ranking, record.successful_match)
+        clients.append({
+            "client": record.name,
+            "expected": record.successful_match,
+            "rank": rank,
+            "score": float(ranking["match_percentage"].iloc[rank - 1]) if rank else None,
+            "top": ranking["lender_name"].head(max(ks)).tolist(),
+            "latency_ms": min(latencies) * 1000,
+        })
+
+    batch_times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        match_book(matcher, [record.client_data for record in book])
+        batch_times.append(time.perf_counter() - started)
+
+    ranks = [client["rank"] for client in clients]
+    latencies = np.array([client["latency_ms"] for client in clients])
+    metrics = {f"hit@{k}": float(np.mean([r is not None and r <= k for r in ranks])) for k in ks}
+    metrics["mrr"] = float(np.mean([1 / r if r else 0.0 for r in ranks]))
+    metrics["latency_ms_p50"] = float(np.percentile(latencies, 50))
+    metrics["latency_ms_p95"] = float(np.percentile(latencies, 95))
+    metrics["batch_ms"] = min(batch_times) * 1000
+    metrics["throughput_clients_per_s"] = len(book) / min(batch_times)
+
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "criteria_sha256": matcher.criteria.source_sha256,
+        "n_clients": len(book),
+        "n_lenders": len(matcher.matrix),
+        "metrics": metrics,
+        "clients": clients,
+    }
+
+
+def compare_results(current, baseline, speed_tolerance=DEFAULT_SPEED_TOLERANCE):
+    """
+    Check a backtest result against a baseline result.
+    Returns a list of human-readable regressions (empty if the run is acceptable).
+    """
+    problems = []
+    now, before = current["metrics"], baseline["metrics"]
+    for key in [key for key in before if key.startswith("hit@")] + ["mrr"]:
+        if key in now and now[key] < before[key]:
+            problems.append(f"{key} dropped from {before[key]:.3f} to {now[key]:.3f}")
+    for key in ("latency_ms_p50", "latency_ms_p95", "batch_ms"):
+        if key in now and key in before and now[key] > before[key] * (1 + speed_tolerance):
+            problems.append(f"{key} rose from {before[key]:.2f} to {now[key]:.2f}")
+    return problems
+
+
+def write_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def read_results(path):
+    with open(path, "r") as f:
+        return json.load(f)
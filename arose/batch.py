@@ -0,0 +1,40 @@
+"""
+Batch matching of a whole client book.
+
+Builds the lender matrix and flag index once, applies every client's hard
+constraints as bitset ANDs, then scores all clients against all lenders in
+one broadcast pass (see matching.score_clients).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from arose.flags import FlagIndex
+from arose.matching import build_lender_matrix, hard_constraint_columns, score_clients
+
+
+@dataclass(frozen=True)
+class Matcher:
+    """Everything derived from the criteria that scoring needs, built once per criteria version."""
+    criteria: object
+    matrix: object
+    flag_index: FlagIndex
+
+
+def build_matcher(criteria):
+    return Matcher(criteria=criteria, matrix=build_lender_matrix(criteria), flag_index=FlagIndex(criteria))
+
+
+def eligibility(matcher, clients):
+    """(clients, lenders) mask of the lenders passing each client's hard constraints."""
+    eligible = np.empty((len(clients), len(matcher.matrix)), dtype=bool)
+    for i, client_data in enumerate(clients):
+        bitset, _ = matcher.flag_index.prefilter(hard_constraint_columns(matcher.criteria.index, client_data))
+        eligible[i] = matcher.flag_index.to_mask(bitset)
+    return eligible
+
+
+def match_book(matcher, clients, prefilter=True):
+    """Score a list of client_data dicts against every lender as a ScoreMatrix."""
+    eligible = eligibility(matcher, clients) if prefilter else None
+    return score_clients(matcher.matrix, clients, eligible=eligible)
@@ -0,0 +1,225 @@
+"""
+Token-aware chunking and map-reduce merging for long documents.
+
+A long bank statement is split into chunks that fit a token budget, breaking
+between pages first, then between transaction blocks (a block starts at a
+line that begins with a date), then between lines. Each chunk is extracted
+separately and the partial results are merged deterministically in chunk
+order: the first value wins for most fields, the last for closing balances,
+transaction lists are concatenated (chunks never overlap, so a repeated
+transaction is a real one), other lists are concatenated without
+duplicates, and bank statement totals are then recomputed locally from the
+merged transactions.
+
+Tokens are counted with tiktoken; if its encoding files cannot be loaded
+(e.g. offline), a conservative characters-per-token estimate is used.
+"""
+import json
+import re
+from functools import lru_cache
+
+DEFAULT_ENCODING = "cl100k_base"
+DEFAULT_CHUNK_TOKENS = 3000
+
+# Separator extraction puts between PDF pages
+PAGE_SEPARATOR = "\f"
+
+# Fallback when no tokenizer is available; English text averages ~4
+_CHARS_PER_TOKEN = 3
+
+# "23 Nov", "06/12/2024", "2024-12-06", "6 December 2024" at the start of a line
+_DATE_LINE_PATTERN = re.compile(
+    r"^\s*(\d{1,2}\s*(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2})",
+    re.IGNORECASE,
+)
+
+# Fields taken from the last chunk that states them rather than the first
+_LAST_WINS_FIELDS = {"closing_balance", "end_balance"}
+_CONFIDENCE_ORDER = ("low", "medium", "high")
+
+
+@lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text, model=None):
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_lines(text, max_tokens, model):
+    """Pieces of text under max_tokens, breaking between lines (or inside an over-long line)."""
+    pieces, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while count_tokens(line, model) > max_tokens:
+            # A single line over budget: cut it at a proportional character offset
+            cut = max(1, len(line) * max_tokens // count_tokens(line, model))
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if current and count_tokens(current + line, model) > max_tokens:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def transaction_blocks(page_text):
+    """Split page text into blocks, starting a new block at every line that begins with a date."""
+    blocks, current = [], []
+    for line in page_text.splitlines(keepends=True):
+        if current and _DATE_LINE_PATTERN.match(line):
+            blocks.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("".join(current))
+    return blocks
+
+
+def iter_chunks(pages, max_tokens=DEFAULT_CHUNK_TOKENS, model=None):
+    """
+    Chunks of at most max_tokens tokens from an iterable of page texts,
+    keeping pages and then transaction blocks whole wherever they fit. A
+    chunk is yielded as soon as the next page would overflow it, so pages
+    can come from a generator that is still extracting later ones.
+    """
+    current = ""
+    for page in pages:
+        if count_tokens(page, model) <= max_tokens:
+            units = [page]
+        else:
+            units = []
+            for block in transaction_blocks(page):
+                if count_tokens(block, model) <= max_tokens:
+                    units.append(block)
+                else:
+                    units.extend(_split_lines(block, max_tokens, model))
+
+        for unit in units:
+            candidate = f"{current}\n{unit}" if current else unit
+            if current and count_tokens(candidate, model) > max_tokens:
+                yield current
+                candidate = unit
+            current = candidate
+    if current.strip():
+        yield current
+
+
+def chunk_text(text, max_tokens=DEFAULT_CHUNK_TOKENS, model=None):
+    """
+    Split document text into chunks of at most max_tokens tokens, keeping
+    pages (separated by PAGE_SEPARATOR) and then transaction blocks whole
+    wherever they fit.
+    """
+    return list(iter_chunks(text.split(PAGE_SEPARATOR), max_tokens, model))
+
+
+def _is_empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _merge_values(key, values):
+    present = [value for value in values if not _is_empty(value)]
+    if not present:
+        return values[0] if values else None
+    if all(isinstance(value, dict) for value in present):
+        keys = list(dict.fromkeys(k for value in present for k in value))
+        return {k: _merge_values(k, [value.get(k) for value in present]) for k in keys}
+    if all(isinstance(value, list) for value in present):
+        if key == "transactions":
+            return [item for value in present for item in value]
+        merged, seen = [], set()
+        for value in present:
+            for item in value:
+                identity = json.dumps(item, sort_keys=True, default=str)
+                if identity not in seen:
+                    seen.add(identity)
+                    merged.append(item)
+        return merged
+    if key == "extraction_confidence":
+        ranked = [value for value in present if value in _CONFIDENCE_ORDER]
+        return min(ranked, key=_CONFIDENCE_ORDER.index) if ranked else present[0]
+    return present[-1] if key in _LAST_WINS_FIELDS else present[0]
+
+
+def merge_extractions(partials):
+    """
+    Deterministically merge per-chunk extraction results (in chunk order)
+    into one result of the same shape.
+    """
+    if len(partials) == 1:
+        return partials[0]
+    merged = reconcile_bank_statement(_merge_values(None, list(partials)))
+
+    # A field is only missing if no chunk found it and it could not be computed
+    data = merged.get("extracted_data") or {}
+    missing = set.intersection(*(set(partial.get("missing_fields") or []) for partial in partials))
+    merged["missing_fields"] = [field for field in merged.get("missing_fields") or []
+                                if field in missing and _is_empty(data.get(field))]
+    return merged
+
+
+def _amount(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").replace("£", "").replace("$", "").strip())
+    except ValueError:
+        return None
+
+
+def reconcile_bank_statement(result):
+    """
+    Recompute total_deposits and total_withdrawals from the transactions of a
+    bank statement result and warn when the stated balances don't add up.
+    Results without transactions are returned unchanged.
+    """
+    data = result.get("extracted_data") or {}
+    transactions = data.get("transactions") or []
+    if not transactions:
+        return result
+
+    deposits = withdrawals = 0.0
+    for transaction in transactions:
+        amount = _amount(transaction.get("amount"))
+        if amount is None:
+            continue
+        kind = str(transaction.get("type") or "").lower()
+        if kind.startswith("debit") or (not kind.startswith("credit") and amount < 0):
+            withdrawals += abs(amount)
+        else:
+            deposits += abs(amount)
+
+    warnings = list(result.get("warnings") or [])
+    for field, computed in (("total_deposits", deposits), ("total_withdrawals", withdrawals)):
+        stated = _amount(data.get(field)) if data.get(field) is not None else None
+        if stated is not None and abs(stated - computed) > 0.005:
+            warnings.append(f"{field} stated as {stated:.2f} but transactions sum to {computed:.2f}; using the sum")
+        data[field] = round(computed, 2)
+
+    opening = _amount(data.get("opening_balance")) if data.get("opening_balance") is not None else None
+    closing = _amount(data.get("closing_balance")) if data.get("closing_balance") is not None else None
+    if opening is not None and closing is not None and abs(opening + deposits - withdrawals - closing) > 0.005:
+        warnings.append(
+            f"Opening balance {opening:.2f} + deposits {deposits:.2f} - withdrawals {withdrawals:.2f} "
+            f"does not equal closing balance {closing:.2f}; some transactions may be missing"
+        )
+
+    result["extracted_data"] = data
+    result["warnings"] = warnings
+    return result
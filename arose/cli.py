@@ -0,0 +1,145 @@
+"""
+Command line entry points, run as `python -m arose <command>`.
+
+    python -m arose match --clients data/client_match.csv --output scores.csv
+    python -m arose backtest --output backtest.json --baseline previous.json
+    python -m arose kyc packs/ --output data/kyc_results --workers 4 --rpm 60
+"""
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from arose.backtest import DEFAULT_SPEED_TOLERANCE, compare_results, read_results, run_backtest, write_results
+from arose.batch import build_matcher, match_book
+from arose.clients import DEFAULT_CLIENT_BOOK_PATH, load_client_book
+from arose.criteria import DEFAULT_CRITERIA_PATH, load_compiled_criteria
+
+
+def run_match(args):
+    started = time.perf_counter()
+    matcher = build_matcher(load_compiled_criteria(args.criteria))
+    book = load_client_book(args.clients)
+    scores = match_book(matcher, [record.client_data for record in book], prefilter=not args.no_prefilter)
+    elapsed = time.perf_counter() - started
+
+    for i, record in enumerate(book):
+        top = scores.ranking(i).head(args.top)
+        ranked = ", ".join(f"{row.lender_name} ({row.match_percentage:.0f}%)" for row in top.itertuples())
+        print(f"{record.name}: {ranked or 'no eligible lenders'}")
+
+    if args.output:
+        scores.to_frame([record.name for record in book]).to_csv(args.output, index_label="client")
+        print(f"Wrote {len(book)} x {len(scores.lender_names)} score matrix to {args.output}")
+    print(f"Scored {len(book)} clients against {len(scores.lender_names)} lenders in {elapsed * 1000:.1f} ms")
+
+
+def run_backtest_command(args):
+    matcher = build_matcher(load_compiled_criteria(args.criteria))
+    book = load_client_book(args.clients)
+    results = run_backtest(matcher, book, repeat=args.repeat)
+
+    for client in results["clients"]:
+        rank = client["rank"] if client["rank"] else "not ranked"
+        print(f"{client['client']}: {client['expected']} at rank {rank} ({client['latency_ms']:.2f} ms)")
+    print(", ".join(f"{key}={value:.3f}" for key, value in results["metrics"].items()))
+
+    if args.output:
+        write_results(results, args.output)
+        print(f"Wrote backtest results to {args.output}")
+
+    if args.baseline:
+        problems = compare_results(results, read_results(args.baseline), args.speed_tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+def run_kyc_command(args):
+    # Imported here so the match and backtest commands don't need the LLM and PDF stack
+    from arose.kyc_batch import BatchStore, load_packs, run_batch_sync
+    from arose.llm_cache import ResponseCache
+    from arose.page_cache import PageTextCache
+
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        sys.exit("OPENAI_API_KEY is not set (in the environment or .env)")
+
+    packs = load_packs(args.source)
+
+    def progress(record):
+        timings = record["timings"]
+        took = f" in {timings['total_ms'] / 1000:.1f} s" if timings.get("total_ms") else ""
+        print(f"{record['client']}: {record['status']}{took}")
+        for step, error in (record.get("errors") or {}).items():
+            print(f"  {step}: {error}")
+
+    # Options left unset fall back to the defaults of kyc_batch and async_extraction
+    options = {name: value for name, value in (
+        ("workers", args.workers), ("requests_per_minute", args.rpm), ("model", args.model), ("concurrency", args.concurrency),
+    ) if value is not None}
+    summary = run_batch_sync(
+        packs, api_key, BatchStore(args.output) if args.output else BatchStore(),
+        tokens_per_minute=args.tpm,
+        page_cache=PageTextCache(),
+        progress=progress,
+        base_url=args.base_url,
+        cache=None if args.no_cache else ResponseCache(),
+        **options,
+    )
+    print(f"{summary['packs']} packs: {summary['completed']} completed, {summary['failed']} failed, "
+          f"{summary['skipped']} already done, in {summary['wall_ms'] / 1000:.1f} s")
+    print("Median ms per pack: " + ", ".join(
+        f"{stage}={summary[f'p50_{stage}_ms']:.0f}" for stage in ("text", "extraction", "verification", "total")
+        if summary[f"p50_{stage}_ms"] is not None
+    ))
+    if summary["failed"]:
+        sys.exit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="arose", description="Arose Finance loan origination tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    match = commands.add_parser("match", help="Score a client book against every lender")
+    match.add_argument("--clients", default=DEFAULT_CLIENT_BOOK_PATH, help="client book CSV")
+    match.add_argument("--criteria", default=DEFAULT_CRITERIA_PATH, help="lender criteria CSV")
+    match.add_argument("--output", help="write the clients x lenders match percentages to this CSV")
+    match.add_argument("--top", type=int, default=5, help="lenders to print per client")
+    match.add_argument("--no-prefilter", action="store_true", help="score lenders failing hard constraints too")
+    match.set_defaults(handler=run_match)
+
+    backtest = commands.add_parser("backtest", help="Replay the client book and score the matcher's accuracy and speed")
+    backtest.add_argument("--clients", default=DEFAULT_CLIENT_BOOK_PATH, help="client book CSV")
+    backtest.add_argument("--criteria", default=DEFAULT_CRITERIA_PATH, help="lender criteria CSV")
+    backtest.add_argument("--output", help="write the results as JSON to this path")
+    backtest.add_argument("--baseline", help="earlier results JSON; exit 1 if accuracy or speed regressed")
+    backtest.add_argument("--repeat", type=int, default=5, help="timed runs per measurement")
+    backtest.add_argument("--speed-tolerance", type=float, default=DEFAULT_SPEED_TOLERANCE,
+                          help="relative slowdown allowed against the baseline")
+    backtest.set_defaults(handler=run_backtest_command)
+
+    kyc = commands.add_parser("kyc", help="Extract and verify a batch of client KYC document packs")
+    kyc.add_argument("source", help="directory with one sub-directory of PDFs per client, or a manifest CSV "
+                                    "with client, bank_statement and utility_bill columns")
+    kyc.add_argument("--output", help="directory for one result JSON per client")
+    kyc.add_argument("--workers", type=int, help="packs processed at once")
+    kyc.add_argument("--concurrency", type=int, help="LLM requests in flight at once")
+    kyc.add_argument("--rpm", type=float, help="LLM requests per minute")
+    kyc.add_argument("--tpm", type=float, help="LLM tokens per minute (default: no token budget)")
+    kyc.add_argument("--model", help="OpenAI model")
+    kyc.add_argument("--base-url", help="OpenAI-compatible API base URL")
+    kyc.add_argument("--no-cache", action="store_true", help="don't reuse cached LLM responses")
+    kyc.set_defaults(handler=run_kyc_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
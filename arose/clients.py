@@ -0,0 +1,113 @@
+"""
+Client book loader.
+
+data/client_match.csv uses the same two-row header as the lender criteria
+sheet, with one row per historical client: the client's name, the lender
+that completed the deal ("Succesful Match"), Y flags for the client's
+location, borrower, borrowing and security types, and the deal terms under
+the product section for the borrowing type. Free-text notes such as
+"Client A: ..." follow the client rows in the "Succesful Match" column.
+
+load_client_book turns each row into the client_data dict the matcher
+takes, so the whole book can be scored in one batch.
+"""
+import math
+import re
+from dataclasses import dataclass, field
+
+from arose.criteria import parse_header, read_criteria_csv
+from arose.matching import BORROWING_TYPE_SECTIONS, HARD_CONSTRAINT_SECTIONS
+from arose.values import GBP, NUMBER, PERCENT, parse_cell
+
+DEFAULT_CLIENT_BOOK_PATH = "data/client_match.csv"
+
+# Deal term fields as the client sheet names them
+CLIENT_LOAN_FIELDS = ("Loan Size", "Loan")
+CLIENT_LTGDV_FIELDS = ("Max LtGDV",)
+
+_NOTE_PATTERN = re.compile(r"^Client\s+(\S+?)\s*:\s*(.*)$", re.DOTALL)
+
+
+@dataclass(frozen=True)
+class ClientRecord:
+    """One historical client: its profile, the lender that completed the deal and any notes."""
+    name: str
+    successful_match: str
+    client_data: dict = field(hash=False)
+    notes: str = ""
+
+
+def _first_flagged(entries, row, section):
+    """Field of the first column in a section the client marked "Y"."""
+    for entry in entries:
+        if entry["section"] == section and row.get(entry["column"]) == "Y":
+            return entry["field"]
+    return None
+
+
+def _first_value(entries, row, section, fields, units):
+    """First cell under one of the fields in a section that parses to one of units."""
+    wanted = {f.lower() for f in fields}
+    for entry in entries:
+        if entry["section"] != section or entry["field"].lower() not in wanted:
+            continue
+        parsed = parse_cell(row.get(entry["column"]))
+        if parsed.unit in units and not math.isnan(parsed.value):
+            return parsed.value
+    return None
+
+
+def _first_ltv(entries, row, section):
+    """First percentage under an LTV-style field of a section, e.g. "LTV" or "2nd Charge Max LTV"."""
+    for entry in entries:
+        if entry["section"] != section or "ltv" not in entry["field"].lower():
+            continue
+        parsed = parse_cell(row.get(entry["column"]))
+        if parsed.unit == PERCENT:
+            return parsed.value
+    return None
+
+
+def client_data_from_row(entries, row):
+    """Build a matcher client_data dict from one client row keyed by column label."""
+    client_data = {}
+    for key, section in HARD_CONSTRAINT_SECTIONS.items():
+        value = _first_flagged(entries, row, section)
+        if value:
+            client_data[key] = value
+
+    section = BORROWING_TYPE_SECTIONS.get(client_data.get("borrowing_type"))
+    if section:
+        loan_amount = _first_value(entries, row, section, CLIENT_LOAN_FIELDS, (GBP, NUMBER))
+        ltv_ratio = _first_ltv(entries, row, section)
+        ltgdv_ratio = _first_value(entries, row, section, CLIENT_LTGDV_FIELDS, (PERCENT,))
+        if loan_amount is not None:
+            client_data["loan_amount"] = loan_amount
+        if ltv_ratio is not None:
+            client_data["ltv_ratio"] = ltv_ratio
+        if ltgdv_ratio is not None:
+            client_data["ltgdv_ratio"] = ltgdv_ratio
+    return client_data
+
+
+def load_client_book(csv_path=DEFAULT_CLIENT_BOOK_PATH):
+    """Read every client in a client book CSV as a list of ClientRecord."""
+    sections, fields, rows = read_criteria_csv(csv_path)
+    entries = parse_header(sections, fields)
+    name_column, match_column = fields[0], fields[1]
+
+    clients = []
+    notes = {}
+    for values in rows:
+        row = {label: (values[i].strip() if i < len(values) else "") for i, label in enumerate(fields)}
+        if not row[name_column]:
+            match = _NOTE_PATTERN.match(row[match_column])
+            if match:
+                notes[match.group(1)] = match.group(2).strip()
+            continue
+        clients.append((row[name_column], row[match_column], client_data_from_row(entries, row)))
+
+    return [
+        ClientRecord(name=name, successful_match=lender, client_data=client_data, notes=notes.get(name, ""))
+        for name, lender, client_data in clients
+    ]
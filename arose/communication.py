@@ -0,0 +1,94 @@
+"""
+Lender communication: bespoke application emails for matched lenders.
+"""
+
+
+def generate_email_template(lender, client_profile, loan_requirements, property_details, financial_profile):
+    """
+    Email submitting the client's application to one lender. lender is a
+    lender name or a row/dict with a "Lender" key; the profile arguments are
+    the sections of the verified client profile.
+    """
+    # Get lender name
+    lender_name = lender if isinstance(lender, str) else lender["Lender"]
+
+    # Generate salutation
+    salutation = f"Dear {lender_name} Team,"
+
+    # Generate introduction
+    introduction = f"""
+    I am writing to submit a loan application for my client, {client_profile.get('first_name', '')} {client_profile.get('last_name', '')},
+    who is seeking a {loan_requirements.get('loan_purpose', '')} loan for a {property_details.get('property_type', '')} property.
+    """
+
+    # Generate client profile section
+    client_section = f"""
+    ## Client Profile
+    - Name: {client_profile.get('first_name', '')} {client_profile.get('last_name', '')}
+    - Credit Score: {financial_profile.get('credit_score', '')}
+    - Employment: {financial_profile.get('employment_status', '')} at {financial_profile.get('employer_name', '')} for {financial_profile.get('years_employed', '')} years
+    - Annual Income: ${financial_profile.get('annual_income', 0):,}
+    """
+
+    # Generate loan details section
+    loan_section = f"""
+    ## Loan Requirements
+    - Loan Purpose: {loan_requirements.get('loan_purpose', '')}
+    - Loan Amount: ${loan_requirements.get('loan_amount', 0):,}
+    - Down Payment: ${loan_requirements.get('down_payment', 0):,}
+    - Preferred Term: {loan_requirements.get('loan_term_preference', '')}
+    """
+
+    # Generate property details section
+    property_section = f"""
+    ## Property Details
+    - Property Type: {property_details.get('property_type', '')}
+    - Property Value: ${property_details.get('property_value', 0):,}
+    - Property Use: {property_details.get('property_use', '')}
+    - Property Condition: {property_details.get('property_condition', '')}
+    """
+
+    # Generate lender-specific section
+    lender_specific = ""
+    if "Prime" in lender_name:
+        lender_specific = """
+        Based on your premium loan program requirements, I believe this client is an excellent match due to their strong credit profile and stable employment history.
+        """
+    elif "Standard" in lender_name:
+        lender_specific = """
+        Your standard loan program appears to be a good fit for this client's needs, offering competitive rates and suitable terms.
+        """
+    elif "Flexible" in lender_name:
+        lender_specific = """
+        Your flexible loan program would be ideal for this client, providing the adaptability needed for their specific situation.
+        """
+    elif "Bank" in lender_name:
+        lender_specific = """
+        As a valued banking partner, I believe your loan products would be well-suited for this client's financial profile and property requirements.
+        """
+    elif "Credit Union" in lender_name:
+        lender_specific = """
+        Your member-focused approach and competitive rates would be beneficial for this client's loan needs.
+        """
+    elif "Specialist" in lender_name:
+        lender_specific = """
+        Given your expertise in specialized lending scenarios, I believe you could offer optimal terms for this client's unique situation.
+        """
+
+    # Generate closing
+    closing = """
+    I have attached all relevant documentation for your review. Please let me know if you require any additional information.
+
+    I look forward to your response regarding this application. You can reply directly to this email with your decision or questions.
+
+    Thank you for your consideration.
+
+    Best regards,
+    [Broker Name]
+    Arose Finance
+    """
+
+    # Combine all sections
+    full_template = f"{salutation}\n\n{introduction}\n\n{client_section}\n\n{loan_section}\n\n{property_section}\n\n{lender_specific}\n\n{closing}"
+
+    return full_template
@@ -0,0 +1,270 @@
+"""
+Lender criteria compiler.
+
+data/lender_criteria.csv is a wide sheet with a two-row header (section row
+above field row). Parsing it on every Streamlit rerun is wasteful, so the
+compiled result is kept in memory for the lifetime of the process and the
+CSV is compiled again only when its modification time or size changes. At
+the sheet's size compiling takes about as long as reading it back from a
+Parquet copy would, so nothing is written to disk.
+
+The header is parsed hierarchically: every column is filed under its product
+section (e.g. "Regulated Bridging") and a normalised field name, so lookups
+such as ("Unregulated Development Finance", "Max LTV") resolve to the right
+column instead of the first one whose label happens to contain "Max LTV".
+
+Numeric columns are normalised at compile time (see values.py) into a float
+table in each column's dominant unit plus a table of Net/Gross qualifiers,
+so matching reads typed values and never parses cell strings.
+
+with_overrides layers per-lender cell values over the compiled criteria,
+e.g. appetite a lender stated on a call (see transcripts.py), so the matcher
+can be built from the sheet as amended.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import cached_property
+
+import pandas as pd
+
+from arose.values import FLAG_VALUES, PERCENT, column_unit, parse_cell, typed_column
+
+DEFAULT_CRITERIA_PATH = "data/lender_criteria.csv"
+
+# Section headers that subdivide the preceding product rather than start a new one
+SUBSECTIONS = {"Valuation Methodologies", "Valuation Methodology"}
+
+# The sheet disambiguates repeated field labels with a running number glued to
+# the end ("Min Loan30", "Max LTV57"); labels like "Grade 2" keep their space
+_SUFFIX_PATTERN = re.compile(r"^(.*[^\s\d])(\d+)$")
+
+_memory_cache = {}
+
+
+class CriteriaIndex:
+    """Product section -> normalised field -> column lookup."""
+
+    def __init__(self, schema):
+        self._sections = {}
+        for entry in schema:
+            if entry["kind"] == "name":
+                continue
+            fields = self._sections.setdefault(entry["section"], {})
+            fields.setdefault(entry["field"].lower(), entry)
+
+    @property
+    def sections(self):
+        return tuple(self._sections)
+
+    def fields(self, section):
+        """Schema entries of one section, in sheet order."""
+        return tuple(self._sections.get(section, {}).values())
+
+    def column(self, section, field):
+        """Column label for a section's field, or None if the sheet has no such field."""
+        entry = self._sections.get(section, {}).get(field.lower())
+        return entry["column"] if entry else None
+
+    def find(self, section, *fields):
+        """Column label of the first of several alternative field names present in a section."""
+        return next((col for col in (self.column(section, field) for field in fields) if col), None)
+
+
+@dataclass(frozen=True)
+class CompiledCriteria:
+    """Lender criteria as compiled from the CSV.
+
+    frame holds one row per lender with the original field labels as
+    columns. values holds the numeric columns as floats in the unit recorded
+    in their schema entry, and qualifiers the matching "net"/"gross"
+    qualifier of each cell. schema lists one entry per column (see
+    parse_header) with its kind ("name", "flag" or "text") and unit; index
+    resolves section/field pairs to columns. The frames are shared between
+    callers and must be treated as read-only.
+    """
+    frame: pd.DataFrame
+    values: pd.DataFrame
+    qualifiers: pd.DataFrame
+    schema: tuple
+    source_sha256: str
+
+    @cached_property
+    def index(self):
+        return CriteriaIndex(self.schema)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_criteria_csv(csv_path):
+    """
+    Read a two-row-header criteria CSV.
+    Returns (sections, fields, rows) where sections is forward-filled so every
+    field knows which section it belongs to.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        section_row = next(reader)
+        field_row = next(reader)
+        rows = [row for row in reader if any(cell.strip() for cell in row)]
+
+    sections = []
+    current = ""
+    for cell in section_row:
+        if cell.strip():
+            current = cell.strip()
+        sections.append(current)
+
+    fields = [field.strip() for field in field_row]
+    return sections, fields, rows
+
+
+def parse_header(sections, fields):
+    """
+    Build the hierarchical column index for a two-row header.
+
+    Returns one dict per column with the product section it belongs to, the
+    raw section header it sat under (group), the field name with the sheet's
+    numeric disambiguation suffix removed, and its position.
+    """
+    entries = []
+    seen = set()
+    section = ""
+    for position, (group, label) in enumerate(zip(sections, fields)):
+        if group not in SUBSECTIONS or not section:
+            section = group
+
+        field = label
+        match = _SUFFIX_PATTERN.match(label)
+        if match and match.group(1).lower() in seen:
+            field = match.group(1)
+        seen.add(label.lower())
+
+        entries.append({
+            "column": label,
+            "section": section,
+            "group": group,
+            "field": field,
+            "position": position,
+        })
+    return entries
+
+
+def _column_kind(values):
+    present = {value for value in values if value is not None}
+    if present and present <= FLAG_VALUES.keys():
+        return "flag"
+    return "text"
+
+
+def compile_criteria(csv_path=DEFAULT_CRITERIA_PATH):
+    """
+    Parse the criteria CSV into (frame, values, qualifiers, schema).
+
+    In frame blank cells become None and everything else is kept as the
+    stripped string. Every text column with numbers in it also gets a float
+    column in values, expressed in the column's dominant unit.
+    """
+    sections, fields, rows = read_criteria_csv(csv_path)
+
+    columns = {}
+    for position, field in enumerate(fields):
+        values = [row[position].strip() if position < len(row) else "" for row in rows]
+        columns[field] = [value if value else None for value in values]
+
+    schema = parse_header(sections, fields)
+    values = {}
+    qualifiers = {}
+    for entry in schema:
+        column = entry["column"]
+        entry["kind"] = "name" if entry["position"] == 0 else _column_kind(columns[column])
+        entry["unit"] = None
+        if entry["kind"] != "text":
+            continue
+
+        parsed = [parse_cell(cell) for cell in columns[column]]
+        unit = column_unit(parsed)
+        if unit is None:
+            continue
+        entry["unit"] = unit
+        values[column] = typed_column(parsed, unit)
+        qualifiers[column] = [cell.qualifier for cell in parsed]
+
+    frame = pd.DataFrame(columns, columns=fields)
+    values = pd.DataFrame(values, columns=list(values), dtype=float)
+    qualifiers = pd.DataFrame(qualifiers, columns=list(qualifiers), dtype=object)
+    return frame, values, qualifiers, schema
+
+
+def load_compiled_criteria(csv_path=DEFAULT_CRITERIA_PATH):
+    """
+    Load lender criteria, compiling the CSV only when it has changed.
+
+    The result is cached in memory under the file's path, modification time
+    and size, so reruns cost one stat and an edited sheet is compiled afresh.
+    """
+    stat = os.stat(csv_path)
+    stat_key = (os.path.abspath(csv_path), stat.st_mtime_ns, stat.st_size)
+    if stat_key in _memory_cache:
+        return _memory_cache[stat_key]
+
+    frame, values, qualifiers, schema = compile_criteria(csv_path)
+    compiled = CompiledCriteria(
+        frame=frame,
+        values=values,
+        qualifiers=qualifiers,
+        schema=tuple(schema),
+        source_sha256=_file_sha256(csv_path),
+    )
+
+    # Only the latest version of each file is worth keeping in memory
+    for key in [key for key in _memory_cache if key[0] == stat_key[0]]:
+        del _memory_cache[key]
+    _memory_cache[stat_key] = compiled
+    return compiled
+
+
+def with_overrides(criteria, overrides):
+    """
+    CompiledCriteria with cells replaced per lender, from {lender name:
+    {column: value}}. Flag columns take the value as text and numeric columns
+    as a float in the column's unit; unknown lenders and columns are skipped.
+    source_sha256 covers the overrides, so caches keyed on it tell the
+    amended criteria apart.
+    """
+    name_column = next(entry["column"] for entry in criteria.schema if entry["kind"] == "name")
+    rows = {name: row for row, name in enumerate(criteria.frame[name_column].astype(str))}
+    entries = {entry["column"]: entry for entry in criteria.schema if entry["kind"] != "name"}
+    frame, values = criteria.frame.copy(), criteria.values.copy()
+    applied = {}
+    for lender, cells in overrides.items():
+        row = rows.get(lender)
+        if row is None:
+            continue
+        for column, value in cells.items():
+            entry = entries.get(column)
+            if entry is None:
+                continue
+            if column in values.columns:
+                value = float(value)
+                values.iloc[row, values.columns.get_loc(column)] = value
+                text = f"{value:g}%" if entry["unit"] == PERCENT else f"{value:g}"
+            else:
+                text = str(value)
+            frame.iloc[row, frame.columns.get_loc(column)] = text
+            applied.setdefault(lender, {})[column] = value
+    if not applied:
+        return criteria
+
+    digest = hashlib.sha256(criteria.source_sha256.encode("utf-8"))
+    digest.update(json.dumps(applied, sort_keys=True).encode("utf-8"))
+    return CompiledCriteria(frame, values, criteria.qualifiers, criteria.schema, digest.hexdigest())
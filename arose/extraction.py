@@ -0,0 +1,90 @@
+"""
+KYC document extraction and verification.
+
+PDF text extraction, extraction of structured fields from bank statements
+and utility bills, cross-document verification, and flattening of the
+extracted JSON for display. Nothing here touches Streamlit; callers pass
+the API key explicitly, and optionally a llm_cache.ResponseCache so a
+repeat request for the same document, prompt and model is answered from
+disk instead of the API.
+
+Extraction and verification go to OpenAI unless a provider from
+providers.py is passed, e.g. the local rule-based backend or a router that
+only falls back to an LLM when the local result isn't confident enough.
+"""
+import pandas as pd
+
+from arose.chunking import PAGE_SEPARATOR
+from arose.pdf_text import iter_pdf_pages
+from arose.prompts import REGISTRY
+from arose.providers import DEFAULT_OPENAI_MODEL, OpenAIProvider
+
+KYC_PROMPT_PATH = "prompts/kyc_documents_prompt.md"
+DEFAULT_MODEL = DEFAULT_OPENAI_MODEL
+
+
+def extract_text_from_pdf(pdf_file, cache=None):
+    """
+    Text of every page of an uploaded PDF (anything with getvalue(), e.g. a
+    Streamlit upload). With a page_cache.PageTextCache, pages already
+    extracted from the same bytes are not parsed again.
+    """
+    return _pdf_text(pdf_file.getvalue(), cache)
+
+
+def extract_text_from_pdf_path(file_path, cache=None):
+    """Text of every page of the PDF at file_path, pages separated by PAGE_SEPARATOR."""
+    if cache is None:
+        return PAGE_SEPARATOR.join(iter_pdf_pages(file_path))
+    with open(file_path, 'rb') as file:
+        return _pdf_text(file.read(), cache)
+
+
+def _pdf_text(data, cache):
+    pages = cache.document_pages(data) if cache is not None else list(iter_pdf_pages(data))
+    return PAGE_SEPARATOR.join(pages)
+
+
+def load_prompt(prompt_path=KYC_PROMPT_PATH):
+    return REGISTRY.get(prompt_path)
+
+
+def extract_data_with_openai(text, document_type, api_key=None, model=DEFAULT_MODEL, prompt_path=KYC_PROMPT_PATH,
+                             cache=None, usage_log=None, provider=None):
+    """
+    Structured fields of a document ("bank statement", "utility bill") as a
+    dict, from provider (see providers.py) or, by default, OpenAI.
+    """
+    provider = provider or OpenAIProvider(api_key, model, cache, usage_log)
+    return provider.extract(text, document_type, load_prompt(prompt_path))
+
+
+def verify_documents(bank_statement_data, utility_bill_data, image_analyses=None, api_key=None,
+                     model=DEFAULT_MODEL, prompt_path=KYC_PROMPT_PATH, cache=None, usage_log=None, provider=None):
+    """Verification report (see prompts.verification_prompt for its structure) as a dict."""
+    provider = provider or OpenAIProvider(api_key, model, cache, usage_log)
+    return provider.verify(bank_statement_data, utility_bill_data, image_analyses, load_prompt(prompt_path))
+
+
+def json_to_df(json_data):
+    """Convert JSON data to a pandas DataFrame for display"""
+    # Flatten the JSON if it's nested
+    flat_data = {}
+
+    def flatten(data, prefix=""):
+        if isinstance(data, dict):
+            for key, value in data.items():
+                new_key = f"{prefix}{key}" if prefix else key
+                if isinstance(value, (dict, list)) and not isinstance(value, str):
+                    flatten(value, f"{new_key}.")
+                else:
+                    flat_data[new_key] = value
+        elif isinstance(data, list) and not isinstance(data, str):
+            for i, item in enumerate(data):
+                flatten(item, f"{prefix}[{i}].")
+
+    flatten(json_data)
+
+    # Convert to DataFrame
+    df = pd.DataFrame(flat_data.items(), columns=["Field", "Value"])
+    return df
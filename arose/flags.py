@@ -0,0 +1,71 @@
+"""
+Inverted index over the Y/N criteria flags.
+
+Most criteria columns are flags (regions, borrower types, borrowing types,
+security types). The index maps every (column, value) pair to a packed
+bitset of lenders, so hard eligibility constraints reduce to bitwise ANDs
+over a few bytes per thousand lenders before any numeric scoring runs.
+"""
+import numpy as np
+
+# Flag values that rule a lender out; blanks, "M" (maybe) and "TBC" do not
+REJECT_VALUES = ("N", "N/A")
+
+
+class FlagIndex:
+    """(column, value) -> packed lender bitset for every flag column."""
+
+    def __init__(self, criteria):
+        frame = criteria.frame
+        name_column = next(entry["column"] for entry in criteria.schema if entry["kind"] == "name")
+        self.names = frame[name_column].astype(str).to_numpy()
+        self.n_lenders = len(frame)
+        self._all = np.packbits(np.ones(self.n_lenders, dtype=bool))
+        self._none = np.zeros_like(self._all)
+        self._bitsets = {}
+
+        for entry in criteria.schema:
+            if entry["kind"] != "flag":
+                continue
+            values = frame[entry["column"]].fillna("").to_numpy(dtype=str)
+            for value in np.unique(values):
+                self._bitsets[(entry["column"], value)] = np.packbits(values == value)
+
+    def all_lenders(self):
+        return self._all.copy()
+
+    def bitset(self, column, value):
+        """Lenders whose column holds exactly value ("" for blank)."""
+        return self._bitsets.get((column, value), self._none)
+
+    def excluding(self, column, values=REJECT_VALUES):
+        """Lenders whose column holds none of the given values."""
+        rejected = self._none
+        for value in values:
+            rejected = rejected | self.bitset(column, value)
+        return self._all & ~rejected
+
+    def to_mask(self, bitset):
+        return np.unpackbits(bitset, count=self.n_lenders).astype(bool)
+
+    def members(self, bitset):
+        """Positions of the lenders in a bitset, in criteria file order."""
+        return np.flatnonzero(self.to_mask(bitset))
+
+    def prefilter(self, columns):
+        """
+        Apply hard constraints, each requiring that a flag column is not
+        rejected (see REJECT_VALUES).
+
+        Returns (eligible, eliminated): the packed bitset of lenders passing
+        every constraint, and a dict of lender name -> list of the columns
+        that ruled it out.
+        """
+        eligible = self.all_lenders()
+        eliminated = {}
+        for column in columns:
+            allowed = self.excluding(column)
+            eligible &= allowed
+            for position in self.members(self._all & ~allowed):
+                eliminated.setdefault(self.names[position], []).append(column)
+        return eligible, eliminated
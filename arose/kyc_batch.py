@@ -0,0 +1,216 @@
+"""
+Headless batch KYC processing.
+
+A pack is one client's documents: a bank statement and a utility bill.
+Packs come either from a directory with one sub-directory of PDFs per client,
+the documents told apart by file name, or from a CSV manifest with client,
+bank_statement and utility_bill columns (paths relative to the manifest).
+
+Every pack goes through three timed stages: PDF text, LLM extraction and
+verification. Up to `workers` packs are in flight at once, all sharing one
+AsyncExtractor, so its concurrency limit and rate limiter bound the LLM calls
+of the whole batch rather than of each pack. Likewise the PDF text of all
+packs goes through one thread pool per run_batch call, a thread per CPU
+handing each document's pages to pdf_text's shared process pool, so however
+many packs are in flight the batch never parses more PDFs at once than
+there are CPUs.
+
+Each pack's result is written atomically to <output>/<client>.json as soon
+as it finishes. A rerun skips packs that already have a completed result, so
+an interrupted batch resumes where it stopped; failed packs are retried.
+"""
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from arose.async_extraction import BANK_STATEMENT, UTILITY_BILL, AsyncExtractor, KYCDocument, run_kyc_pipeline
+from arose.extraction import extract_text_from_pdf_path
+from arose.rate_limit import RateLimiter
+
+DEFAULT_OUTPUT_DIR = "data/kyc_results"
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+
+COMPLETED = "completed"
+FAILED = "failed"
+
+# File name keywords identifying each document type in a pack directory
+DOCUMENT_KEYWORDS = {
+    BANK_STATEMENT: ("statement", "bank"),
+    UTILITY_BILL: ("utility", "bill", "gas", "electric", "water", "council"),
+}
+
+
+@dataclass(frozen=True)
+class DocumentPack:
+    """One client's documents; a path is None when the pack lacks that document."""
+    client: str
+    bank_statement: str
+    utility_bill: str
+
+
+def classify_document(path):
+    """BANK_STATEMENT or UTILITY_BILL from a file name, or None if it matches neither."""
+    name = os.path.basename(path).lower()
+    for document_type, keywords in DOCUMENT_KEYWORDS.items():
+        if any(keyword in name for keyword in keywords):
+            return document_type
+    return None
+
+
+def packs_from_directory(directory):
+    packs = []
+    for client in sorted(os.listdir(directory)):
+        pack_dir = os.path.join(directory, client)
+        if not os.path.isdir(pack_dir):
+            continue
+        found = {}
+        for name in sorted(os.listdir(pack_dir)):
+            if name.lower().endswith(".pdf"):
+                found.setdefault(classify_document(name), os.path.join(pack_dir, name))
+        packs.append(DocumentPack(client, found.get(BANK_STATEMENT), found.get(UTILITY_BILL)))
+    return packs
+
+
+def packs_from_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline="") as f:
+        return [
+            DocumentPack(
+                row["client"],
+                os.path.join(base, row["bank_statement"]) if row.get("bank_statement") else None,
+                os.path.join(base, row["utility_bill"]) if row.get("utility_bill") else None,
+            )
+            for row in csv.DictReader(f)
+        ]
+
+
+def load_packs(source):
+    """Packs from a pack directory or a manifest CSV."""
+    return packs_from_directory(source) if os.path.isdir(source) else packs_from_manifest(source)
+
+
+class BatchStore:
+    """One JSON result file per client in a directory; a completed file is the pack's checkpoint."""
+
+    def __init__(self, directory=DEFAULT_OUTPUT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, client):
+        return os.path.join(self.directory, re.sub(r"[^\w.-]+", "_", client) + ".json")
+
+    def read(self, client):
+        try:
+            with open(self.path(client)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def completed(self, client):
+        record = self.read(client)
+        return record is not None and record.get("status") == COMPLETED
+
+    def write(self, record):
+        path = self.path(record["client"])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(record, f, indent=2, default=str)
+        os.replace(temp_path, path)
+
+
+async def process_pack(extractor, pack, page_cache=None, text_executor=None):
+    """
+    Text, extraction and verification of one pack, as the record BatchStore
+    writes. PDF text is extracted on text_executor (default: the event
+    loop's default executor).
+    """
+    record = {"client": pack.client, "documents": {BANK_STATEMENT: pack.bank_statement, UTILITY_BILL: pack.utility_bill}}
+    missing = [document_type for document_type, path in record["documents"].items() if path is None]
+    if missing:
+        return dict(record, status=FAILED, errors={"pack": f"No {' or '.join(missing)} found"}, timings={})
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    texts = await asyncio.gather(*(
+        loop.run_in_executor(text_executor, extract_text_from_pdf_path, path, page_cache)
+        for path in record["documents"].values()
+    ))
+    text_ms = (time.perf_counter() - started) * 1000
+
+    documents = [KYCDocument(document_type, document_type, text) for document_type, text in zip(record["documents"], texts)]
+    result = await run_kyc_pipeline(extractor, documents)
+    return dict(
+        record,
+        status=FAILED if result.errors else COMPLETED,
+        extracted=result.extracted,
+        verification=result.verification,
+        errors=result.errors,
+        timings={
+            "text_ms": text_ms,
+            "extraction_ms": max(result.timings.get(document.name, 0) for document in documents),
+            "verification_ms": result.timings.get("verification"),
+            "total_ms": (time.perf_counter() - started) * 1000,
+        },
+    )
+
+
+async def run_batch(extractor, packs, store, workers=DEFAULT_WORKERS, page_cache=None, progress=None):
+    """
+    Process every pack without a completed result in store, up to workers at
+    a time, and return a summary with counts and per-stage median timings.
+    progress, if given, is called with each record as it is written.
+    """
+    pending = [pack for pack in packs if not store.completed(pack.client)]
+    semaphore = asyncio.Semaphore(workers)
+    records = []
+    started = time.perf_counter()
+
+    async def one(pack, text_executor):
+        async with semaphore:
+            try:
+                record = await process_pack(extractor, pack, page_cache, text_executor)
+            except Exception as e:
+                record = {"client": pack.client, "status": FAILED, "errors": {"pack": str(e)}, "timings": {}}
+        record["finished_at"] = time.time()
+        await asyncio.to_thread(store.write, record)
+        records.append(record)
+        if progress is not None:
+            progress(record)
+
+    # The documents of all packs in flight share one thread per CPU for their PDF text
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="kyc-pdf-text") as text_executor:
+        await asyncio.gather(*(one(pack, text_executor) for pack in pending))
+
+    summary = {
+        "packs": len(packs),
+        "skipped": len(packs) - len(pending),
+        COMPLETED: sum(record["status"] == COMPLETED for record in records),
+        FAILED: sum(record["status"] == FAILED for record in records),
+        "wall_ms": (time.perf_counter() - started) * 1000,
+    }
+    for stage in ("text_ms", "extraction_ms", "verification_ms", "total_ms"):
+        values = [record["timings"][stage] for record in records if record["timings"].get(stage) is not None]
+        summary[f"p50_{stage}"] = float(np.median(values)) if values else None
+    return summary
+
+
+def run_batch_sync(packs, api_key, store, workers=DEFAULT_WORKERS, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                   tokens_per_minute=None, page_cache=None, progress=None, **extractor_options):
+    """Blocking wrapper around run_batch with its own AsyncExtractor and rate limiter."""
+    async def main():
+        rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        extractor = AsyncExtractor(api_key, rate_limiter=rate_limiter, **extractor_options)
+        try:
+            return await run_batch(extractor, packs, store, workers, page_cache, progress)
+        finally:
+            await extractor.close()
+
+    return asyncio.run(main())
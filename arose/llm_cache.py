@@ -0,0 +1,117 @@
+"""
+Persistent cache of LLM responses.
+
+Entries are content-addressed: the key is a SHA-256 over everything that
+determines the response (model, system prompt and user prompt, which in turn
+embed the document text and type). Editing the prompt file or switching
+model therefore misses the cache without any explicit invalidation.
+
+The store is a single SQLite file. Entries expire after a TTL, and the
+least recently used entries are evicted once the stored responses exceed a
+byte budget.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+DEFAULT_CACHE_PATH = "data/.cache/llm_responses.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def cache_key(model, *parts):
+    """SHA-256 over the model name and every prompt part, unambiguously delimited."""
+    digest = hashlib.sha256()
+    for part in (model,) + parts:
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed LRU + TTL cache of JSON responses, safe to share between threads."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection committed on success or rolled back on error, and closed either way."""
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+            yield conn
+
+    def get(self, key):
+        """Cached value for key, or None if absent or expired."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value, model=""):
+        encoded = json.dumps(value)
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, encoded, len(encoded), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until back under budget
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
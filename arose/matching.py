@@ -0,0 +1,284 @@
+"""
+Vectorised lender matching.
+
+The lender criteria table is parsed once into NumPy arrays (coverage flags,
+loan bounds and LTV caps) so a client can be scored against every lender in a
+single pass instead of walking the DataFrame row by row. Loan bounds and LTV
+caps are held per product section, and a client is only scored against the
+section for their borrowing type.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from arose.values import GBP, NUMBER, PERCENT
+
+# Region flags in the "Coverage" section of the criteria CSV
+REGION_COLUMNS = (
+    "England", "Wales", "Scotland", "British Isles", "Northern Ireland",
+    "Southern Ireland", "Europe", "Spain", "Portugal", "France", "Italy",
+    "Monaco", "Netherlands", "Switzerland", "Belgium", "Germany", "Asia",
+    "US", "Canada",
+)
+
+# Borrowing Type flag -> product section holding that product's loan terms
+BORROWING_TYPE_SECTIONS = {
+    "Regulated Bridging": "Regulated Bridging",
+    "Unregulated Residential Bridging": "Unregulated Bridging",
+    "Unregulated Commercial Bridging": "Unregulated Bridging",
+    "Rebridges": "Unregulated Bridging",
+    "Rebridge a Development Exit": "Unregulated Bridging",
+    "Refurbishment Bridges": "Refurbishment Loans",
+    "Unregulated Development Finance": "Unregulated Development Finance",
+    "Regulated Development Finance (Self-Build)": "Self-Build (Regulated Development)",
+    "Development Exit": "Development Exit",
+    "Term Commercial Owner-Occupier": "Commercial Owner-Occupier",
+    "Term Commercial Investment": "Commercial Investment",
+    "HNW Residential Mortgages": "HNW Residential Finance",
+    "Revolving Facility": "Revolving Facility",
+}
+DEFAULT_BORROWING_TYPE = "Regulated Bridging"
+
+# Client fields checked as hard eligibility flags, and the section holding them
+HARD_CONSTRAINT_SECTIONS = {
+    "property_location": "Coverage",
+    "borrower_type": "Commercial Borrower Type",
+    "borrowing_type": "Borrowing Type",
+    "security_type": "Security Type",
+}
+
+# Alternative field names used for the same term across product sections
+MIN_LOAN_FIELDS = ("Minimum Loan Size", "Minimum Loan", "Min Loan", "Minimum Lend")
+MAX_LOAN_FIELDS = ("Maximum Loan Size", "Maximum Loan", "Max Loan")
+MAX_LTV_FIELDS = ("Max LTV", "Max 1st Charge LTV", "1st Charge Max LTV", "Max D1 LTV", "LTV")
+MAX_LTPP_FIELDS = ("Max LTPP",)
+MAX_LTGDV_FIELDS = ("Max LtGDV",)
+
+# Units a column may be compiled to and still be read as a loan size or a cap
+LOAN_UNITS = (GBP, NUMBER)
+CAP_UNITS = (PERCENT, NUMBER)
+
+
+@dataclass(frozen=True)
+class LenderMatrix:
+    """Typed, column-oriented view of the lender criteria.
+
+    coverage is (lenders, regions); the loan bounds and the LTV, LTPP
+    (loan to purchase price) and LtGDV (loan to gross development value)
+    caps are (lenders, products) with NaN where the lender did not state a
+    usable value for that product.
+    """
+    names: np.ndarray
+    regions: tuple
+    coverage: np.ndarray
+    products: tuple
+    min_loan: np.ndarray
+    max_loan: np.ndarray
+    max_ltv: np.ndarray
+    max_ltpp: np.ndarray
+    max_ltgdv: np.ndarray
+
+    def __len__(self):
+        return len(self.names)
+
+    def product_for(self, borrowing_type):
+        """Column of the product arrays used for a borrowing type, or None if the sheet lacks it."""
+        if borrowing_type not in BORROWING_TYPE_SECTIONS:
+            raise ValueError(f"Unknown borrowing type: {borrowing_type}")
+        section = BORROWING_TYPE_SECTIONS[borrowing_type]
+        return self.products.index(section) if section in self.products else None
+
+
+def _typed_column(criteria, column, units):
+    """
+    Compiled float values of a column, or all-NaN when the column is missing
+    or was compiled to a unit other than the ones given (e.g. a "Max LTV"
+    column that turned out to hold monthly rates).
+    """
+    units_by_column = {entry["column"]: entry.get("unit") for entry in criteria.schema}
+    if column is None or units_by_column.get(column) not in units:
+        return np.full(len(criteria.frame), np.nan)
+    return criteria.values[column].to_numpy(dtype=float)
+
+
+def build_lender_matrix(criteria):
+    """
+    Compile CompiledCriteria into a LenderMatrix from the values normalised
+    at compile time; only the product sections the matcher uses are read.
+    "No Max" is held as +inf, so open-ended loan ranges stay usable.
+    """
+    criteria_df = criteria.frame
+    index = criteria.index
+    name_column = next(entry["column"] for entry in criteria.schema if entry["kind"] == "name")
+
+    regions = tuple(region for region in REGION_COLUMNS if index.column("Coverage", region))
+    if regions:
+        coverage = criteria_df[[index.column("Coverage", region) for region in regions]].eq("Y").to_numpy(dtype=bool)
+    else:
+        coverage = np.zeros((len(criteria_df), 0), dtype=bool)
+
+    products = tuple(dict.fromkeys(
+        section for section in BORROWING_TYPE_SECTIONS.values() if section in index.sections
+    ))
+    shape = (len(criteria_df), len(products))
+    min_loan = np.full(shape, np.nan)
+    max_loan = np.full(shape, np.nan)
+    max_ltv = np.full(shape, np.nan)
+    max_ltpp = np.full(shape, np.nan)
+    max_ltgdv = np.full(shape, np.nan)
+
+    for p, section in enumerate(products):
+        min_loan_col = index.find(section, *MIN_LOAN_FIELDS)
+        max_loan_col = index.find(section, *MAX_LOAN_FIELDS)
+        # A loan range is only usable when both ends are known
+        if min_loan_col and max_loan_col:
+            min_loan[:, p] = _typed_column(criteria, min_loan_col, LOAN_UNITS)
+            max_loan[:, p] = _typed_column(criteria, max_loan_col, LOAN_UNITS)
+        max_ltv[:, p] = _typed_column(criteria, index.find(section, *MAX_LTV_FIELDS), CAP_UNITS)
+        max_ltpp[:, p] = _typed_column(criteria, index.find(section, *MAX_LTPP_FIELDS), CAP_UNITS)
+        max_ltgdv[:, p] = _typed_column(criteria, index.find(section, *MAX_LTGDV_FIELDS), CAP_UNITS)
+
+    return LenderMatrix(
+        names=criteria_df[name_column].astype(str).to_numpy(),
+        regions=regions,
+        coverage=coverage,
+        products=products,
+        min_loan=min_loan,
+        max_loan=max_loan,
+        max_ltv=max_ltv,
+        max_ltpp=max_ltpp,
+        max_ltgdv=max_ltgdv,
+    )
+
+
+def hard_constraint_columns(criteria_index, client_data):
+    """
+    Flag columns a client must not be rejected on (see flags.FlagIndex.prefilter),
+    for each hard-constraint field the client states and the sheet has.
+    """
+    columns = []
+    for key, section in HARD_CONSTRAINT_SECTIONS.items():
+        value = client_data.get(key)
+        column = criteria_index.column(section, value) if value else None
+        if column:
+            columns.append(column)
+    return columns
+
+
+@dataclass(frozen=True)
+class ScoreMatrix:
+    """Scores of N clients against M lenders, each array shaped (clients, lenders).
+
+    eligible marks the lenders that passed each client's hard constraints;
+    ineligible lenders are scored but left out of rankings.
+    """
+    lender_names: np.ndarray
+    match_percentage: np.ndarray
+    location_match: np.ndarray
+    loan_amount_match: np.ndarray
+    ltv_match: np.ndarray
+    eligible: np.ndarray
+
+    def ranking(self, client):
+        """
+        Eligible lenders for one client (row position) ranked by match
+        percentage, ties keeping criteria file order.
+        """
+        lenders = np.flatnonzero(self.eligible[client])
+        order = lenders[np.argsort(-self.match_percentage[client, lenders], kind="stable")]
+        return pd.DataFrame({
+            "lender_name": self.lender_names[order],
+            "match_percentage": self.match_percentage[client, order],
+            "location_match": self.location_match[client, order],
+            "loan_amount_match": self.loan_amount_match[client, order],
+            "ltv_match": self.ltv_match[client, order],
+        })
+
+    def to_frame(self, client_names=None):
+        """Match percentages as a clients x lenders DataFrame, NaN where ineligible."""
+        return pd.DataFrame(
+            np.where(self.eligible, self.match_percentage, np.nan),
+            index=client_names,
+            columns=self.lender_names,
+        )
+
+
+def _per_client(array, columns, lenders):
+    """
+    Gather one column of a (lenders, k) array per client into a (clients,
+    lenders) array; a column of -1 selects a padding column of NaN.
+    """
+    padded = np.column_stack([array[lenders], np.full(len(lenders), np.nan)])
+    return padded[:, columns].T
+
+
+def score_clients(matrix, clients, lenders=None, eligible=None):
+    """
+    Score a batch of client_data dicts against the lenders in one
+    broadcast pass, optionally restricted to the lender positions in
+    lenders. eligible is an optional (clients, lenders) boolean mask of the
+    lenders passing each client's hard constraints.
+
+    Loan size and LTV are checked against the product section for each
+    client's borrowing_type. A criterion adds to the score only when the
+    lender states it and the client satisfies it; criteria the lender leaves
+    blank are reported as a match but do not count towards the score.
+    """
+    lenders = np.arange(len(matrix)) if lenders is None else np.asarray(lenders)
+    n_clients = len(clients)
+    loan_amount = np.array([float(c.get("loan_amount", 0) or 0) for c in clients])[:, None]
+    ltv_ratio = np.array([float(c.get("ltv_ratio", 0) or 0) for c in clients])[:, None]
+
+    products = []
+    for client_data in clients:
+        product = matrix.product_for(client_data.get("borrowing_type") or DEFAULT_BORROWING_TYPE)
+        products.append(-1 if product is None else product)
+    min_loan = _per_client(matrix.min_loan, products, lenders)
+    max_loan = _per_client(matrix.max_loan, products, lenders)
+    max_ltv = _per_client(matrix.max_ltv, products, lenders)
+
+    # Location
+    regions = [client_data.get("property_location", "England") for client_data in clients]
+    region_columns = [matrix.regions.index(r) if r in matrix.regions else -1 for r in regions]
+    region_known = (np.array(region_columns) >= 0)[:, None]
+    covered = _per_client(matrix.coverage.astype(float), region_columns, lenders) == 1
+    location_match = ~region_known | covered
+    location_score = region_known & covered
+
+    # Loan amount within the lender's range
+    loan_known = ~(np.isnan(min_loan) | np.isnan(max_loan))
+    loan_in_range = (min_loan <= loan_amount) & (loan_amount <= max_loan)
+    loan_amount_match = ~loan_known | loan_in_range
+    loan_score = loan_known & loan_in_range
+
+    # LTV under the lender's cap
+    ltv_known = ~np.isnan(max_ltv)
+    ltv_under_cap = ltv_ratio <= max_ltv
+    ltv_match = ~ltv_known | ltv_under_cap
+    ltv_score = ltv_known & ltv_under_cap
+
+    max_possible_score = 3
+    match_score = location_score.astype(int) + loan_score.astype(int) + ltv_score.astype(int)
+
+    if eligible is None:
+        eligible = np.ones((n_clients, len(lenders)), dtype=bool)
+    return ScoreMatrix(
+        lender_names=matrix.names[lenders],
+        match_percentage=match_score / max_possible_score * 100,
+        location_match=location_match,
+        loan_amount_match=loan_amount_match,
+        ltv_match=ltv_match,
+        eligible=eligible,
+    )
+
+
+def match_client(matrix, client_data, eligible=None):
+    """
+    Score one client against every lender in the matrix, or only the lenders
+    in the boolean eligible mask when one is given (see score_clients).
+    Returns a DataFrame ranked by match percentage (ties keep criteria file
+    order).
+    """
+    lenders = None if eligible is None else np.flatnonzero(eligible)
+    return score_clients(matrix, [client_data], lenders=lenders).ranking(0)
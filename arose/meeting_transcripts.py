@@ -0,0 +1,435 @@
+"""
+Question-set answers from uploaded call and meeting transcripts.
+
+The Initial Call and Fact-Find pages accept a transcript as txt, pdf or
+docx. iter_transcript_lines reads any of them as a stream of lines: text is
+decoded incrementally, PDF pages come from pdf_text.iter_pdf_pages, and a
+docx's document.xml is walked paragraph by paragraph with iterparse, so no
+format needs python-docx or a full in-memory copy of the text.
+
+extract_answers reads the lines once and keeps running tallies:
+
+    loan purpose, property type, property use
+        the option of the pages' select boxes whose phrases are mentioned
+        most often ("remortgage" counts for Refinance)
+    loan amount, property value, deposit, annual income
+        money amounts ("£350k", "1.2 million", "$420,000", or a bare
+        "85,000" right after its keyword) filed under the nearest preceding
+        keyword; a later figure replaces an earlier one, since figures get
+        corrected as a call goes on
+
+Lines are grouped into chunks with content-defined boundaries, and each
+chunk's findings depend only on its own text. IncrementalExtractor keeps
+them by chunk digest, so when a corrected transcript is uploaded only the
+chunks the edit touched are read again, and the merged answers record which
+chunk and which revision every field came from.
+
+An hour-long meeting is a few hundred KB of text, which is too slow to
+process inside a Streamlit rerun. TranscriptJob therefore runs the
+extraction on a background thread and reports the share of input consumed,
+which the pages poll to draw a progress bar while the form stays usable.
+"""
+import hashlib
+import io
+import re
+import threading
+import zipfile
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from xml.etree import ElementTree
+
+from arose.pdf_text import iter_pdf_pages, pdf_page_count
+
+SUPPORTED_TYPES = ("txt", "pdf", "docx")
+
+# Characters of transcript text kept for the preview box
+PREVIEW_CHARS = 3000
+
+# Average lines per chunk when diffing revisions of a transcript
+CHUNK_TARGET_LINES = 32
+_MIN_CHUNK_LINES = 4
+_MAX_CHUNK_FACTOR = 4
+
+# Options of the question-set select boxes, with the phrases that point to each
+LOAN_PURPOSES = {
+    "Home Purchase": (r"\bpurchas", r"\bbuy(?:ing)?\s+(?:a|the|our|my)\s+(?:new\s+)?(?:house|home|property|flat)", r"\bacquisition"),
+    "Refinance": (r"\brefinanc", r"\bremortgag", r"\brefi\b"),
+    "Home Improvement": (r"\brenovat", r"\brefurb", r"\bextension\b", r"\bhome improvement"),
+    "Debt Consolidation": (r"\bconsolidat", r"\bpay off (?:my|our|the) debts?"),
+    "Business": (r"\bworking capital", r"\bbusiness loan", r"\bfor the business"),
+}
+PROPERTY_TYPES = {
+    "Single Family Home": (r"\bdetached\b", r"\bsemi\b", r"\bbungalow", r"\bsingle[\s-]family", r"\bhouse\b"),
+    "Multi-Family Home": (r"\bhmo\b", r"\bmulti[\s-]?(?:family|unit|let)", r"\bblock of (?:flats|apartments)", r"\bduplex"),
+    "Condominium": (r"\bflat\b", r"\bapartment\b", r"\bcondo"),
+    "Townhouse": (r"\btown\s?house", r"\bterrace"),
+    "Commercial Property": (r"\bcommercial\b", r"\boffices?\b", r"\bretail unit", r"\bshop\b", r"\bwarehouse", r"\bindustrial unit"),
+    "Land": (r"\bland\b", r"\bplot\b", r"\bbuilding site"),
+}
+PROPERTY_USES = {
+    "Primary Residence": (r"\blive in\b", r"\bmain residence", r"\bprimary residence", r"\bmove in\b", r"\bfamily home"),
+    "Secondary/Vacation Home": (r"\bholiday (?:home|let)", r"\bsecond home", r"\bvacation"),
+    "Investment Property": (r"\bbuy[\s-]to[\s-]let", r"\bbtl\b", r"\brent (?:it|them) out", r"\brental\b", r"\btenants?\b", r"\binvestment propert", r"\bportfolio"),
+    "Business": (r"\bowner[\s-]occupi", r"\btrading premises", r"\brun (?:my|our|the) business from"),
+}
+
+# Keywords that say which figure a money amount is; the nearest one before the amount wins
+AMOUNT_KEYWORDS = {
+    "loan_amount": r"borrow|loan|mortgage of|facility|finance of|lend",
+    "property_value": r"worth|valued|valuation|value|price|purchas|buying|costs?",
+    "down_payment": r"deposit|down payment|put down|putting in",
+    "annual_income": r"earn|salary|income|turnover|take home",
+}
+# How far before an amount its keyword may be
+_KEYWORD_WINDOW = 80
+# A bare number with neither currency sign nor scale, e.g. "85,000", counts
+# as money only this close after its keyword
+_BARE_KEYWORD_WINDOW = 30
+
+_AMOUNT = re.compile(
+    r"(?:[£$]\s?(\d[\d,]*(?:\.\d+)?)\s*(k|m|mn|million|thousand|grand)?\b"
+    r"|\b(\d[\d,]*(?:\.\d+)?)\s*(k|m|mn|million|thousand|grand)\b"
+    r"|\b(\d{1,3}(?:,\d{3})+(?:\.\d+)?)(?![\d,]|\.\d|\s*%))",
+    re.I,
+)
+_SCALE = {"k": 1e3, "thousand": 1e3, "grand": 1e3, "m": 1e6, "mn": 1e6, "million": 1e6}
+# Amounts below this are rates, terms or years rather than money
+_MIN_AMOUNT = 1000
+
+# Loan amount bands of the Initial Call question set
+LOAN_AMOUNT_RANGES = (
+    ("$50,000-$100,000", 100000),
+    ("$100,000-$250,000", 250000),
+    ("$250,000-$500,000", 500000),
+    ("$500,000-$1,000,000", 1000000),
+    ("Over $1,000,000", float("inf")),
+)
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _compile(options):
+    return {name: re.compile("|".join(patterns), re.I) for name, patterns in options.items()}
+
+
+_CATEGORIES = {
+    "loan_purpose": _compile(LOAN_PURPOSES),
+    "property_type": _compile(PROPERTY_TYPES),
+    "property_use": _compile(PROPERTY_USES),
+}
+_AMOUNT_KEYWORDS = {name: re.compile(pattern, re.I) for name, pattern in AMOUNT_KEYWORDS.items()}
+
+
+class _CountingReader(io.RawIOBase):
+    """Read-through wrapper that counts the bytes consumed, for progress reporting."""
+
+    def __init__(self, raw, on_read):
+        self._raw = raw
+        self._on_read = on_read
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._raw.read(len(buffer))
+        buffer[:len(data)] = data
+        self._on_read(len(data))
+        return len(data)
+
+
+def file_type(name):
+    extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    if extension not in SUPPORTED_TYPES:
+        raise ValueError(f"Unsupported transcript type: {name}")
+    return extension
+
+
+def iter_transcript_lines(data, name, progress=None):
+    """
+    Non-empty lines of a txt, pdf or docx transcript (bytes), in order.
+    progress, if given, is called with the share of the input consumed so far.
+    """
+    report = progress or (lambda share: None)
+    kind = file_type(name)
+
+    if kind == "pdf":
+        total = pdf_page_count(data)
+        for number, page in enumerate(iter_pdf_pages(data, pages=range(total)), start=1):
+            yield from (line.strip() for line in (page or "").splitlines() if line.strip())
+            report(number / total)
+        return
+
+    if kind == "txt":
+        consumed = [0]
+
+        def on_read(size):
+            consumed[0] += size
+            report(min(1.0, consumed[0] / max(1, len(data))))
+
+        stream = io.TextIOWrapper(io.BufferedReader(_CountingReader(io.BytesIO(data), on_read)), encoding="utf-8", errors="replace")
+        yield from (line.strip() for line in stream if line.strip())
+    else:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive, archive.open("word/document.xml") as xml:
+            xml_size = max(1, archive.getinfo("word/document.xml").file_size)
+            texts = []
+            for _, element in ElementTree.iterparse(xml, events=("end",)):
+                if element.tag == f"{_WORD_NAMESPACE}t":
+                    texts.append(element.text or "")
+                elif element.tag == f"{_WORD_NAMESPACE}p":
+                    line = "".join(texts).strip()
+                    texts = []
+                    element.clear()
+                    if line:
+                        yield line
+                    # The XML is compressed, so progress follows the offset into the uncompressed member
+                    report(min(1.0, xml.tell() / xml_size))
+    report(1.0)
+
+
+def parse_amount(number, scale=None):
+    value = float(number.replace(",", ""))
+    return value * _SCALE.get((scale or "").lower(), 1)
+
+
+def loan_amount_range(amount):
+    """The Initial Call loan amount band containing amount."""
+    return next(label for label, upper in LOAN_AMOUNT_RANGES if amount <= upper)
+
+
+@dataclass
+class TranscriptAnswers:
+    """Question-set answers found in a transcript; None where the transcript does not say."""
+    loan_purpose: str = None
+    property_type: str = None
+    property_use: str = None
+    loan_amount: float = None
+    property_value: float = None
+    down_payment: float = None
+    annual_income: float = None
+    evidence: dict = field(default_factory=dict)
+    provenance: dict = field(default_factory=dict)
+    lines: int = 0
+    preview: str = ""
+    revision: int = 1
+
+    def question_set(self):
+        """The Initial Call question-set fields this transcript answers."""
+        answers = {name: getattr(self, name) for name in ("loan_purpose", "property_type", "property_use")}
+        if self.loan_amount is not None:
+            answers["loan_amount_range"] = loan_amount_range(self.loan_amount)
+        return {name: value for name, value in answers.items() if value is not None}
+
+    def amounts(self):
+        names = ("loan_amount", "property_value", "down_payment", "annual_income")
+        return {name: getattr(self, name) for name in names if getattr(self, name) is not None}
+
+    def fact_find(self):
+        """The fact-find sections this transcript answers, shaped like fact_find_data."""
+        sections = {
+            "property_details": {"property_type": self.property_type, "property_use": self.property_use,
+                                 "property_value": self.property_value},
+            "loan_requirements": {"loan_purpose": self.loan_purpose, "loan_amount": self.loan_amount,
+                                  "down_payment": self.down_payment},
+            "financial_situation": {"annual_income": self.annual_income},
+        }
+        return {section: {name: value for name, value in fields.items() if value is not None}
+                for section, fields in sections.items()}
+
+
+def _amount_field(line, start, window=_KEYWORD_WINDOW):
+    """The amount field whose keyword is closest before position start, within window characters, or None."""
+    window = line[max(0, start - window):start]
+    best, best_position = None, -1
+    for name, pattern in _AMOUNT_KEYWORDS.items():
+        for match in pattern.finditer(window):
+            if match.start() > best_position:
+                best, best_position = name, match.start()
+    return best
+
+
+@dataclass(frozen=True)
+class ChunkAnswers:
+    """
+    What one chunk of lines says: option mention counts, the first line
+    mentioning each option, and every money amount in order. Depends only on
+    the chunk's text, so it can be reused for an identical chunk of an
+    amended transcript.
+    """
+    mentions: dict
+    first_lines: dict
+    amounts: tuple
+
+
+def iter_line_chunks(lines, target_lines=CHUNK_TARGET_LINES):
+    """
+    Runs of lines with content-defined boundaries: a chunk ends after a line
+    whose CRC is 0 modulo target_lines (within MIN/MAX bounds), so an edit
+    changes only the chunks around it and the rest keep their boundaries.
+    """
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        at_boundary = zlib.crc32(line.encode("utf-8")) % target_lines == 0
+        if (at_boundary and len(chunk) >= _MIN_CHUNK_LINES) or len(chunk) >= target_lines * _MAX_CHUNK_FACTOR:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def chunk_digest(lines):
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def extract_chunk(lines):
+    mentions = {category: Counter() for category in _CATEGORIES}
+    first_lines = {category: {} for category in _CATEGORIES}
+    amounts = []
+    for number, line in enumerate(lines):
+        for category, options in _CATEGORIES.items():
+            for option, pattern in options.items():
+                if pattern.search(line):
+                    mentions[category][option] += 1
+                    first_lines[category].setdefault(option, (number, line))
+        for match in _AMOUNT.finditer(line):
+            if match.group(5):
+                value = parse_amount(match.group(5))
+                name = _amount_field(line, match.start(), _BARE_KEYWORD_WINDOW)
+            else:
+                digits, scale = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+                value = parse_amount(digits, scale)
+                name = _amount_field(line, match.start())
+            if name is not None and value >= _MIN_AMOUNT:
+                amounts.append((name, value, line))
+    return ChunkAnswers(mentions, first_lines, tuple(amounts))
+
+
+def merge_chunks(chunks, revisions=None):
+    """
+    TranscriptAnswers from (digest, ChunkAnswers) pairs in transcript order.
+    provenance records, per field, the chunk position and digest it came
+    from and the revision (revisions[digest]) in which that chunk was read.
+    """
+    revisions = revisions or {}
+    totals = {category: Counter() for category in _CATEGORIES}
+    first_seen = {category: {} for category in _CATEGORIES}
+    answers = TranscriptAnswers()
+
+    def record(name, position, digest, line):
+        answers.evidence[name] = line
+        answers.provenance[name] = {"chunk": position, "digest": digest, "revision": revisions.get(digest, 0)}
+
+    for position, (digest, chunk) in enumerate(chunks):
+        for category in _CATEGORIES:
+            totals[category].update(chunk.mentions[category])
+            for option, (number, line) in chunk.first_lines[category].items():
+                first_seen[category].setdefault(option, ((position, number), digest, line))
+        for name, value, line in chunk.amounts:
+            setattr(answers, name, value)
+            record(name, position, digest, line)
+
+    for category, counts in totals.items():
+        if counts:
+            # Most mentioned; ties go to the option mentioned first
+            option = max(counts, key=lambda name: (counts[name], tuple(-i for i in first_seen[category][name][0])))
+            (position, _), digest, line = first_seen[category][option]
+            setattr(answers, category, option)
+            record(category, position, digest, line)
+    return answers
+
+
+class IncrementalExtractor:
+    """
+    Extracts answers from successive revisions of one transcript, reading
+    only the chunks that are new in each revision. Chunk results are kept by
+    digest, and those the latest revision no longer contains are dropped.
+    """
+
+    def __init__(self, target_lines=CHUNK_TARGET_LINES):
+        self.target_lines = target_lines
+        self.revision = 0
+        self._chunks = {}
+        self._revisions = {}
+        self.last_reused = 0
+        self.last_extracted = 0
+        self._lock = threading.Lock()
+
+    def extract(self, lines):
+        with self._lock:
+            return self._extract(lines)
+
+    def _extract(self, lines):
+        self.revision += 1
+        chunks, preview, preview_size, line_count = [], [], 0, 0
+        reused = extracted = 0
+        for chunk in iter_line_chunks(lines, self.target_lines):
+            line_count += len(chunk)
+            if preview_size < PREVIEW_CHARS:
+                preview.extend(chunk)
+                preview_size += sum(len(line) + 1 for line in chunk)
+            digest = chunk_digest(chunk)
+            if digest in self._chunks:
+                reused += 1
+            else:
+                self._chunks[digest] = extract_chunk(chunk)
+                self._revisions[digest] = self.revision
+                extracted += 1
+            chunks.append((digest, self._chunks[digest]))
+
+        current = {digest for digest, _ in chunks}
+        self._chunks = {digest: self._chunks[digest] for digest in current}
+        self._revisions = {digest: self._revisions[digest] for digest in current}
+        self.last_reused, self.last_extracted = reused, extracted
+
+        answers = merge_chunks(chunks, self._revisions)
+        answers.lines = line_count
+        answers.preview = "\n".join(preview)[:PREVIEW_CHARS]
+        answers.revision = self.revision
+        return answers
+
+
+def extract_answers(lines):
+    """TranscriptAnswers from an iterable of transcript lines, read once."""
+    return IncrementalExtractor().extract(lines)
+
+
+class TranscriptJob:
+    """
+    Extracts answers from one transcript on a background thread; poll
+    progress, done, result and error. Pass the IncrementalExtractor of an
+    earlier revision as extractor to re-read only the chunks that changed.
+    """
+
+    def __init__(self, data, name, extractor=None):
+        self.name = name
+        self.extractor = extractor or IncrementalExtractor()
+        self.size = len(data)
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self._data = data
+        self._thread = threading.Thread(target=self._run, name=f"transcript-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return not self._thread.is_alive() and (self.result is not None or self.error is not None)
+
+    def _run(self):
+        try:
+            self.result = self.extractor.extract(iter_transcript_lines(self._data, self.name, self._report))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._data = None
+
+    def _report(self, share):
+        self.progress = share
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+        return self
@@ -0,0 +1,173 @@
+"""
+Two-tier cache of extracted PDF page text.
+
+Streamlit reruns a page script on every widget interaction, and with a file
+still in an uploader that used to mean parsing the PDF again each time.
+Page text is cached by the SHA-256 of the file's bytes and the page index:
+first in an in-process LRU dictionary, then in a SQLite file shared by every
+process on the machine. Each tier evicts its least recently used pages once
+their text exceeds its byte budget.
+
+The page count of each document is stored alongside, so a document whose
+pages are all cached is served without opening the PDF at all; only pages
+missing from both tiers (e.g. evicted ones) are extracted again.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+
+from arose.pdf_text import iter_pdf_pages, pdf_page_count
+
+DEFAULT_PAGE_CACHE_PATH = "data/.cache/page_text.sqlite"
+DEFAULT_MEMORY_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    digest TEXT PRIMARY KEY,
+    page_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    digest TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (digest, page)
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+"""
+
+
+class PageTextCache:
+    """Memory and SQLite tiers of page text keyed by (document SHA-256, page index), safe to share between threads."""
+
+    def __init__(self, path=DEFAULT_PAGE_CACHE_PATH, memory_max_bytes=DEFAULT_MEMORY_MAX_BYTES,
+                 disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.path = path
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._page_counts = {}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """A connection committed on success or rolled back on error, and closed either way."""
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+            yield conn
+
+    def document_pages(self, data, workers=None):
+        """Text of every page of the PDF in data (bytes), extracting only pages in neither tier."""
+        digest = hashlib.sha256(data).hexdigest()
+        page_count = self._page_count(digest)
+        if page_count is None:
+            page_count = pdf_page_count(data, workers)
+            with self._lock, self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO documents (digest, page_count) VALUES (?, ?)", (digest, page_count))
+                self._page_counts[digest] = page_count
+
+        texts = self._get_many(digest, page_count)
+        missing = [index for index in range(page_count) if index not in texts]
+        if missing:
+            extracted = dict(zip(missing, iter_pdf_pages(data, workers, pages=missing)))
+            self._put_many(digest, extracted)
+            texts.update(extracted)
+        return [texts[index] for index in range(page_count)]
+
+    def _page_count(self, digest):
+        with self._lock:
+            if digest in self._page_counts:
+                return self._page_counts[digest]
+            with self._connect() as conn:
+                row = conn.execute("SELECT page_count FROM documents WHERE digest = ?", (digest,)).fetchone()
+            if row:
+                self._page_counts[digest] = row[0]
+            return row[0] if row else None
+
+    def _get_many(self, digest, page_count):
+        texts = {}
+        with self._lock:
+            for index in range(page_count):
+                text = self._memory.get((digest, index))
+                if text is not None:
+                    self._memory.move_to_end((digest, index))
+                    texts[index] = text
+
+            if len(texts) < page_count:
+                now = time.time()
+                with self._connect() as conn:
+                    rows = conn.execute("SELECT page, text FROM pages WHERE digest = ?", (digest,)).fetchall()
+                    conn.execute("UPDATE pages SET accessed_at = ? WHERE digest = ?", (now, digest))
+                for index, text in rows:
+                    if index not in texts and index < page_count:
+                        texts[index] = text
+                        self._remember(digest, index, text)
+
+            self.hits += len(texts)
+            self.misses += page_count - len(texts)
+        return texts
+
+    def _put_many(self, digest, texts):
+        now = time.time()
+        with self._lock:
+            for index, text in texts.items():
+                self._remember(digest, index, text)
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO pages (digest, page, text, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    [(digest, index, text, len(text.encode("utf-8")), now) for index, text in texts.items()],
+                )
+                self._evict_disk(conn)
+
+    def _remember(self, digest, index, text):
+        """Add a page to the memory tier, evicting least recently used pages over budget. Caller holds the lock."""
+        key = (digest, index)
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key).encode("utf-8"))
+        self._memory[key] = text
+        self._memory_bytes += len(text.encode("utf-8"))
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.encode("utf-8"))
+
+    def _evict_disk(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+        # Drop least recently used pages until back under budget
+        excess = total - self.disk_max_bytes
+        doomed = []
+        for digest, page, size in conn.execute("SELECT digest, page, size FROM pages ORDER BY accessed_at"):
+            if excess <= 0:
+                break
+            doomed.append((digest, page))
+            excess -= size
+        conn.executemany("DELETE FROM pages WHERE digest = ? AND page = ?", doomed)
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM documents")
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._page_counts.clear()
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            pages, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            return {
+                "memory_pages": len(self._memory), "memory_bytes": self._memory_bytes,
+                "disk_pages": pages, "disk_bytes": size, "hits": self.hits, "misses": self.misses,
+            }
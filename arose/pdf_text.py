@@ -0,0 +1,127 @@
+"""
+Page-parallel PDF text extraction.
+
+PyPDF2's page.extract_text is pure Python and CPU-bound (about a quarter
+of a second per page of the sample statement), so pages are extracted in
+one ProcessPoolExecutor shared by every caller in the process: however
+many documents, upload handlers or KYC packs are extracting at once, no
+more than one process per CPU is parsing PDFs. Its workers are spawned,
+not forked, because the callers are Streamlit script threads and event
+loop worker threads, and forking a multi-threaded process can leave the
+child holding locks no thread will release.
+
+A document reaches the workers as its file path when there is one, or as
+its bytes otherwise, sent once per batch of pages rather than once per
+worker at start-up. Each worker keeps the PdfReader of the last document
+it parsed, so the batches of one document landing on the same worker parse
+it only once. When the pool is used the calling process does not parse the
+PDF at all, not even to count its pages; nothing is written to a temporary
+file.
+
+iter_pdf_pages yields page texts in page order as their batches complete,
+so a consumer such as chunking.iter_chunks can start on the first pages
+while later ones are still being extracted.
+"""
+import hashlib
+import io
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import PyPDF2
+
+# Fewest pages sent to a worker in one task; shorter documents are one task
+MIN_BATCH_PAGES = 4
+
+# Batches per worker, so the first pages stream out before the last are done
+BATCHES_PER_WORKER = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# (document key, PdfReader) of the last document parsed by this worker process
+_worker_document = (None, None)
+
+
+def shared_pool():
+    """The process pool shared by all PDF extraction in this process, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=get_context("spawn"))
+        return _pool
+
+
+def _open(source):
+    return PyPDF2.PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+
+def _document_key(source):
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    stat = os.stat(source)
+    return (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+
+
+def _reader(key, source):
+    global _worker_document
+    if _worker_document[0] != key:
+        _worker_document = (key, _open(source))
+    return _worker_document[1]
+
+
+def _page_count(key, source):
+    return len(_reader(key, source).pages)
+
+
+def _extract_pages(key, source, indexes):
+    reader = _reader(key, source)
+    return [reader.pages[index].extract_text() for index in indexes]
+
+
+def pdf_page_count(source, workers=None):
+    """
+    Number of pages of the PDF in source (bytes, or a file path), counted in
+    the shared pool unless workers=1.
+    """
+    if (workers or os.cpu_count() or 1) <= 1:
+        return len(_open(source).pages)
+    return shared_pool().submit(_page_count, _document_key(source), source).result()
+
+
+def iter_pdf_pages(source, workers=None, pages=None):
+    """
+    Text of each page of the PDF in source (bytes, or a file path), in page
+    order, or of just the page indexes in pages. Pages are extracted in the
+    shared pool, batched as if for workers processes (default: one per
+    CPU); workers=1 extracts them in the calling process instead.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        reader = _open(source)
+        for index in range(len(reader.pages)) if pages is None else pages:
+            yield reader.pages[index].extract_text()
+        return
+
+    pages = list(range(pdf_page_count(source, workers)) if pages is None else pages)
+    if not pages:
+        return
+
+    pool = shared_pool()
+    key = _document_key(source)
+    size = max(MIN_BATCH_PAGES, math.ceil(len(pages) / (BATCHES_PER_WORKER * workers)))
+    futures = [pool.submit(_extract_pages, key, source, pages[start:start + size])
+               for start in range(0, len(pages), size)]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def pdf_page_texts(source, workers=None):
+    """Text of every page of the PDF in source (bytes, or a file path), as a list."""
+    return list(iter_pdf_pages(source, workers))
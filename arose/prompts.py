@@ -0,0 +1,201 @@
+"""
+Prompt templates, the user prompts built on them, and per-call token accounting.
+
+Prompt files are read through a PromptRegistry, which keeps each template in
+memory and re-reads it only when the file's modification time or size
+changes, so edits to prompts/*.md still take effect without a restart.
+
+OpenAI caches the longest previously seen prefix of a request (from 1,024
+tokens), which cuts the latency and cost of the cached part. The user
+prompts built here are therefore laid out with everything static first:
+the system prompt, then the instructions and response schema, and only
+then the document text or data that changes from call to call.
+
+UsageLog records prompt, cached and completion tokens and latency for every
+call, so the effect of the prefix cache can be checked per call.
+"""
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+
+
+class PromptRegistry:
+    """Prompt templates by path, loaded once and reloaded when the file changes."""
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._templates.get(path)
+            if entry is None or entry[0] != version:
+                with open(path, "r") as f:
+                    entry = (version, f.read())
+                self._templates[path] = entry
+            return entry[1]
+
+
+# Shared by every caller in the process
+REGISTRY = PromptRegistry()
+
+
+def extraction_prompt(text, document_type):
+    """User prompt asking for the fields of one document."""
+    return f"""
+    Extract all relevant information from this {document_type} document.
+    Return the extracted information as a JSON object with all relevant fields as specified in the guidelines.
+
+    DOCUMENT TEXT:
+    {text}
+    """
+
+
+def chunk_extraction_prompt(text, document_type, part, total):
+    """User prompt for one chunk of a document too long to extract in one request."""
+    return f"""
+    Extract all relevant information from one part of this {document_type} document, which is too long
+    to send at once. Return the extracted information as a JSON object with all relevant fields as
+    specified in the guidelines. Use null for fields that do not appear in this part. List every
+    transaction that appears in this part, not only the most relevant ones, with its date, description,
+    amount and type.
+
+    DOCUMENT TEXT (part {part} of {total}):
+    {text}
+    """
+
+
+def missing_fields_prompt(text, document_type, fields):
+    """User prompt asking only for the fields a local parser could not resolve."""
+    return f"""
+    Extract only some fields from this {document_type} document. Return a JSON object with the structure
+    specified in the guidelines, with extracted_data containing only the fields listed below. Use null
+    for any of them that do not appear in the document.
+
+    FIELDS: {", ".join(fields)}
+
+    DOCUMENT TEXT:
+    {text}
+    """
+
+
+def appetite_prompt(transcript):
+    """User prompt asking for the appetite signals a lender states in one part of a call transcript."""
+    return f"""
+    Extract the lender's stated appetite from this part of a call between a broker and a lender.
+    Only count what the lender says; the broker's turns are context. Return a JSON object with the
+    structure specified in the guidelines, using null or an empty list for anything not stated here.
+
+    TRANSCRIPT:
+    {transcript}
+    """
+
+
+def verification_prompt(bank_statement_data, utility_bill_data, image_analyses=None):
+    """User prompt asking for a cross-check of the extracted bank statement and utility bill."""
+    # Prepare image analyses text if available
+    image_analyses_text = ""
+    if image_analyses and len(image_analyses) > 0:
+        image_analyses_text = "IMAGE ANALYSES:\n"
+        for i, analysis in enumerate(image_analyses):
+            image_analyses_text += f"\nImage {i+1}: {analysis['image_name']}\n"
+            image_analyses_text += f"Analysis Type: {analysis['analysis_type']}\n"
+            image_analyses_text += f"Model Used: {analysis['model_used']}\n"
+            image_analyses_text += f"Analysis Result:\n{analysis['analysis_result']}\n"
+            image_analyses_text += "-" * 50 + "\n"
+
+    return f"""
+    Compare and verify the bank statement and utility bill data given at the end.
+    Provide a detailed verification report highlighting any inconsistencies or issues.
+    Return the results as a JSON object with the following structure:
+    {{
+        "document_summary": "Brief overview of the documents analyzed",
+        "verification_results": [
+            {{
+                "field": "Field name (like name, address, etc)",
+                "bank_statement_value": "Value from bank statement",
+                "utility_bill_value": "Value from utility bill",
+                "match": true/false,
+                "notes": "Any notes about this comparison"
+            }}
+        ],
+        "discrepancies": [
+            {{
+                "field": "Field with discrepancy",
+                "description": "Description of the issue",
+                "severity": "high/medium/low",
+                "potential_risk": "Description of potential fraud risk if applicable"
+            }}
+        ],
+        "recommendations": [
+            "Recommendation 1",
+            "Recommendation 2"
+        ],
+        "verification_status": "approved/rejected/needs_review",
+        "confidence_score": "A number between 0-100 indicating confidence in verification"
+    }}
+
+    BANK STATEMENT DATA:
+    {json.dumps(bank_statement_data, indent=2)}
+
+    UTILITY BILL DATA:
+    {json.dumps(utility_bill_data, indent=2)}
+
+    {image_analyses_text}
+    """
+
+
+@dataclass(frozen=True)
+class CallUsage:
+    """Token counts and latency of one LLM call; from_cache marks answers from the local response cache."""
+    model: str
+    prompt_tokens: int
+    cached_tokens: int
+    completion_tokens: int
+    latency_ms: float
+    from_cache: bool = False
+
+
+def usage_from_response(model, response, latency_ms):
+    usage = response.usage
+    if usage is None:
+        return CallUsage(model, 0, 0, 0, latency_ms)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    return CallUsage(model, usage.prompt_tokens, cached, usage.completion_tokens, latency_ms)
+
+
+class UsageLog:
+    """Thread-safe list of CallUsage records with totals."""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def record(self, call):
+        with self._lock:
+            self.calls.append(call)
+
+    def to_frame(self):
+        with self._lock:
+            return pd.DataFrame([asdict(call) for call in self.calls], columns=list(CallUsage.__dataclass_fields__))
+
+    def summary(self):
+        frame = self.to_frame()
+        api_calls = frame[~frame["from_cache"].astype(bool)]
+        prompt_tokens = int(api_calls["prompt_tokens"].sum())
+        cached_tokens = int(api_calls["cached_tokens"].sum())
+        return {
+            "calls": len(frame),
+            "api_calls": len(api_calls),
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": int(api_calls["completion_tokens"].sum()),
+            "cached_share": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+            "mean_latency_ms": float(api_calls["latency_ms"].mean()) if len(api_calls) else 0.0,
+        }
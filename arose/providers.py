@@ -0,0 +1,335 @@
+"""
+Interchangeable backends for KYC extraction and verification.
+
+Every provider offers extract(text, document_type, system_prompt) and
+verify(bank_statement_data, utility_bill_data, image_analyses,
+system_prompt), returning the JSON shapes the KYC prompt describes:
+
+    OpenAIProvider     chat completions in JSON mode
+    AnthropicProvider  Claude messages, with the system prompt marked for
+                       prompt caching
+    LocalProvider      the rule-based parsers (statements.py,
+                       utility_bills.py) and a rule-based verification;
+                       no network, runs in milliseconds
+
+Router tries its providers cheapest first and returns the first result that
+meets a confidence threshold: "high" extraction confidence for extraction,
+a confidence_score for verification. A layout the local parsers know is
+then never sent to an LLM, and one they don't falls through to the next
+provider. A provider that fails (e.g. no API key) is skipped the same way.
+"""
+import json
+import re
+import time
+from datetime import date
+from functools import lru_cache
+
+from openai import OpenAI
+
+from arose.llm_cache import cache_key
+from arose.prompts import CallUsage, extraction_prompt, usage_from_response, verification_prompt
+from arose.statements import parse_statement
+from arose.utility_bills import parse_utility_bill
+
+DEFAULT_OPENAI_MODEL = "gpt-4-turbo"
+DEFAULT_ANTHROPIC_MODEL = "claude-3-5-haiku-latest"
+DEFAULT_MIN_VERIFICATION_CONFIDENCE = 80
+
+# Approximate USD per million input tokens, for ordering providers by cost
+MODEL_INPUT_COST = {
+    "gpt-4-turbo": 10.0,
+    "gpt-4o": 2.5,
+    "gpt-4o-mini": 0.15,
+    "claude-3-5-haiku-latest": 0.8,
+    "claude-3-5-sonnet-latest": 3.0,
+}
+_UNKNOWN_MODEL_COST = 10.0
+
+_CONFIDENCE_ORDER = ("low", "medium", "high")
+_MAX_ANTHROPIC_TOKENS = 4096
+
+# Days a utility bill may predate or postdate the bank statement and still count as current
+_MAX_DOCUMENT_GAP_DAYS = 90
+
+_TITLES = {"mr", "mrs", "ms", "miss", "mx", "dr"}
+
+
+class ProviderError(Exception):
+    """A provider answered, but not with something usable."""
+
+
+@lru_cache(maxsize=8)
+def shared_client(api_key, base_url=None):
+    """One OpenAI client per key, so calls reuse its pooled keep-alive connections."""
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+
+@lru_cache(maxsize=8)
+def shared_anthropic_client(api_key):
+    """One Anthropic client per key, pooled the same way as shared_client."""
+    import anthropic
+
+    return anthropic.Anthropic(api_key=api_key)
+
+
+class LLMProvider:
+    """complete_json with the response cache and usage log; subclasses implement _create."""
+    name = None
+
+    def __init__(self, api_key, model, cache=None, usage_log=None):
+        self.api_key = api_key
+        self.model = model
+        self.cache = cache
+        self.usage_log = usage_log
+
+    @property
+    def cost(self):
+        return MODEL_INPUT_COST.get(self.model, _UNKNOWN_MODEL_COST)
+
+    def _create(self, system_prompt, user_prompt, started):
+        """(response text, CallUsage) for one request."""
+        raise NotImplementedError
+
+    def complete_json(self, system_prompt, user_prompt):
+        started = time.perf_counter()
+        key = cache_key(self.model, system_prompt, user_prompt)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._record(CallUsage(self.model, 0, 0, 0, (time.perf_counter() - started) * 1000, from_cache=True))
+                return cached
+
+        content, usage = self._create(system_prompt, user_prompt, started)
+        self._record(usage)
+        result = json.loads(content)
+        if self.cache is not None:
+            self.cache.put(key, result, model=self.model)
+        return result
+
+    def _record(self, call):
+        if self.usage_log is not None:
+            self.usage_log.record(call)
+
+    def extract(self, text, document_type, system_prompt):
+        return self.complete_json(system_prompt, extraction_prompt(text, document_type))
+
+    def verify(self, bank_statement_data, utility_bill_data, image_analyses, system_prompt):
+        user_prompt = verification_prompt(bank_statement_data, utility_bill_data, image_analyses)
+        return self.complete_json(system_prompt, user_prompt)
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key, model=DEFAULT_OPENAI_MODEL, cache=None, usage_log=None):
+        super().__init__(api_key, model, cache, usage_log)
+
+    def _create(self, system_prompt, user_prompt, started):
+        response = shared_client(self.api_key).chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"}
+        )
+        usage = usage_from_response(self.model, response, (time.perf_counter() - started) * 1000)
+        return response.choices[0].message.content, usage
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+
+    def __init__(self, api_key, model=DEFAULT_ANTHROPIC_MODEL, cache=None, usage_log=None):
+        super().__init__(api_key, model, cache, usage_log)
+
+    def _create(self, system_prompt, user_prompt, started):
+        response = shared_anthropic_client(self.api_key).messages.create(
+            model=self.model,
+            max_tokens=_MAX_ANTHROPIC_TOKENS,
+            system=[{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+            messages=[{"role": "user", "content": user_prompt + "\nRespond with the JSON object only."}],
+        )
+        text = "".join(block.text for block in response.content if block.type == "text")
+        # Claude has no JSON mode; take the outermost object in case it adds a sentence around it
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            raise ProviderError(f"{self.model} replied without a JSON object")
+        content = text[start:end + 1]
+        cached = response.usage.cache_read_input_tokens or 0
+        usage = CallUsage(
+            self.model,
+            response.usage.input_tokens + cached + (response.usage.cache_creation_input_tokens or 0),
+            cached,
+            response.usage.output_tokens,
+            (time.perf_counter() - started) * 1000,
+        )
+        return content, usage
+
+
+def _name_parts(name):
+    words = [word.strip(".").lower() for word in (name or "").split()]
+    return [word for word in words if word and word not in _TITLES]
+
+
+def names_match(first, second):
+    """Same surname and compatible first names or initials ("J J Smith" matches "John Smith")."""
+    first, second = _name_parts(first), _name_parts(second)
+    if not first or not second or first[-1] != second[-1]:
+        return False
+    return first[0][0] == second[0][0] if len(first) > 1 and len(second) > 1 else True
+
+
+def _postcode(address):
+    match = re.search(r"([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})\s*$", (address or "").upper())
+    return f"{match.group(1)} {match.group(2)}" if match else None
+
+
+def _iso_date(text):
+    """date of an ISO "YYYY-MM-DD" string, or None for anything else extraction came up with."""
+    try:
+        return date.fromisoformat(text.strip()[:10])
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def _period_end(period):
+    dates = re.findall(r"\d{4}-\d{2}-\d{2}", period or "")
+    return _iso_date(dates[-1]) if dates else None
+
+
+class LocalProvider:
+    """Rule-based extraction and verification; no API key, no network."""
+    name = "local"
+    cost = 0.0
+
+    def extract(self, text, document_type, system_prompt=None):
+        if document_type == "bank statement":
+            return parse_statement(text).to_extraction()
+        if document_type == "utility bill":
+            return parse_utility_bill(text)
+        raise ValueError(f"No local parser for {document_type} documents")
+
+    def verify(self, bank_statement_data, utility_bill_data, image_analyses=None, system_prompt=None):
+        """
+        Compare name, postcode and dates of the two documents. The confidence
+        score is the share of comparisons that were made and agreed, so any
+        discrepancy or missing value keeps it below the Router's threshold and
+        the case goes on to an LLM; image analyses need an LLM to read them,
+        so they lower it to zero. Dates that are not ISO dates count as
+        missing.
+        """
+        bank = (bank_statement_data or {}).get("extracted_data") or {}
+        bill = (utility_bill_data or {}).get("extracted_data") or {}
+        bank_end = _period_end(bank.get("statement_period"))
+        bill_date = _iso_date(bill.get("bill_date"))
+
+        checks = [
+            ("name", bank.get("account_holder"), bill.get("account_holder"), names_match, "high",
+             "Names on the documents differ; the documents may belong to different people"),
+            ("postcode", _postcode(bank.get("address")), _postcode(bill.get("billing_address")),
+             lambda a, b: a == b, "medium", "Addresses differ; proof of address may not match the account"),
+            ("document dates", bank_end.isoformat() if bank_end else None, bill_date.isoformat() if bill_date else None,
+             lambda a, b: abs((date.fromisoformat(a) - date.fromisoformat(b)).days) <= _MAX_DOCUMENT_GAP_DAYS,
+             "medium", f"Documents are more than {_MAX_DOCUMENT_GAP_DAYS} days apart; one may be out of date"),
+        ]
+        results, discrepancies = [], []
+        for field, bank_value, bill_value, matches, severity, risk in checks:
+            comparable = bank_value is not None and bill_value is not None
+            match = comparable and matches(bank_value, bill_value)
+            results.append({
+                "field": field, "bank_statement_value": bank_value, "utility_bill_value": bill_value,
+                "match": match, "notes": "" if comparable else "Missing on at least one document",
+            })
+            if not match:
+                discrepancies.append({
+                    "field": field,
+                    "description": f"{field}: {bank_value!r} on the bank statement, {bill_value!r} on the utility bill",
+                    "severity": severity if comparable else "medium",
+                    "potential_risk": risk if comparable else "Could not be checked",
+                })
+
+        agreed = sum(result["match"] for result in results)
+        if any(d["severity"] == "high" for d in discrepancies):
+            status = "rejected"
+        else:
+            status = "needs_review" if discrepancies else "approved"
+        return {
+            "document_summary": "Rule-based comparison of the bank statement and utility bill",
+            "verification_results": results,
+            "discrepancies": discrepancies,
+            "recommendations": ["Request a current proof of address"] if discrepancies else [],
+            "verification_status": status,
+            "confidence_score": 0 if image_analyses else round(100 * agreed / len(results)),
+        }
+
+
+def _meets(result, min_confidence):
+    confidence = result.get("extraction_confidence")
+    return confidence in _CONFIDENCE_ORDER and _CONFIDENCE_ORDER.index(confidence) >= _CONFIDENCE_ORDER.index(min_confidence)
+
+
+class Router:
+    """Cheapest provider whose answer meets the confidence thresholds; the last one's answer otherwise."""
+    name = "auto"
+
+    def __init__(self, providers, min_confidence="high", min_verification_confidence=DEFAULT_MIN_VERIFICATION_CONFIDENCE):
+        self.providers = sorted(providers, key=lambda provider: provider.cost)
+        self.min_confidence = min_confidence
+        self.min_verification_confidence = min_verification_confidence
+
+    def _first_accepted(self, call, accept):
+        result = error = None
+        for provider in self.providers:
+            try:
+                result = call(provider)
+            except Exception as e:
+                error = e
+                continue
+            result.setdefault("provider", provider.name)
+            if accept(result):
+                return result
+        if result is None:
+            raise error
+        return result
+
+    def extract(self, text, document_type, system_prompt):
+        return self._first_accepted(
+            lambda provider: provider.extract(text, document_type, system_prompt),
+            lambda result: _meets(result, self.min_confidence),
+        )
+
+    def verify(self, bank_statement_data, utility_bill_data, image_analyses, system_prompt):
+        def confident(result):
+            try:
+                return float(result.get("confidence_score")) >= self.min_verification_confidence
+            except (TypeError, ValueError):
+                return False
+
+        return self._first_accepted(
+            lambda provider: provider.verify(bank_statement_data, utility_bill_data, image_analyses, system_prompt),
+            confident,
+        )
+
+
+# Backend names offered to users
+PROVIDER_NAMES = ("auto", "openai", "anthropic", "local")
+
+
+def build_provider(name, openai_api_key=None, anthropic_api_key=None, cache=None, usage_log=None,
+                   openai_model=DEFAULT_OPENAI_MODEL, anthropic_model=DEFAULT_ANTHROPIC_MODEL):
+    """A provider by name; "auto" routes across local and every LLM provider with an API key."""
+    llms = []
+    if openai_api_key:
+        llms.append(OpenAIProvider(openai_api_key, openai_model, cache, usage_log))
+    if anthropic_api_key:
+        llms.append(AnthropicProvider(anthropic_api_key, anthropic_model, cache, usage_log))
+
+    if name == "auto":
+        return Router([LocalProvider()] + llms)
+    if name == "local":
+        return LocalProvider()
+    provider = next((llm for llm in llms if llm.name == name), None)
+    if provider is None:
+        raise ValueError(f"No API key for the {name} provider")
+    return provider
@@ -0,0 +1,96 @@
+"""
+Range index over lender loan-size bounds and LTV-style caps.
+
+For each product section the lenders' minimum loans, maximum loans and caps
+are kept as sorted endpoint arrays. A query binary-searches every endpoint
+array, takes the narrowest candidate slice and checks the remaining
+conditions on those candidates only, so answering "who accepts a £1.395m
+loan at 90% LTV for refurbishment" costs O(log n + k) rather than a scan of
+every lender.
+"""
+import numpy as np
+
+
+class _SortedEndpoints:
+    """Lender positions ordered by one endpoint, lenders without a value left out."""
+
+    def __init__(self, values):
+        stated = np.flatnonzero(~np.isnan(values))
+        self.order = stated[np.argsort(values[stated], kind="stable")]
+        self.sorted_values = values[self.order]
+
+    def at_most(self, x):
+        return self.order[:np.searchsorted(self.sorted_values, x, side="right")]
+
+    def at_least(self, x):
+        return self.order[np.searchsorted(self.sorted_values, x, side="left"):]
+
+
+class RangeIndex:
+    """Loan-size range and cap index for one product section.
+
+    Only lenders that state a criterion can satisfy a query on it; a loan
+    range counts as stated when both ends are known.
+    """
+
+    def __init__(self, names, min_loan, max_loan, caps):
+        self.names = names
+        loan_stated = ~(np.isnan(min_loan) | np.isnan(max_loan))
+        self._min_loan = np.where(loan_stated, min_loan, np.nan)
+        self._max_loan = np.where(loan_stated, max_loan, np.nan)
+        self._by_min_loan = _SortedEndpoints(self._min_loan)
+        self._by_max_loan = _SortedEndpoints(self._max_loan)
+        self._caps = dict(caps)
+        self._by_cap = {name: _SortedEndpoints(values) for name, values in caps.items()}
+
+    def query(self, loan_amount=None, **limits):
+        """
+        Positions of lenders accepting the loan amount and every given cap
+        value, e.g. query(1395000, ltv=90, ltgdv=57). Returns an array of
+        lender positions in criteria file order.
+        """
+        slices = []
+        checks = []
+        if loan_amount is not None:
+            slices.append(self._by_min_loan.at_most(loan_amount))
+            slices.append(self._by_max_loan.at_least(loan_amount))
+            checks.append(lambda lenders: self._min_loan[lenders] <= loan_amount)
+            checks.append(lambda lenders: self._max_loan[lenders] >= loan_amount)
+        for name, value in limits.items():
+            if value is None:
+                continue
+            if name not in self._caps:
+                raise ValueError(f"Unknown cap: {name}")
+            caps = self._caps[name]
+            slices.append(self._by_cap[name].at_least(value))
+            checks.append(lambda lenders, caps=caps, value=value: caps[lenders] >= value)
+
+        if not slices:
+            return np.arange(len(self.names))
+
+        # Start from the narrowest slice and filter it by every condition
+        candidates = min(slices, key=len)
+        for check in checks:
+            candidates = candidates[check(candidates)]
+        return np.sort(candidates)
+
+    def accepting(self, loan_amount=None, **limits):
+        """Names of the lenders returned by query()."""
+        return self.names[self.query(loan_amount, **limits)]
+
+
+def build_range_indexes(matrix):
+    """One RangeIndex per product section of a LenderMatrix."""
+    return {
+        section: RangeIndex(
+            matrix.names,
+            matrix.min_loan[:, p],
+            matrix.max_loan[:, p],
+            {
+                "ltv": matrix.max_ltv[:, p],
+                "ltpp": matrix.max_ltpp[:, p],
+                "ltgdv": matrix.max_ltgdv[:, p],
+            },
+        )
+        for p, section in enumerate(matrix.products)
+    }
@@ -0,0 +1,158 @@
+"""
+Client-side rate limiting and adaptive concurrency for LLM calls.
+
+RateLimiter keeps two asyncio token buckets, one of requests and one of
+tokens, each refilling continuously at its per-minute budget. A bucket holds
+only burst_seconds' worth, because the API enforces its limits over windows
+much shorter than a minute: a full minute's burst up front is rejected. A
+caller waits until both can cover its request instead of letting the API
+reject it with a 429. Token costs are estimated up front and settled against
+the usage the API reports, and the budgets follow the x-ratelimit-* headers
+of every response, so the limiter converges on the account's real quota
+even when it was configured too high or too low.
+
+AdaptiveConcurrency bounds the requests in flight with additive increase,
+multiplicative decrease: the limit halves on every 429 and grows by one
+after a full limit's worth of successes in a row, up to its maximum.
+"""
+import asyncio
+import re
+import time
+
+# Longest burst a bucket allows, in seconds of its budget
+DEFAULT_BURST_SECONDS = 1.0
+
+_MAX_SLEEP_SECONDS = 0.1
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(text):
+    """Seconds in an OpenAI reset header value such as "20ms", "1.5s" or "6m0s"; None if unparseable."""
+    parts = _DURATION_PART.findall(text or "")
+    if not parts:
+        return None
+    return sum(float(value) * _DURATION_SECONDS[unit] for value, unit in parts)
+
+
+def retry_after(headers):
+    """Seconds the server asked us to wait (retry-after-ms, retry-after or the reset headers), or None."""
+    if headers is None:
+        return None
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    resets = [parse_duration(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+class _Bucket:
+    """Budget per minute refilling continuously; not locked, RateLimiter serialises access."""
+
+    def __init__(self, per_minute, burst_seconds):
+        self.burst_seconds = burst_seconds
+        self.set_budget(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def set_budget(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * self.burst_seconds)
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # A request larger than the bucket waits for a full one and leaves it in debt, so later ones pay
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+
+class RateLimiter:
+    """Request and token budgets per minute; tokens_per_minute None limits requests only."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, burst_seconds=DEFAULT_BURST_SECONDS):
+        self.requests = _Bucket(requests_per_minute, burst_seconds)
+        self.tokens = _Bucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens=0):
+        """Wait until one request costing tokens fits both budgets, then take it from them."""
+        buckets = [(self.requests, 1)] + ([(self.tokens, tokens)] if self.tokens is not None else [])
+        async with self._lock:
+            while True:
+                for bucket, _ in buckets:
+                    bucket.refill()
+                wait = max([self._paused_until - time.monotonic()] +
+                           [bucket.wait_time(amount) for bucket, amount in buckets])
+                if wait <= 0:
+                    break
+                # Wake up regularly: settle() may refund tokens before the computed wait is over
+                await asyncio.sleep(min(wait, _MAX_SLEEP_SECONDS))
+            for bucket, amount in buckets:
+                bucket.level -= amount
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once a request's actual token usage is known."""
+        if self.tokens is not None and actual is not None:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+
+    def pause(self, seconds):
+        """Hold every acquire for seconds, e.g. after a 429 with retry-after."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Adopt the limits and remaining budgets reported in x-ratelimit-* response headers."""
+        if headers is None:
+            return
+        for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            if bucket is None:
+                continue
+            limit = headers.get(f"x-ratelimit-limit-{name}")
+            remaining = headers.get(f"x-ratelimit-remaining-{name}")
+            if limit:
+                bucket.set_budget(float(limit))
+            if remaining:
+                bucket.refill()
+                bucket.level = min(bucket.level, float(remaining))
+
+
+class AdaptiveConcurrency:
+    """Async context manager limiting requests in flight; the limit adapts between 1 and maximum."""
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = maximum
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._successes = 0
+
+    def on_rate_limited(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self._successes = 0
@@ -0,0 +1,385 @@
+"""
+Offline search over lender call transcripts and criteria notes.
+
+Brokers ask questions such as "who does revolving facilities for
+first-time developers?" whose answers sit in the call transcripts and in
+the criteria sheet. SearchIndex answers them without a network:
+
+    passages    transcripts are cut into runs of speaker turns (see
+                transcripts.py); the criteria sheet gives one passage per
+                lender listing the fields flagged "Y", and one per lender
+                and section of its free-text cells ("Valuation Panel: VAS
+                Panel")
+    BM25        a sparse passage x term matrix of precomputed BM25 weights,
+                so a query sums a few columns
+    embeddings  optional: with sentence-transformers installed, passages are
+                also embedded on the CPU and the two rankings are combined by
+                reciprocal rank fusion
+
+The index lives in a directory: a JSON manifest of sources and passages and,
+when embeddings are used, a raw float32 matrix read through np.memmap, so
+opening the index does not load the vectors into memory. Sources are
+content-addressed: adding an unchanged transcript is a no-op, a changed one
+retires its old passages, and new vectors are appended to the end of the
+matrix rather than rewriting it. build_search_index also retires the
+passages of transcripts that are gone and then compacts the index, so
+retired passages and their vectors do not accumulate across rebuilds.
+"""
+import json
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from scipy import sparse
+
+from arose.transcripts import file_sha256, iter_turn_chunks, iter_turns, lender_from_filename
+
+DEFAULT_INDEX_DIR = "data/.cache/search"
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_PASSAGE_TOKENS = 200
+DEFAULT_TOP_K = 5
+
+# Bump when passages or the manifest layout change so stale indexes are rebuilt
+INDEX_VERSION = 1
+
+# Standard BM25 parameters; k1 saturates term frequency, b normalises length
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Reciprocal rank fusion constant; larger values flatten the head of each ranking
+RRF_K = 60
+
+TRANSCRIPT = "transcript"
+CRITERIA = "criteria"
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its of on or so that "
+    "the their them they this to was we what which who will with would you your".split()
+)
+# A free-text criteria cell has at least this many words beyond a flag
+_MIN_TEXT_WORDS = 2
+
+
+def tokenize(text):
+    """Lowercase word stems without stopwords; plurals fold onto the singular."""
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+@dataclass(frozen=True)
+class Passage:
+    """A searchable piece of a source; location says where in it (turns or criteria section)."""
+    source: str
+    lender: str
+    kind: str
+    location: str
+    text: str
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    passage: Passage
+    score: float
+
+
+def transcript_passages(path, max_tokens=DEFAULT_PASSAGE_TOKENS):
+    lender = lender_from_filename(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for turns in iter_turn_chunks(iter_turns(f), max_tokens):
+            first, last = turns[0].index, turns[-1].index
+            yield Passage(
+                source=os.path.basename(path),
+                lender=lender,
+                kind=TRANSCRIPT,
+                location=f"turn {first}" if first == last else f"turns {first}-{last}",
+                text="\n".join(f"{turn.speaker}: {turn.text}" for turn in turns),
+            )
+
+
+def criteria_passages(criteria, source="lender_criteria.csv"):
+    """
+    Per lender: one passage of every field flagged "Y", so a query can match
+    a product and a borrower type together, and one per section of its
+    free-text cells.
+    """
+    entries = [entry for entry in criteria.schema if entry["kind"] != "name"]
+    name_column = criteria.frame.columns[0]
+    for _, row in criteria.frame.iterrows():
+        lender = str(row[name_column]).strip()
+        flags, notes = {}, {}
+        for entry in entries:
+            cell = row[entry["column"]]
+            if not isinstance(cell, str) or not cell.strip():
+                continue
+            cell = " ".join(cell.split())
+            if cell.upper() == "Y":
+                flags.setdefault(entry["section"], []).append(entry["field"])
+            elif len(re.findall(r"[A-Za-z]{3,}", cell)) >= _MIN_TEXT_WORDS:
+                notes.setdefault(entry["section"], []).append(f"{entry['field']}: {cell}")
+        if flags:
+            text = "; ".join(f"{section}: {', '.join(fields)}" for section, fields in flags.items())
+            yield Passage(source, lender, CRITERIA, "accepted criteria", f"{lender} accepts {text}")
+        for section, parts in notes.items():
+            yield Passage(source, lender, CRITERIA, section, f"{lender} {section}: " + "; ".join(parts))
+
+
+class Embedder:
+    """CPU sentence embeddings, unit-normalised; needs the optional sentence-transformers package."""
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts):
+        vectors = self._model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def load_embedder(model_name=DEFAULT_EMBEDDING_MODEL):
+    """An Embedder, or None when sentence-transformers or the model is unavailable."""
+    try:
+        return Embedder(model_name)
+    except Exception:
+        return None
+
+
+class SearchIndex:
+    """BM25 (plus optional embedding) index of passages stored under directory; safe to share between threads."""
+
+    def __init__(self, directory=DEFAULT_INDEX_DIR, embedder=None):
+        self.directory = directory
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        os.makedirs(directory, exist_ok=True)
+        self._manifest = self._read_manifest()
+        self.passages = [Passage(**passage) for passage in self._manifest["passages"]]
+        self._vectors = None
+        if self.embedder is not None:
+            self._sync_vectors()
+        self._open_vectors()
+        self._build_bm25()
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is None or manifest.get("index_version") != INDEX_VERSION:
+            manifest = {"index_version": INDEX_VERSION, "sources": {}, "passages": [], "retired": [], "vectors": None}
+            if os.path.exists(self._vectors_path):
+                os.remove(self._vectors_path)
+        meta = manifest["vectors"]
+        if meta and meta["rows"]:
+            expected_bytes = meta["rows"] * meta["dim"] * np.dtype(np.float32).itemsize
+            if not os.path.exists(self._vectors_path) or os.path.getsize(self._vectors_path) != expected_bytes:
+                # Interrupted write or compaction; the vectors are embedded again on the next sync
+                manifest["vectors"] = None
+                if os.path.exists(self._vectors_path):
+                    os.remove(self._vectors_path)
+        return manifest
+
+    def _write_manifest(self):
+        self._manifest["passages"] = [asdict(passage) for passage in self.passages]
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _open_vectors(self):
+        meta = self._manifest["vectors"]
+        self._vectors = None
+        if meta and meta["rows"]:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(meta["rows"], meta["dim"]))
+
+    def _append_vectors(self, passages):
+        """Embed passages onto the end of the matrix; rows line up with self.passages."""
+        vectors = self.embedder.encode(passage.text for passage in passages)
+        with open(self._vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors).tobytes())
+        meta = self._manifest["vectors"]
+        meta["rows"] += len(passages)
+        meta["dim"] = int(vectors.shape[1])
+
+    def _sync_vectors(self):
+        """Re-embed everything if the stored vectors come from another model, else embed missing rows."""
+        meta = self._manifest["vectors"]
+        if meta is None or meta["model"] != self.embedder.model_name:
+            self._vectors = None
+            if os.path.exists(self._vectors_path):
+                os.remove(self._vectors_path)
+            self._manifest["vectors"] = meta = {"model": self.embedder.model_name, "rows": 0, "dim": 0}
+        if meta["rows"] < len(self.passages):
+            self._append_vectors(self.passages[meta["rows"]:])
+            self._write_manifest()
+
+    def _build_bm25(self):
+        """Passage x term matrix of BM25 weights (CSC, so a query reads whole columns); retired rows are zero."""
+        retired = set(self._manifest["retired"])
+        self.vocabulary = {}
+        rows, columns, counts = [], [], []
+        lengths = np.zeros(len(self.passages))
+        for row, passage in enumerate(self.passages):
+            if row in retired:
+                continue
+            tokens = tokenize(passage.text)
+            lengths[row] = len(tokens)
+            for term, count in zip(*np.unique(tokens, return_counts=True)):
+                rows.append(row)
+                columns.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                counts.append(count)
+        live = len(self.passages) - len(retired)
+        if not counts:
+            self._weights = sparse.csc_matrix((len(self.passages), 0))
+            return
+
+        rows, columns, counts = np.array(rows), np.array(columns), np.array(counts, dtype=float)
+        document_frequency = np.bincount(columns, minlength=len(self.vocabulary))
+        idf = np.log(1 + (live - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.sum() / live
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / average_length)
+        weights = idf[columns] * counts * (BM25_K1 + 1) / (counts + norm)
+        self._weights = sparse.csc_matrix((weights, (rows, columns)), shape=(len(self.passages), len(self.vocabulary)))
+
+    @property
+    def sources(self):
+        return dict(self._manifest["sources"])
+
+    def add_source(self, source, digest, passages):
+        """
+        Index passages of a source under its content digest. Returns the
+        number of passages added: 0 if the source is already indexed with
+        this digest; a changed source replaces its old passages.
+        """
+        with self._lock:
+            known = self._manifest["sources"].get(source)
+            if known is not None and known["digest"] == digest:
+                return 0
+            if known is not None:
+                self._manifest["retired"].extend(known["rows"])
+            passages = list(passages)
+            start = len(self.passages)
+            self.passages.extend(passages)
+            self._manifest["sources"][source] = {"digest": digest, "rows": list(range(start, len(self.passages)))}
+            if self.embedder is not None and passages:
+                self._append_vectors(passages)
+            self._write_manifest()
+            self._open_vectors()
+            self._build_bm25()
+            return len(passages)
+
+    def remove_source(self, source):
+        """Retire every passage of source, e.g. a transcript that was deleted."""
+        with self._lock:
+            known = self._manifest["sources"].pop(source, None)
+            if known is None:
+                return 0
+            self._manifest["retired"].extend(known["rows"])
+            self._write_manifest()
+            self._build_bm25()
+            return len(known["rows"])
+
+    def compact(self):
+        """
+        Drop retired passages and their vectors, renumbering the rest.
+        Returns the number of passages dropped.
+        """
+        with self._lock:
+            retired = set(self._manifest["retired"])
+            if not retired:
+                return 0
+            keep = [row for row in range(len(self.passages)) if row not in retired]
+            new_row = {row: position for position, row in enumerate(keep)}
+
+            meta = self._manifest["vectors"]
+            if self._vectors is not None:
+                # Rows with vectors are a prefix of the passages, so the kept ones stay a prefix
+                kept_vectors = np.asarray(self._vectors[[row for row in keep if row < meta["rows"]]])
+                self._vectors = None
+                tmp_path = f"{self._vectors_path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(np.ascontiguousarray(kept_vectors).tobytes())
+                os.replace(tmp_path, self._vectors_path)
+                meta["rows"] = len(kept_vectors)
+
+            self.passages = [self.passages[row] for row in keep]
+            for known in self._manifest["sources"].values():
+                known["rows"] = [new_row[row] for row in known["rows"]]
+            self._manifest["retired"] = []
+            self._write_manifest()
+            self._open_vectors()
+            self._build_bm25()
+            return len(retired)
+
+    def add_transcript(self, path):
+        return self.add_source(os.path.basename(path), file_sha256(path), transcript_passages(path))
+
+    def add_criteria(self, criteria, source="lender_criteria.csv"):
+        return self.add_source(source, criteria.source_sha256, criteria_passages(criteria, source))
+
+    def _bm25_scores(self, query):
+        columns = [self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary]
+        if not columns:
+            return np.zeros(len(self.passages))
+        return np.asarray(self._weights[:, columns].sum(axis=1)).ravel()
+
+    def search(self, query, k=DEFAULT_TOP_K, kind=None, lender=None):
+        """Top k passages for query, best first, optionally only of one kind or lender."""
+        with self._lock:
+            passages, vectors = self.passages, self._vectors
+            scores = self._bm25_scores(query)
+            live = np.ones(len(passages), dtype=bool)
+            live[self._manifest["retired"]] = False
+        for i, passage in enumerate(passages):
+            if (kind is not None and passage.kind != kind) or (lender is not None and passage.lender != lender):
+                live[i] = False
+
+        if self.embedder is not None and vectors is not None and len(vectors) == len(passages):
+            similarity = np.asarray(vectors @ self.embedder.encode([query])[0])
+            # Fuse the two rankings; only passages either ranking finds relevant take part
+            fused = np.zeros(len(passages))
+            for ranking_scores, relevant in ((scores, scores > 0), (similarity, similarity > 0)):
+                order = np.argsort(-ranking_scores, kind="stable")
+                ranks = np.empty(len(order))
+                ranks[order] = np.arange(1, len(order) + 1)
+                fused += np.where(relevant, 1.0 / (RRF_K + ranks), 0.0)
+            scores = fused
+
+        candidates = np.flatnonzero(live & (scores > 0))
+        top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+        return [SearchHit(passages[i], float(scores[i])) for i in top]
+
+
+def build_search_index(transcripts, criteria=None, directory=DEFAULT_INDEX_DIR, embedder=None):
+    """
+    A SearchIndex brought up to date with transcripts (paths) and criteria;
+    unchanged sources are skipped, transcripts no longer given are removed
+    and the index is then compacted.
+    """
+    index = SearchIndex(directory, embedder)
+    transcripts = list(transcripts)
+    current = {os.path.basename(path) for path in transcripts}
+    for source, known in index.sources.items():
+        if source not in current and known["rows"] and index.passages[known["rows"][0]].kind == TRANSCRIPT:
+            index.remove_source(source)
+    for path in transcripts:
+        index.add_transcript(path)
+    if criteria is not None:
+        index.add_criteria(criteria)
+    index.compact()
+    return index
@@ -0,0 +1,261 @@
+"""
+Local, rule-based bank statement parser.
+
+Most of what the KYC prompt asks for on a bank statement is tabular text
+that PyPDF2 already extracts. A StatementProfile describes one bank's layout
+with regular expressions; parse_statement picks the matching profile, reads
+the header fields, and parses transaction lines into a typed DataFrame.
+
+Transaction lines rarely say whether an amount is money in or out, so each
+candidate line is checked against the running balance: a line is accepted
+only if the previous balance plus or minus its amount gives the balance it
+states, which also settles its direction and filters out look-alike lines
+from fee tables and small print. Totals are then computed locally, and only
+fields the parser could not resolve need to go to the LLM.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Fields the KYC prompt asks for on a bank statement
+BANK_STATEMENT_FIELDS = (
+    "account_holder", "bank_name", "account_number", "account_type", "statement_period",
+    "opening_balance", "closing_balance", "total_deposits", "total_withdrawals", "transactions",
+)
+
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1
+)}
+_AMOUNT = r"-?[\d,]+\.\d{2}"
+_HOLDER_PATTERN = re.compile(r"^\s*((?:Mr|Mrs|Ms|Miss|Mx|Dr)\.?\s+[A-Z][\w .'-]+?)\s*$", re.M)
+_POSTCODE_PATTERN = re.compile(r"\b([A-Z]{1,2}\d[A-Z\d]?\s*\d[A-Z]{2})\s*$")
+# Address lines read after the holder's name before giving up on finding a postcode
+_MAX_ADDRESS_LINES = 6
+_BALANCE_TOLERANCE = 0.005
+
+
+@dataclass(frozen=True)
+class StatementProfile:
+    """Regular expressions describing one bank's statement layout.
+
+    transaction must define the groups description, amount and balance, and
+    either day and month ("23 Nov") or date ("23/11/2024"); a line without a
+    date inherits the previous transaction's. The header patterns each
+    capture one value in group 1; any may be None when the layout lacks it.
+    """
+    bank_name: str
+    detect: re.Pattern
+    transaction: re.Pattern
+    opening_balance: re.Pattern = None
+    closing_balance: re.Pattern = None
+    account_number: re.Pattern = None
+    account_type: re.Pattern = None
+    statement_date: re.Pattern = None
+    period_start: re.Pattern = None
+
+
+NATIONWIDE = StatementProfile(
+    bank_name="Nationwide Building Society",
+    detect=re.compile(r"Nationwide\s*Building\s*Society", re.I),
+    transaction=re.compile(
+        r"^(?:(?P<day>\d{1,2})\s(?P<month>[A-Z][a-z]{2}))?(?P<description>\D.*?)\s"
+        rf"(?P<amount>{_AMOUNT})\s(?P<balance>{_AMOUNT})",
+        re.M,
+    ),
+    opening_balance=re.compile(rf"Start\s*balance\s*£?({_AMOUNT})", re.I),
+    closing_balance=re.compile(rf"End\s*balance\s*£?({_AMOUNT})", re.I),
+    account_number=re.compile(r"Account\s*no\s*(\d{6,})", re.I),
+    account_type=re.compile(r"Your\s+(\w+)\s+account", re.I),
+    statement_date=re.compile(r"Statement\s+(\d{1,2}\s+[A-Z][a-z]+\s+\d{4})"),
+    period_start=re.compile(r"Balance\s+from\s+statement\s+\d+\s+dated\s+(\d{2}/\d{2}/\d{4})", re.I),
+)
+
+# Fallback for layouts without a profile: "dd/mm/yyyy description amount balance"
+GENERIC = StatementProfile(
+    bank_name=None,
+    detect=re.compile(r""),
+    transaction=re.compile(
+        r"^\s*(?P<date>\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2})\s+(?P<description>.+?)\s+"
+        rf"£?(?P<amount>{_AMOUNT})\s+£?(?P<balance>{_AMOUNT})\s*(?:CR|DR)?\s*$",
+        re.M,
+    ),
+    opening_balance=re.compile(rf"(?:Opening|Start|Previous|Brought\s+forward)\s*balance\D{{0,20}}({_AMOUNT})", re.I),
+    closing_balance=re.compile(rf"(?:Closing|End|New|Carried\s+forward)\s*balance\D{{0,20}}({_AMOUNT})", re.I),
+    account_number=re.compile(r"Account\s*(?:no|number)\.?:?\s*(\d{6,})", re.I),
+)
+
+# Checked in order; the first profile whose detect pattern matches is used
+PROFILES = (NATIONWIDE, GENERIC)
+
+
+@dataclass
+class ParsedStatement:
+    """Header fields, a typed transactions frame and the fields left unresolved."""
+    profile: StatementProfile
+    fields: dict
+    transactions: pd.DataFrame
+    warnings: list = field(default_factory=list)
+
+    @property
+    def missing(self):
+        resolved = dict(self.fields, transactions=None if self.transactions.empty else True)
+        return [name for name in BANK_STATEMENT_FIELDS if resolved.get(name) is None]
+
+    def to_extraction(self):
+        """The result in the JSON shape the KYC prompt asks the LLM for."""
+        transactions = [
+            {
+                "date": row.date.strftime("%Y-%m-%d") if not pd.isna(row.date) else None,
+                "description": row.description,
+                "amount": abs(row.amount),
+                "type": "credit" if row.amount > 0 else "debit",
+            }
+            for row in self.transactions.itertuples()
+        ]
+        data = dict(self.fields, transactions=transactions or None)
+        return {
+            "document_type": "bank statement",
+            "extraction_confidence": "high" if not self.missing else "medium",
+            "extracted_data": data,
+            "missing_fields": self.missing,
+            "warnings": list(self.warnings),
+        }
+
+
+def _number(text):
+    return float(text.replace(",", ""))
+
+
+def _search(pattern, text):
+    if pattern is None:
+        return None
+    match = pattern.search(text)
+    return match.group(1).strip() if match else None
+
+
+def _parse_date(text, formats=("%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%d %B %Y", "%d %b %Y")):
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def holder_and_address(text):
+    """
+    The first "Mr/Mrs/... Name" line on its own and the address lines under
+    it, up to and including a UK postcode, as (name, "line, line, POSTCODE");
+    either may be None.
+    """
+    match = _HOLDER_PATTERN.search(text)
+    if not match:
+        return None, None
+    lines = []
+    for line in text[match.end():].lstrip("\n").splitlines()[:_MAX_ADDRESS_LINES]:
+        line = line.strip()
+        if not line:
+            break
+        lines.append(line.title() if line.isupper() and not _POSTCODE_PATTERN.search(line) else line)
+        if _POSTCODE_PATTERN.search(line):
+            return match.group(1), ", ".join(lines)
+    return match.group(1), None
+
+
+def detect_profile(text):
+    return next(profile for profile in PROFILES if profile.detect.search(text))
+
+
+def _transaction_date(match, statement_date, previous):
+    groups = match.groupdict()
+    if groups.get("date"):
+        return _parse_date(groups["date"])
+    if groups.get("day") and groups.get("month"):
+        month = _MONTHS.get(groups["month"].lower())
+        if month is None:
+            return previous
+        year = statement_date.year if statement_date else date.today().year
+        # A month after the statement month belongs to the previous year
+        if statement_date and month > statement_date.month:
+            year -= 1
+        return date(year, month, int(groups["day"]))
+    return previous
+
+
+def parse_transactions(profile, text, opening_balance, statement_date=None):
+    """
+    Transactions whose stated balance follows from the running balance, as
+    a DataFrame with columns date, description, amount (positive in,
+    negative out) and balance. Without an opening balance the first
+    candidate line only seeds the running balance, since its direction
+    can't be told.
+    """
+    rows = []
+    balance = opening_balance
+    previous_date = None
+    for match in profile.transaction.finditer(text):
+        amount = _number(match.group("amount"))
+        stated = _number(match.group("balance"))
+        transaction_date = _transaction_date(match, statement_date, previous_date)
+
+        if balance is None:
+            balance = stated
+            continue
+        if abs(balance + amount - stated) <= _BALANCE_TOLERANCE:
+            signed = amount
+        elif abs(balance - amount - stated) <= _BALANCE_TOLERANCE:
+            signed = -amount
+        else:
+            continue
+
+        rows.append((transaction_date, match.group("description").strip(), signed, stated))
+        balance = stated
+        previous_date = transaction_date
+
+    frame = pd.DataFrame(rows, columns=["date", "description", "amount", "balance"])
+    frame["date"] = pd.to_datetime(frame["date"])
+    return frame.astype({"description": object, "amount": float, "balance": float})
+
+
+def parse_statement(text):
+    """Parse bank statement text with the first matching profile."""
+    profile = detect_profile(text)
+    statement_date = _parse_date(_search(profile.statement_date, text) or "")
+    period_start = _parse_date(_search(profile.period_start, text) or "")
+
+    opening = _search(profile.opening_balance, text)
+    closing = _search(profile.closing_balance, text)
+    opening = _number(opening) if opening else None
+    closing = _number(closing) if closing else None
+
+    transactions = parse_transactions(profile, text, opening, statement_date)
+    amounts = transactions["amount"].to_numpy()
+    warnings = []
+
+    if closing is None and len(transactions):
+        closing = float(transactions["balance"].iloc[-1])
+    if opening is not None and closing is not None and len(transactions):
+        if abs(opening + np.sum(amounts) - closing) > _BALANCE_TOLERANCE:
+            warnings.append("Parsed transactions do not reconcile the opening and closing balances")
+
+    account_number = _search(profile.account_number, text)
+    holder, address = holder_and_address(text)
+    fields = {
+        "account_holder": holder,
+        "address": address,
+        "bank_name": profile.bank_name,
+        # Only the last 4 digits, as the KYC prompt asks
+        "account_number": f"****{account_number[-4:]}" if account_number else None,
+        "account_type": _search(profile.account_type, text),
+        "statement_period": (
+            f"{period_start.isoformat()} to {statement_date.isoformat()}" if period_start and statement_date else None
+        ),
+        "opening_balance": opening,
+        "closing_balance": closing,
+        "total_deposits": round(float(np.clip(amounts, 0, None).sum()), 2) if len(amounts) else None,
+        "total_withdrawals": round(abs(float(np.clip(amounts, None, 0).sum())), 2) if len(amounts) else None,
+    }
+    return ParsedStatement(profile=profile, fields=fields, transactions=transactions, warnings=warnings)
@@ -0,0 +1,489 @@
+"""
+Lender appetite signals from recorded call transcripts.
+
+data/ holds "Appetite & Policy" call transcripts between a broker and a
+lender's BDM: a speaker label on its own line, then that speaker's turn. An
+ingestion streams the file line by line through three stages, each a
+generator feeding the next:
+
+    iter_turns         speaker turns, in order
+    iter_turn_chunks   runs of whole turns under a token budget; a turn over
+                       budget is split between sentences
+    extraction         max LTV, preferred products, regions and turnaround
+                       per chunk, run on a thread pool
+
+Only what the lender says counts: the broker also quotes other lenders'
+terms ("they gave us 90% net loan to value"), so the broker's turns are kept
+for context but never yield a signal. The broker is the speaker labelled
+Arose, or, on transcripts with anonymous labels, the speaker who names Arose
+most often.
+
+Within the lender's turns a product or region only counts in a sentence
+where the lender speaks for itself ("we", "our") about doing it, and not in
+one that refuses it, hedges ("we might go semi commercial next year") or
+describes other lenders. An LTV figure is tied to the product named in the
+same sentence (product_ltvs); max_ltv, the highest figure stated anywhere,
+is only reported.
+
+Chunks are extracted with the local rules below, or with an LLM provider
+(see providers.py) when one is passed. The per-chunk results are merged
+into one AppetiteSignals per lender, with the quotes they came from, and
+criteria_overrides proposes changes to the compiled criteria from them. A
+proposal only fills what the sheet leaves open or tightens it: stated
+products set Borrowing Type flags, and regions Coverage flags (the English
+regions count as England), only where the sheet's cell is blank or TBC, and
+a product's stated LTV only lowers that product's cap or fills a blank one,
+for products the lender offers. The stored sheet is never changed; the
+matching page applies the proposals for the lenders a broker opts into,
+through criteria.with_overrides. Turnaround has no criteria column the
+matcher reads and is only reported.
+
+Results are cached under the SHA-256 of the transcript, the extractor, the
+chunk budget and, for an LLM provider, the prompt, so re-ingesting an
+unchanged transcript reads the cache and does no chunking or extraction at
+all.
+"""
+import hashlib
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+import pandas as pd
+
+from arose.chunking import count_tokens
+from arose.llm_cache import cache_key
+from arose.matching import BORROWING_TYPE_SECTIONS, CAP_UNITS, MAX_LTV_FIELDS
+from arose.prompts import REGISTRY, appetite_prompt
+
+DEFAULT_TRANSCRIPT_DIR = "data"
+DEFAULT_TRANSCRIPT_PROMPT = "prompts/lender_appetite_prompt.md"
+DEFAULT_TRANSCRIPT_CHUNK_TOKENS = 1500
+DEFAULT_TRANSCRIPT_WORKERS = 4
+
+# Bump when extraction or merging changes so cached results are recomputed
+INGEST_VERSION = 2
+
+# Transcript files as exported from the call recorder
+TRANSCRIPT_PATTERN = re.compile(r"_Transcript\.txt$", re.I)
+
+# A speaker label on its own line: "Arose Finance", "Speaker 2", "Unknown Speaker"
+_SPEAKER_LINE = re.compile(r"^(Arose Finance|Speaker \d+|Unknown Speaker)\s*$")
+_BROKER_LABEL = re.compile(r"arose", re.I)
+_LENDER_IN_NAME = re.compile(r"Lender\s*(\d+)", re.I)
+_SENTENCE_END = re.compile(r"(?<=[.?!])\s+")
+
+# "75% gross loan to value", "80% net day one", "70% LTV"; loan to cost and to GDV are other limits
+_LTV = re.compile(
+    r"\b(\d{2,3}(?:\.\d+)?)\s*(?:%|per\s*cent)\s*(?:(?:max(?:imum)?|net|gross|day\s+one)\s+){0,3}"
+    r"(?:loan\s+to\s+value|ltv|day\s+one)\b",
+    re.I,
+)
+_NUMBER_WORDS = {
+    "a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "fourteen": 14, "twenty": 20, "twenty eight": 28, "thirty": 30,
+}
+_TURNAROUND = re.compile(
+    r"\b(\d+(?:\.\d+)?|" + "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r")"
+    r"(\s+and\s+a\s+half)?\s*(?:-|\s)?(?:working\s+)?(days?|weeks?)\b(?!\s+(?:ago|late|early))",
+    re.I,
+)
+# A duration only counts as a turnaround near words about getting a loan out, and not "two weeks ago"
+_TURNAROUND_CONTEXT = re.compile(r"turn\s*around|complet|funds?\s+out|offer|draw\s*down|application|auction", re.I)
+_TURNAROUND_WINDOW = 80
+_MAX_TURNAROUND_DAYS = 90
+
+# A lender sentence states appetite when the lender speaks for itself...
+_OWN_VOICE = re.compile(r"\b(?:we|we're|we'll|we've|we'd|our|us)\b", re.I)
+# ...and neither refuses, hedges nor talks about someone else's terms
+_NOT_APPETITE = re.compile(
+    r"\b(?:not|no|never|nothing|cannot|no longer|might|maybe|perhaps|hopefully|next year|eventually)\b|n't\b",
+    re.I,
+)
+_OTHER_LENDERS = re.compile(r"\b(?:other lenders?|everyone else|competitors?|elsewhere|high street)\b", re.I)
+
+# Products by the criteria sheet's section names, with the phrases lenders use for them
+PRODUCT_KEYWORDS = {
+    "Unregulated Bridging": (r"bridging", r"(?:standard|residential|commercial) bridges?", r"bridge (?:loans?|products?)"),
+    "Refurbishment Loans": (r"refurbishment (?:loans?|bridges?|products?)", r"(?:light|heavy) refurb"),
+    "Unregulated Development Finance": (r"development finance", r"ground[\s-]up", r"development (?:loans?|lending)"),
+    "Development Exit": (r"development exit", r"dev exit"),
+    "Term Loans": (r"term loans?", r"buy[\s-]to[\s-]let", r"btl"),
+    "Revolving Facility": (r"revolving (?:credit )?facilit(?:y|ies)",),
+    "Commercial Investment": (r"commercial investment", r"semi[\s-]commercial"),
+    "HNW Residential Finance": (r"high net worth (?:residential|mortgages?|lending)", r"hnw (?:residential|mortgages?|lending)"),
+}
+REGION_KEYWORDS = {
+    "England": (r"england",),
+    "Wales": (r"wales",),
+    "Scotland": (r"scotland",),
+    "Northern Ireland": (r"northern ireland",),
+    "London": (r"london",),
+    "South East": (r"south east",),
+    "North West": (r"north west",),
+    "Midlands": (r"midlands",),
+}
+# Products above -> the criteria sheet's Borrowing Type flags they stand for; "bridging" on
+# its own is residential, commercial bridging has no phrase of its own above
+PRODUCT_BORROWING_TYPES = {
+    "Unregulated Bridging": ("Unregulated Residential Bridging",),
+    "Refurbishment Loans": ("Refurbishment Bridges",),
+    "Unregulated Development Finance": ("Unregulated Development Finance",),
+    "Development Exit": ("Development Exit",),
+    "Term Loans": ("BTL Term",),
+    "Revolving Facility": ("Revolving Facility",),
+    "Commercial Investment": ("Term Commercial Investment",),
+    "HNW Residential Finance": ("HNW Residential Mortgages",),
+}
+# Regions above -> the Coverage flag they fall under
+REGION_COVERAGE = {
+    "England": "England", "Wales": "Wales", "Scotland": "Scotland", "Northern Ireland": "Northern Ireland",
+    "London": "England", "South East": "England", "North West": "England", "Midlands": "England",
+}
+
+# Flag cells a call may fill in; a stated "Y" or "N" always stands
+_OPEN_FLAGS = ("", "TBC")
+
+_PRODUCT_PATTERNS = {name: re.compile(r"\b(?:" + "|".join(words) + r")\b", re.I) for name, words in PRODUCT_KEYWORDS.items()}
+_REGION_PATTERNS = {name: re.compile(r"\b(?:" + "|".join(words) + r")\b", re.I) for name, words in REGION_KEYWORDS.items()}
+
+
+@dataclass(frozen=True)
+class Turn:
+    """One speaker's uninterrupted turn; index counts turns from the start of the call."""
+    index: int
+    speaker: str
+    text: str
+
+
+@dataclass
+class AppetiteSignals:
+    """
+    Appetite a lender stated on a call. product_ltvs maps a product to the
+    highest LTV stated in a sentence naming it; evidence holds [signal,
+    quote, subject] triples from the lender's own turns, subject being the
+    product or region concerned, or None.
+    """
+    lender: str
+    max_ltv: float = None
+    product_ltvs: dict = field(default_factory=dict)
+    preferred_products: list = field(default_factory=list)
+    regions: list = field(default_factory=list)
+    turnaround_days: float = None
+    evidence: list = field(default_factory=list)
+    chunks: int = 0
+    source: str = None
+    from_cache: bool = False
+
+
+def lender_from_filename(path):
+    """"Appetite & Policy_ Lender11_Transcript.txt" -> "Lender 11", the criteria sheet's name."""
+    name = os.path.basename(path)
+    match = _LENDER_IN_NAME.search(name)
+    return f"Lender {match.group(1)}" if match else TRANSCRIPT_PATTERN.sub("", name).strip()
+
+
+def transcript_paths(directory=DEFAULT_TRANSCRIPT_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if TRANSCRIPT_PATTERN.search(name))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_turns(lines):
+    """Turns from an iterable of transcript lines; text before the first label is skipped."""
+    speaker, parts, index = None, [], 0
+    for line in lines:
+        label = _SPEAKER_LINE.match(line.strip())
+        if label:
+            if speaker is not None and parts:
+                yield Turn(index, speaker, " ".join(parts))
+                index += 1
+            speaker, parts = label.group(1), []
+        elif line.strip() and speaker is not None:
+            parts.append(line.strip())
+    if speaker is not None and parts:
+        yield Turn(index, speaker, " ".join(parts))
+
+
+def _split_turn(turn, max_tokens, model):
+    """Pieces of a turn under max_tokens, breaking between sentences."""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(turn.text):
+        candidate = f"{current} {sentence}" if current else sentence
+        if current and count_tokens(candidate, model) > max_tokens:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        pieces.append(current)
+    return [Turn(turn.index, turn.speaker, piece) for piece in pieces]
+
+
+def iter_turn_chunks(turns, max_tokens=DEFAULT_TRANSCRIPT_CHUNK_TOKENS, model=None):
+    """Lists of consecutive turns of at most max_tokens tokens, yielded as soon as each is full."""
+    current, size = [], 0
+    for turn in turns:
+        pieces = [turn] if count_tokens(turn.text, model) <= max_tokens else _split_turn(turn, max_tokens, model)
+        for piece in pieces:
+            tokens = count_tokens(piece.text, model)
+            if current and size + tokens > max_tokens:
+                yield current
+                current, size = [], 0
+            current.append(piece)
+            size += tokens
+    if current:
+        yield current
+
+
+def broker_speaker(turns):
+    """The broker's label: one naming Arose, else the speaker who mentions Arose most; None if unknown."""
+    mentions = Counter()
+    for turn in turns:
+        if _BROKER_LABEL.search(turn.speaker):
+            return turn.speaker
+        if _BROKER_LABEL.search(turn.text):
+            mentions[turn.speaker] += 1
+    return mentions.most_common(1)[0][0] if mentions else None
+
+
+def _days(amount, half, unit):
+    value = float(amount) if amount[0].isdigit() else _NUMBER_WORDS[amount.lower()]
+    value += 0.5 if half else 0
+    return value * 7 if unit.lower().startswith("week") else value
+
+
+def _quote(text, start, end, margin=60):
+    return text[max(0, start - margin):end + margin].strip()
+
+
+def _states_appetite(sentence):
+    return bool(_OWN_VOICE.search(sentence)) and not _NOT_APPETITE.search(sentence) \
+        and not _OTHER_LENDERS.search(sentence)
+
+
+def extract_chunk_signals(turns, broker=None):
+    """
+    Rule-based signals from one chunk: {"max_ltv", "product_ltvs",
+    "preferred_products", "regions", "turnaround_days", "evidence"}.
+    """
+    ltvs, product_ltvs, products, regions, turnarounds, evidence = [], {}, Counter(), Counter(), [], []
+    for turn in turns:
+        if turn.speaker == broker:
+            continue
+        text = turn.text
+        for match in _TURNAROUND.finditer(text):
+            window = text[max(0, match.start() - _TURNAROUND_WINDOW):match.end() + _TURNAROUND_WINDOW]
+            days = _days(*match.groups())
+            if _TURNAROUND_CONTEXT.search(window) and 0 < days <= _MAX_TURNAROUND_DAYS:
+                turnarounds.append(days)
+                evidence.append(("turnaround_days", _quote(text, match.start(), match.end()), None))
+        for sentence in _SENTENCE_END.split(text):
+            named = [name for name, pattern in _PRODUCT_PATTERNS.items() if pattern.search(sentence)]
+            if not _OTHER_LENDERS.search(sentence):
+                for match in _LTV.finditer(sentence):
+                    value = float(match.group(1))
+                    if value > 100:
+                        continue
+                    ltvs.append(value)
+                    quote = _quote(sentence, match.start(), match.end())
+                    evidence.append(("max_ltv", quote, None))
+                    for name in named:
+                        product_ltvs[name] = max(value, product_ltvs.get(name, value))
+                        evidence.append(("product_ltvs", quote, name))
+            if not _states_appetite(sentence):
+                continue
+            for name in named:
+                products[name] += 1
+                evidence.append(("preferred_products", sentence, name))
+            for name, pattern in _REGION_PATTERNS.items():
+                if pattern.search(sentence):
+                    regions[name] += 1
+                    evidence.append(("regions", sentence, name))
+    return {
+        "max_ltv": max(ltvs) if ltvs else None,
+        "product_ltvs": product_ltvs,
+        "preferred_products": [name for name, count in products.most_common() if count],
+        "regions": [name for name, count in regions.most_common() if count],
+        "turnaround_days": min(turnarounds) if turnarounds else None,
+        "evidence": evidence,
+    }
+
+
+def _render_chunk(turns, broker):
+    return "\n\n".join(
+        f"{'Broker' if turn.speaker == broker else 'Lender'} ({turn.speaker}): {turn.text}" for turn in turns
+    )
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def merge_chunk_signals(lender, partials):
+    """
+    One lender's signals from its chunks, in chunk order: the highest LTV
+    overall and per product and the fastest turnaround stated anywhere,
+    products and regions ranked by how many chunks mention them.
+    """
+    ltvs = [value for value in (_number(p.get("max_ltv")) for p in partials) if value is not None]
+    turnarounds = [value for value in (_number(p.get("turnaround_days")) for p in partials) if value is not None]
+    products, regions, product_ltvs = Counter(), Counter(), {}
+    for partial in partials:
+        products.update(dict.fromkeys(partial.get("preferred_products") or [], 1))
+        regions.update(dict.fromkeys(partial.get("regions") or [], 1))
+        for name, value in (partial.get("product_ltvs") or {}).items():
+            value = _number(value)
+            if value is not None and value <= 100:
+                product_ltvs[name] = max(value, product_ltvs.get(name, value))
+    return AppetiteSignals(
+        lender=lender,
+        max_ltv=max(ltvs) if ltvs else None,
+        product_ltvs=product_ltvs,
+        preferred_products=[name for name, _ in products.most_common()],
+        regions=[name for name, _ in regions.most_common()],
+        turnaround_days=min(turnarounds) if turnarounds else None,
+        evidence=[list(item) for partial in partials for item in partial.get("evidence") or []],
+        chunks=len(partials),
+    )
+
+
+@dataclass(frozen=True)
+class CriteriaOverride:
+    """A proposed change to one criteria cell: the sheet's text, the value stated on the call and its quote."""
+    column: str
+    value: object
+    sheet_value: str = None
+    quote: str = None
+
+
+def _evidence_quote(signals, signal, subject):
+    return next((item[1] for item in signals.evidence
+                 if item[0] == signal and len(item) > 2 and item[2] == subject), None)
+
+
+def criteria_overrides(signals, criteria):
+    """
+    CriteriaOverride proposals for the lender's row of the CompiledCriteria
+    (apply them with criteria.with_overrides); empty when the lender is not
+    in the sheet. Stated products and regions set a Borrowing Type or
+    Coverage flag to "Y" only where the sheet leaves it blank or TBC, never
+    over a stated "Y" or "N". A product's stated LTV goes to the LTV cap of
+    that product's sections the lender offers, and only when the cap is blank
+    or higher.
+    """
+    name_column = next(entry["column"] for entry in criteria.schema if entry["kind"] == "name")
+    rows = [row for row, name in enumerate(criteria.frame[name_column].astype(str)) if name == signals.lender]
+    if not rows:
+        return []
+    row, index = rows[0], criteria.index
+
+    def sheet_value(column):
+        value = criteria.frame.iat[row, criteria.frame.columns.get_loc(column)]
+        return None if pd.isna(value) else str(value).strip()
+
+    overrides, stated_flags = [], set()
+
+    def propose_flag(section, flag, signal, subject):
+        column = index.column(section, flag)
+        if column and column not in stated_flags and (sheet_value(column) or "").upper() in _OPEN_FLAGS:
+            stated_flags.add(column)
+            overrides.append(CriteriaOverride(column, "Y", sheet_value(column), _evidence_quote(signals, signal, subject)))
+
+    for product in signals.preferred_products:
+        for flag in PRODUCT_BORROWING_TYPES.get(product, ()):
+            propose_flag("Borrowing Type", flag, "preferred_products", product)
+    for region in signals.regions:
+        propose_flag("Coverage", REGION_COVERAGE.get(region, region), "regions", region)
+
+    units = {entry["column"]: entry["unit"] for entry in criteria.schema}
+    for product, ltv in signals.product_ltvs.items():
+        sections = set()
+        for flag in PRODUCT_BORROWING_TYPES.get(product, ()):
+            column = index.column("Borrowing Type", flag)
+            offered = column in stated_flags or (column and (sheet_value(column) or "").upper() == "Y")
+            if offered and flag in BORROWING_TYPE_SECTIONS:
+                sections.add(BORROWING_TYPE_SECTIONS[flag])
+        for section in sorted(sections):
+            column = index.find(section, *MAX_LTV_FIELDS)
+            # e.g. an HNW "LTV" column compiled as amounts is not a cap to override
+            if not column or units.get(column) not in CAP_UNITS:
+                continue
+            cap = criteria.values.iat[row, criteria.values.columns.get_loc(column)]
+            if pd.isna(cap) or ltv < cap:
+                overrides.append(CriteriaOverride(column, ltv, sheet_value(column),
+                                                  _evidence_quote(signals, "product_ltvs", product)))
+    return overrides
+
+
+class TranscriptIngestor:
+    """
+    Ingests transcripts into AppetiteSignals. provider None uses the local
+    rules; otherwise each chunk goes to provider.complete_json with the
+    lender appetite prompt. cache is a ResponseCache (see llm_cache.py).
+    """
+
+    def __init__(self, provider=None, cache=None, max_tokens=DEFAULT_TRANSCRIPT_CHUNK_TOKENS,
+                 workers=DEFAULT_TRANSCRIPT_WORKERS, prompt_path=DEFAULT_TRANSCRIPT_PROMPT):
+        self.provider = provider
+        self.cache = cache
+        self.max_tokens = max_tokens
+        self.workers = workers
+        self.prompt_path = prompt_path
+
+    @property
+    def extractor(self):
+        return "local" if self.provider is None else f"{self.provider.name}:{self.provider.model}"
+
+    def _extract(self, turns, broker):
+        if self.provider is None:
+            return extract_chunk_signals(turns, broker)
+        result = self.provider.complete_json(REGISTRY.get(self.prompt_path), appetite_prompt(_render_chunk(turns, broker)))
+        result.setdefault("evidence", [])
+        return result
+
+    def ingest(self, path, lender=None):
+        lender = lender or lender_from_filename(path)
+        model = getattr(self.provider, "model", None)
+        prompt = "" if self.provider is None else REGISTRY.get(self.prompt_path)
+        key = cache_key("transcript", str(INGEST_VERSION), self.extractor, str(self.max_tokens), prompt,
+                        file_sha256(path))
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return AppetiteSignals(**dict(cached, from_cache=True))
+
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            # Two streaming passes: the broker may only be identifiable from later turns
+            broker = broker_speaker(iter_turns(f))
+            f.seek(0)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                partials = list(executor.map(
+                    lambda chunk: self._extract(chunk, broker),
+                    iter_turn_chunks(iter_turns(f), self.max_tokens, model),
+                ))
+
+        signals = merge_chunk_signals(lender, partials)
+        signals.source = os.path.basename(path)
+        if self.cache is not None:
+            self.cache.put(key, asdict(signals), model=self.extractor)
+        return signals
+
+    def ingest_all(self, paths):
+        """{lender: AppetiteSignals} for every transcript path."""
+        results = {}
+        for path in paths:
+            signals = self.ingest(path)
+            results[signals.lender] = signals
+        return results
@@ -0,0 +1,127 @@
+"""
+Local, rule-based utility bill parser.
+
+The counterpart of statements.py for utility bills: a BillProfile describes
+one supplier's layout with regular expressions, parse_utility_bill picks the
+first profile that matches and returns the fields the KYC prompt asks for,
+in the same JSON shape as an LLM extraction.
+
+Only the fields KYC verification relies on (who, where, which supplier and
+when) decide whether the result is confident enough to skip the LLM; the
+others are filled in when the layout states them.
+"""
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from arose.statements import holder_and_address
+
+# Fields the KYC prompt asks for on a utility bill
+UTILITY_BILL_FIELDS = (
+    "account_holder", "service_provider", "account_number", "billing_address", "bill_date",
+    "due_date", "amount_due", "service_type", "billing_period",
+)
+
+# Fields verification needs; the rest may be missing in a high-confidence result
+UTILITY_BILL_REQUIRED_FIELDS = ("account_holder", "service_provider", "billing_address", "bill_date")
+
+_DATE = r"\d{1,2}\s+[A-Z][a-z]+\s+\d{4}"
+_AMOUNT = r"[\d,]+\.\d{2}"
+_SERVICE_TYPES = ("electricity", "gas", "water", "broadband", "internet", "phone")
+
+
+@dataclass(frozen=True)
+class BillProfile:
+    """Regular expressions describing one supplier's bill layout; each captures its value in group 1."""
+    service_provider: str
+    detect: re.Pattern
+    bill_date: re.Pattern = None
+    billing_period: re.Pattern = None
+    account_number: re.Pattern = None
+    amount_due: re.Pattern = None
+    due_date: re.Pattern = None
+    service_type: re.Pattern = None
+
+
+BRITISH_GAS = BillProfile(
+    service_provider="British Gas",
+    detect=re.compile(r"British\s*Gas", re.I),
+    bill_date=re.compile(rf"Statement\s+date:\s*({_DATE})"),
+    billing_period=re.compile(rf"Statement\s+period:\s*({_DATE}\s*-\s*{_DATE})"),
+    account_number=re.compile(r"customer\s+number:\s*([\d ]{6,}\d)", re.I),
+    amount_due=re.compile(rf"account\s+balance\s+is\s+in\s+debit\s+by\s+£({_AMOUNT})", re.I),
+    due_date=re.compile(rf"(?:pay|payment\s+due)\s+by\s+({_DATE})", re.I),
+    service_type=re.compile(r"Your\s+(electricity|gas|dual\s+fuel)\s+statement", re.I),
+)
+
+# Fallback for suppliers without a profile
+GENERIC = BillProfile(
+    service_provider=None,
+    detect=re.compile(r""),
+    bill_date=re.compile(rf"(?:Bill|Statement|Invoice)\s+date:?\s*({_DATE})", re.I),
+    billing_period=re.compile(rf"(?:Billing|Statement)\s+period:?\s*({_DATE}\s*(?:-|to)\s*{_DATE})", re.I),
+    account_number=re.compile(r"(?:Account|Customer)\s+(?:number|no\.?|reference):?\s*([\d ]{6,}\d)", re.I),
+    amount_due=re.compile(rf"(?:Amount|Total)\s+(?:due|to\s+pay):?\s*£?({_AMOUNT})", re.I),
+    due_date=re.compile(rf"(?:Due\s+date|pay(?:ment)?\s+(?:due\s+)?by):?\s*({_DATE})", re.I),
+)
+
+# Checked in order; the first profile whose detect pattern matches is used
+PROFILES = (BRITISH_GAS, GENERIC)
+
+
+def _search(pattern, text):
+    if pattern is None:
+        return None
+    match = pattern.search(text)
+    return " ".join(match.group(1).split()) if match else None
+
+
+def _iso_date(text):
+    for fmt in ("%d %b %Y", "%d %B %Y"):
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _service_type(profile, text):
+    stated = _search(profile.service_type, text)
+    if stated:
+        return stated.lower()
+    lowered = text.lower()
+    return next((service for service in _SERVICE_TYPES if f"your {service}" in lowered), None)
+
+
+def parse_utility_bill(text):
+    """Utility bill fields, in the JSON shape the KYC prompt asks the LLM for."""
+    profile = next(profile for profile in PROFILES if profile.detect.search(text))
+    holder, address = holder_and_address(text)
+    period = _search(profile.billing_period, text)
+    start, _, end = (period or "").partition("-")
+    if not end:
+        start, _, end = (period or "").partition(" to ")
+    amount = _search(profile.amount_due, text)
+
+    data = {
+        "account_holder": holder,
+        "service_provider": profile.service_provider,
+        "account_number": _search(profile.account_number, text),
+        "billing_address": address,
+        "bill_date": _iso_date(_search(profile.bill_date, text)),
+        "due_date": _iso_date(_search(profile.due_date, text)),
+        "amount_due": float(amount.replace(",", "")) if amount else None,
+        "service_type": _service_type(profile, text),
+        "billing_period": (
+            f"{_iso_date(start.strip())} to {_iso_date(end.strip())}"
+            if _iso_date(start.strip()) and _iso_date(end.strip()) else None
+        ),
+    }
+    missing = [name for name in UTILITY_BILL_FIELDS if data[name] is None]
+    return {
+        "document_type": "utility bill",
+        "extraction_confidence": "high" if not set(missing) & set(UTILITY_BILL_REQUIRED_FIELDS) else "medium",
+        "extracted_data": data,
+        "missing_fields": missing,
+        "warnings": [],
+    }
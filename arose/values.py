@@ -0,0 +1,141 @@
+"""
+Normalisation of messy criteria cell values.
+
+Criteria cells mix currency ("£3m", "£20,000", "1395000"), percentages with
+qualifiers ("90% Net", "70% Gross"), monthly or annual rates ("0.85% pm",
+"3% PCM"), terms ("12m", "1d", "2y"), flags and free text. parse_cell turns
+one cell into a ParsedValue with a unit, and is memoised because the same
+strings repeat across thousands of cells. It is meant to run once, when the
+criteria are compiled, so matching never parses strings.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+GBP = "gbp"
+PERCENT = "percent"
+PERCENT_PM = "percent_pm"
+PERCENT_PA = "percent_pa"
+MONTHS = "months"
+NUMBER = "number"
+FLAG = "flag"
+TEXT = "text"
+BLANK = "blank"
+UNBOUNDED = "unbounded"
+
+# Units that carry a comparable number
+NUMERIC_UNITS = (GBP, PERCENT, PERCENT_PM, PERCENT_PA, MONTHS, NUMBER)
+
+FLAG_VALUES = {"Y": 1.0, "N": 0.0, "M": math.nan, "TBC": math.nan, "N/A": math.nan}
+
+_DAYS_PER_MONTH = 365.25 / 12
+_TERM_MONTHS = {"d": 1 / _DAYS_PER_MONTH, "w": 7 / _DAYS_PER_MONTH, "m": 1.0, "y": 12.0}
+_CURRENCY_SCALE = {"k": 1e3, "m": 1e6, "mn": 1e6, "bn": 1e9}
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_CURRENCY_PATTERN = re.compile(r"£\s*" + _NUMBER + r"\s*(k|mn|m|bn)?\b", re.IGNORECASE)
+_PERCENT_RANGE_PATTERN = re.compile(_NUMBER + r"\s*%?\s*(?:-|–|to)\s*" + _NUMBER + r"\s*%", re.IGNORECASE)
+_PERCENT_PATTERN = re.compile(_NUMBER + r"\s*%", re.IGNORECASE)
+_MONTHLY_PATTERN = re.compile(r"%\s*(?:p\.?c\.?m\.?|p\.?m\.?|per month|monthly)\b", re.IGNORECASE)
+_ANNUAL_PATTERN = re.compile(r"%\s*(?:p\.?a\.?|per annum|annual(?:ly)?)\b", re.IGNORECASE)
+_TERM_PATTERN = re.compile(r"^" + _NUMBER + r"\s*(d|days?|w|weeks?|m|months?|y|yrs?|years?)\b", re.IGNORECASE)
+_BARE_NUMBER_PATTERN = re.compile(r"^" + _NUMBER + r"$")
+_QUALIFIER_PATTERN = re.compile(r"\b(net|gross)\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class ParsedValue:
+    """One normalised cell: a number (NaN if none), its unit and any Net/Gross qualifier."""
+    value: float
+    unit: str
+    qualifier: str = None
+
+
+def _qualifier(text):
+    match = _QUALIFIER_PATTERN.search(text)
+    return match.group(1).lower() if match else None
+
+
+@lru_cache(maxsize=None)
+def parse_cell(cell):
+    """
+    Normalise a single criteria cell string.
+
+    "No Max" parses as +inf and "No Min"/"No Constraint"/"None" as 0 with the
+    UNBOUNDED unit, so they can sit in a column of any numeric unit.
+    """
+    text = (cell or "").strip()
+    if not text:
+        return ParsedValue(math.nan, BLANK)
+
+    upper = text.upper()
+    first_token = re.split(r"[\s(]", upper, maxsplit=1)[0]
+    if upper in FLAG_VALUES:
+        return ParsedValue(FLAG_VALUES[upper], FLAG)
+    if first_token in ("Y", "N") and len(text) > 1:
+        # e.g. "Y (<55% LTV)", "N (but want around 50% of the facility used)"
+        return ParsedValue(FLAG_VALUES[first_token], FLAG)
+
+    lower = text.lower()
+    if lower.startswith("no max"):
+        return ParsedValue(math.inf, UNBOUNDED)
+    if lower.startswith(("no min", "no constraint")) or lower == "none":
+        return ParsedValue(0.0, UNBOUNDED)
+
+    compact = text.replace(",", "")
+    qualifier = _qualifier(compact)
+
+    match = _CURRENCY_PATTERN.search(compact)
+    if match:
+        scale = _CURRENCY_SCALE.get((match.group(2) or "").lower(), 1.0)
+        return ParsedValue(float(match.group(1)) * scale, GBP, qualifier)
+
+    if "%" in compact:
+        match = _PERCENT_RANGE_PATTERN.search(compact) or _PERCENT_PATTERN.search(compact)
+        if match is None:
+            # A percent sign with no number, e.g. "%" or "N/A %"
+            return ParsedValue(math.nan, TEXT, qualifier)
+        if _MONTHLY_PATTERN.search(compact):
+            unit = PERCENT_PM
+        elif _ANNUAL_PATTERN.search(compact):
+            unit = PERCENT_PA
+        else:
+            unit = PERCENT
+        # For a range ("1-1.3%") the lower bound is kept
+        return ParsedValue(float(match.group(1)), unit, qualifier)
+
+    match = _TERM_PATTERN.match(compact)
+    if match:
+        months = float(match.group(1)) * _TERM_MONTHS[match.group(2)[0].lower()]
+        return ParsedValue(months, MONTHS, qualifier)
+
+    match = _BARE_NUMBER_PATTERN.match(compact)
+    if match:
+        return ParsedValue(float(match.group(1)), NUMBER)
+
+    return ParsedValue(math.nan, TEXT, qualifier)
+
+
+def column_unit(parsed_values):
+    """
+    Dominant numeric unit of a column, or None if no cell carries a number.
+    Bare numbers only decide the unit when nothing more specific is present.
+    """
+    counts = Counter(parsed.unit for parsed in parsed_values if parsed.unit in NUMERIC_UNITS)
+    specific = [(count, unit) for unit, count in counts.items() if unit != NUMBER]
+    if specific:
+        return max(specific)[1]
+    return NUMBER if counts else None
+
+
+def typed_column(parsed_values, unit):
+    """
+    Column values expressed in unit: cells in a different unit become NaN,
+    while bare numbers and UNBOUNDED cells are taken as being in unit.
+    """
+    return [
+        parsed.value if parsed.unit in (unit, NUMBER, UNBOUNDED) else math.nan
+        for parsed in parsed_values
+    ]
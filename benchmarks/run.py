@@ -0,0 +1,257 @@
+"""
+Micro-benchmarks for the pipeline hot paths, run without Streamlit.
+
+    python benchmarks/run.py                      # 1x, 10x and 100x
+    python benchmarks/run.py --scales 1 10 --output before.json
+    python benchmarks/run.py --baseline before.json
+
+Each benchmark builds synthetic inputs at a multiple of today's data sizes
+(51 lenders, 3 historical clients, 50 historical loans, a 1-page PDF statement,
+a 25 year amortisation) and reports the best and median time over several
+runs. The archived loan structuring page has no package module, so its
+functions are lifted out of the page source with ast without running it.
+"""
+import argparse
+import ast
+import csv
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from arose import criteria as criteria_module  # noqa: E402
+from arose.batch import build_matcher, match_book  # noqa: E402
+from arose.clients import load_client_book  # noqa: E402
+from arose.criteria import load_compiled_criteria  # noqa: E402
+from arose.extraction import extract_text_from_pdf, json_to_df  # noqa: E402
+from arose.learning import LENDERS, apply_learning, calculate_base_match  # noqa: E402
+from arose.matching import match_client  # noqa: E402
+
+CRITERIA_PATH = os.path.join(ROOT, "data", "lender_criteria.csv")
+CLIENT_BOOK_PATH = os.path.join(ROOT, "data", "client_match.csv")
+STATEMENT_PATH = os.path.join(ROOT, "data", "Dec 2024 Statement.pdf")
+
+DEFAULT_SCALES = (1, 10, 100)
+
+
+def load_page_functions(path, *names):
+    """
+    Compile the named functions (top-level or nested, e.g. inside an
+    `if st.button(...)` block) out of a page, together with the page's
+    non-Streamlit imports, without running the page.
+    """
+    with open(os.path.join(ROOT, path), "r") as f:
+        tree = ast.parse(f.read())
+
+    body = []
+    for node in tree.body:
+        if isinstance(node, ast.Import) and all(alias.name != "streamlit" for alias in node.names):
+            body.append(node)
+        elif isinstance(node, ast.ImportFrom) and node.module not in ("streamlit", "utils"):
+            body.append(node)
+    body.extend(node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef) and node.name in names)
+
+    namespace = {}
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, "exec"), namespace)
+    missing = [name for name in names if name not in namespace]
+    if missing:
+        raise LookupError(f"{path} has no function named {', '.join(missing)}")
+    return [namespace[name] for name in names]
+
+
+def timed(fn, repeat):
+    """Best and median wall time of fn() over repeat runs, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times), statistics.median(times)
+
+
+# Synthetic inputs
+
+def write_scaled_criteria(scale, directory):
+    """Copy of the criteria CSV with every lender repeated scale times under new names."""
+    with open(CRITERIA_PATH, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    header, lenders = rows[:2], [row for row in rows[2:] if any(cell.strip() for cell in row)]
+
+    path = os.path.join(directory, f"lender_criteria_x{scale}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerows(header)
+        for copy in range(scale):
+            for row in lenders:
+                writer.writerow([f"{row[0]} #{copy}"] + row[1:])
+    return path
+
+
+def synthetic_historical_data(n_loans, rng):
+    """Historical outcomes with the columns arose.learning.generate_historical_data produces."""
+    outcome = rng.choice(["Approved", "Declined"], size=n_loans, p=[0.7, 0.3])
+    completed = np.where(outcome == "Approved", rng.choice(["Yes", "No"], size=n_loans, p=[0.8, 0.2]), "N/A")
+    reasons = rng.choice(["Client found better rate elsewhere", "Documentation issues", "Client withdrew application"], size=n_loans)
+    return pd.DataFrame({
+        "Credit Score": rng.choice(["Below 600", "600-650", "650-700", "700-750", "750+"], size=n_loans),
+        "LTV Ratio": rng.uniform(60, 100, size=n_loans),
+        "Loan Purpose": rng.choice(["Home Purchase", "Refinance", "Home Improvement", "Debt Consolidation"], size=n_loans),
+        "Selected Lender": rng.choice(LENDERS, size=n_loans),
+        "Outcome": outcome,
+        "Loan Completed": completed,
+        "Reason (if not completed)": np.where(completed == "No", reasons, "N/A"),
+    })
+
+
+def synthetic_kyc_json(n_transactions):
+    """Nested extraction result shaped like a bank statement response."""
+    return {
+        "account_holder": {"name": "Jane Smith", "address": {"line1": "1 High Street", "postcode": "SW1A 1AA"}},
+        "account": {"number": "12345678", "sort_code": "12-34-56", "bank": "Example Bank"},
+        "transactions": [
+            {"date": f"2024-12-{i % 28 + 1:02d}", "description": f"Payment {i}", "amount": -12.5 * (i % 7), "balance": 1000 + i}
+            for i in range(n_transactions)
+        ],
+    }
+
+
+def scaled_pdf(scale):
+    """The sample statement PDF with its pages repeated scale times, as an in-memory upload."""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(STATEMENT_PATH)
+    writer = PdfWriter()
+    for _ in range(scale):
+        for page in reader.pages:
+            writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+# Benchmarks; each returns {name: callable} for one scale
+
+def criteria_benchmarks(scale, directory):
+    path = write_scaled_criteria(scale, directory)
+
+    def compile_cold():
+        criteria_module._memory_cache.clear()
+        load_compiled_criteria(path)
+
+    def load_memory():
+        load_compiled_criteria(path)
+
+    def read_csv_pandas():
+        pd.read_csv(path, header=[0, 1])
+
+    compile_cold()
+    return {
+        "criteria.read_csv_pandas": read_csv_pandas,
+        "criteria.compile": compile_cold,
+        "criteria.load_memory": load_memory,
+    }
+
+
+def matching_benchmarks(scale, directory):
+    criteria_module._memory_cache.clear()
+    compiled = load_compiled_criteria(write_scaled_criteria(scale, directory))
+    matcher = build_matcher(compiled)
+    book = [record.client_data for record in load_client_book(CLIENT_BOOK_PATH)] * scale
+
+    return {
+        "matching.build_matcher": lambda: build_matcher(compiled),
+        "matching.match_client": lambda: match_client(matcher.matrix, book[0]),
+        "matching.match_book": lambda: match_book(matcher, book),
+    }
+
+
+def learning_benchmarks(scale, directory):
+    historical_data = synthetic_historical_data(50 * scale, np.random.default_rng(42))
+    client_data = {
+        "credit_score": "650-700", "income": 75000, "loan_purpose": "Home Purchase",
+        "property_type": "Single Family Home", "loan_amount": 250000, "ltv": 80, "dti": 36,
+    }
+    base_matches = calculate_base_match(client_data, LENDERS)
+    return {"learning.apply_learning": lambda: apply_learning(base_matches, client_data, historical_data)}
+
+
+def extraction_benchmarks(scale, directory):
+    document = synthetic_kyc_json(50 * scale)
+    pdf = scaled_pdf(scale)
+    return {
+        "extraction.json_to_df": lambda: json_to_df(document),
+        "extraction.extract_text_from_pdf": lambda: extract_text_from_pdf(pdf),
+    }
+
+
+def structuring_benchmarks(scale, directory):
+    generate_amortization_schedule, _ = load_page_functions(
+        "archive/6_Loan_Structuring.py", "generate_amortization_schedule", "calculate_monthly_payment"
+    )
+    return {"structuring.amortization_schedule": lambda: generate_amortization_schedule(250000, 5.5, 25 * scale)}
+
+
+BENCHMARK_GROUPS = (
+    criteria_benchmarks,
+    matching_benchmarks,
+    learning_benchmarks,
+    extraction_benchmarks,
+    structuring_benchmarks,
+)
+
+
+def run(scales, repeat, only=None):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            for group in BENCHMARK_GROUPS:
+                for name, fn in group(scale, directory).items():
+                    if only and not any(pattern in name for pattern in only):
+                        continue
+                    best, median = timed(fn, repeat)
+                    results.append({"name": name, "scale": scale, "best_ms": best, "median_ms": median})
+                    print(f"{name:<36} x{scale:<4} best {best:10.3f} ms   median {median:10.3f} ms", flush=True)
+    return results
+
+
+def compare(results, baseline):
+    """Print the speedup of each benchmark against a baseline run."""
+    before = {(entry["name"], entry["scale"]): entry["best_ms"] for entry in baseline}
+    print("\nAgainst baseline (best times):")
+    for entry in results:
+        previous = before.get((entry["name"], entry["scale"]))
+        if previous:
+            print(f"{entry['name']:<36} x{entry['scale']:<4} {previous:10.3f} -> {entry['best_ms']:10.3f} ms"
+                  f"   ({previous / entry['best_ms']:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES), help="data size multiples")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--only", nargs="+", help="run benchmarks whose name contains any of these")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.scales, args.repeat, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
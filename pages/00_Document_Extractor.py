@@ -1,15 +1,15 @@
 import streamlit as st
 import os
-import tempfile
 import pandas as pd
-import PyPDF2
-import openai
-from openai import OpenAI
 import json
-import re
-from io import StringIO
 from PIL import Image
 from utils import load_api_keys
+from arose.extraction import extract_data_with_openai, extract_text_from_pdf, extract_text_from_pdf_path, json_to_df, verify_documents
+from arose.async_extraction import BANK_STATEMENT, UTILITY_BILL, KYCDocument, extract_document_sync, run_kyc_pipeline_sync
+from arose.llm_cache import ResponseCache
+from arose.page_cache import PageTextCache
+from arose.prompts import UsageLog
+from arose.providers import build_provider
 
 st.set_page_config(
     page_title="KYC Document Verification",
@@ -23,6 +23,20 @@ st.markdown("Upload bank statements and utility bills for verification and analy
 # Load API keys from .env file
 api_keys_loaded = load_api_keys()
 
+# Persistent cache of LLM responses, shared by every session of this server
+@st.cache_resource
+def load_extraction_cache():
+    return ResponseCache()
+
+extraction_cache = load_extraction_cache()
+
+# Extracted PDF page text, so reruns with a file still uploaded don't parse it again
+@st.cache_resource
+def load_page_text_cache():
+    return PageTextCache()
+
+page_text_cache = load_page_text_cache()
+
 # Initialize session state variables if they don't exist
 if 'extracted_bank_statement_data' not in st.session_state:
     st.session_state.extracted_bank_statement_data = None
@@ -34,161 +48,13 @@ if 'saved_analyses' not in st.session_state:
     st.session_state.saved_analyses = []
 if 'use_demo_data' not in st.session_state:
     st.session_state.use_demo_data = False
-
-# Function to extract text from PDF
-def extract_text_from_pdf(pdf_file):
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-        temp_file.write(pdf_file.getvalue())
-        temp_path = temp_file.name
-    
-    text = ""
-    with open(temp_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-    
-    os.unlink(temp_path)
-    return text
-
-# Function to extract text from PDF file path
-def extract_text_from_pdf_path(file_path):
-    text = ""
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text()
-    
-    return text
-
-# Function to extract data using OpenAI
-def extract_data_with_openai(text, document_type):
-    client = OpenAI(api_key=st.session_state.openai_api_key)
-    
-    # Load the system prompt
-    with open("prompts/kyc_documents_prompt.md", "r") as f:
-        system_prompt = f.read()
-    
-    user_prompt = f"""
-    Extract all relevant information from this {document_type} document. 
-    The document text is provided below:
-    
-    {text}
-    
-    Return the extracted information as a JSON object with all relevant fields as specified in the guidelines.
-    """
-    
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
-    
-    return json.loads(response.choices[0].message.content)
-
-# Function to verify KYC documents
-def verify_documents(bank_statement_data, utility_bill_data, image_analyses=None):
-    client = OpenAI(api_key=st.session_state.openai_api_key)
-    
-    # Load the system prompt
-    with open("prompts/kyc_documents_prompt.md", "r") as f:
-        system_prompt = f.read()
-    
-    # Prepare image analyses text if available
-    image_analyses_text = ""
-    if image_analyses and len(image_analyses) > 0:
-        image_analyses_text = "IMAGE ANALYSES:\n"
-        for i, analysis in enumerate(image_analyses):
-            image_analyses_text += f"\nImage {i+1}: {analysis['image_name']}\n"
-            image_analyses_text += f"Analysis Type: {analysis['analysis_type']}\n"
-            image_analyses_text += f"Model Used: {analysis['model_used']}\n"
-            image_analyses_text += f"Analysis Result:\n{analysis['analysis_result']}\n"
-            image_analyses_text += "-" * 50 + "\n"
-    
-    user_prompt = f"""
-    Compare and verify the following bank statement and utility bill data:
-    
-    BANK STATEMENT DATA:
-    {json.dumps(bank_statement_data, indent=2)}
-    
-    UTILITY BILL DATA:
-    {json.dumps(utility_bill_data, indent=2)}
-    
-    {image_analyses_text}
-    
-    Provide a detailed verification report highlighting any inconsistencies or issues.
-    Return the results as a JSON object with the following structure:
-    {{
-        "document_summary": "Brief overview of the documents analyzed",
-        "verification_results": [
-            {{
-                "field": "Field name (like name, address, etc)",
-                "bank_statement_value": "Value from bank statement",
-                "utility_bill_value": "Value from utility bill",
-                "match": true/false,
-                "notes": "Any notes about this comparison"
-            }}
-        ],
-        "discrepancies": [
-            {{
-                "field": "Field with discrepancy",
-                "description": "Description of the issue",
-                "severity": "high/medium/low",
-                "potential_risk": "Description of potential fraud risk if applicable"
-            }}
-        ],
-        "recommendations": [
-            "Recommendation 1",
-            "Recommendation 2"
-        ],
-        "verification_status": "approved/rejected/needs_review",
-        "confidence_score": "A number between 0-100 indicating confidence in verification"
-    }}
-    """
-    
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        response_format={"type": "json_object"}
-    )
-    
-    return json.loads(response.choices[0].message.content)
-
-# Function to convert JSON to DataFrame
-def json_to_df(json_data):
-    """Convert JSON data to a pandas DataFrame for display"""
-    # Flatten the JSON if it's nested
-    flat_data = {}
-    
-    def flatten(data, prefix=""):
-        if isinstance(data, dict):
-            for key, value in data.items():
-                new_key = f"{prefix}{key}" if prefix else key
-                if isinstance(value, (dict, list)) and not isinstance(value, str):
-                    flatten(value, f"{new_key}.")
-                else:
-                    flat_data[new_key] = value
-        elif isinstance(data, list) and not isinstance(data, str):
-            for i, item in enumerate(data):
-                flatten(item, f"{prefix}[{i}].")
-    
-    flatten(json_data)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(flat_data.items(), columns=["Field", "Value"])
-    return df
+if 'token_usage' not in st.session_state:
+    st.session_state.token_usage = UsageLog()
 
 # API Key input
 with st.sidebar:
     st.header("API Keys")
-    
+
     # Show status of loaded API keys
     if api_keys_loaded['openai_api_key']:
         st.success("OpenAI API key loaded from .env file")
@@ -202,6 +68,19 @@ with st.sidebar:
         st.session_state.openai_api_key = openai_api_key
         st.success("API key override applied!")
     
+    # Backend for extraction and verification
+    st.header("Extraction Backend")
+    backend_labels = {
+        "openai": "OpenAI",
+        "anthropic": "Anthropic",
+        "local": "Local (rule-based, offline)",
+        "auto": "Auto (cheapest confident backend)",
+    }
+    backend = st.selectbox("Backend", list(backend_labels), format_func=backend_labels.get)
+    if backend in ("local", "auto"):
+        st.caption("Known bank statement and utility bill layouts are read locally; "
+                   "Auto falls back to an LLM when the local result isn't confident.")
+
     # Demo data checkbox
     st.header("Demo Options")
     use_demo = st.checkbox("Use demo data", value=st.session_state.use_demo_data)
@@ -213,8 +92,29 @@ with st.sidebar:
         st.session_state.verification_results = None
         st.rerun()
 
+def extract_document(text, document_type):
+    """Extract one document with the selected backend; OpenAI keeps the concurrent, chunked pipeline."""
+    if backend == "openai":
+        return extract_document_sync(text, document_type, api_key=st.session_state.openai_api_key,
+                                     cache=extraction_cache, usage_log=st.session_state.token_usage)
+    return extract_data_with_openai(text, document_type, provider=selected_provider())
+
+
+def selected_provider():
+    """The selected backend's provider, or None for the default OpenAI path."""
+    if backend == "openai":
+        return None
+    return build_provider(
+        backend,
+        openai_api_key=st.session_state.get('openai_api_key'),
+        anthropic_api_key=st.session_state.get('anthropic_api_key'),
+        cache=extraction_cache,
+        usage_log=st.session_state.token_usage,
+    )
+
+
 # Main content
-if 'openai_api_key' in st.session_state:
+if 'openai_api_key' in st.session_state or backend != "openai":
     # Create tabs for different sections
     tabs = st.tabs(["Document Analysis", "Image Analysis Integration", "Verification Results"])
     
@@ -233,8 +133,8 @@ if 'openai_api_key' in st.session_state:
                 if st.button("Extract Bank Statement Data"):
                     with st.spinner("Analyzing bank statement with AI..."):
                         try:
-                            bank_statement_text = extract_text_from_pdf_path("data/sample-bank-statement.pdf")
-                            extracted_bank_statement_data = extract_data_with_openai(bank_statement_text, "bank statement")
+                            bank_statement_text = extract_text_from_pdf_path("data/sample-bank-statement.pdf", cache=page_text_cache)
+                            extracted_bank_statement_data = extract_document(bank_statement_text, BANK_STATEMENT)
                             st.session_state.extracted_bank_statement_data = extracted_bank_statement_data
                             st.success("Bank statement data extracted successfully!")
                             
@@ -252,8 +152,8 @@ if 'openai_api_key' in st.session_state:
                 if st.button("Extract Utility Bill Data"):
                     with st.spinner("Analyzing utility bill with AI..."):
                         try:
-                            utility_bill_text = extract_text_from_pdf_path("data/sample-utility-bill.pdf")
-                            extracted_utility_bill_data = extract_data_with_openai(utility_bill_text, "utility bill")
+                            utility_bill_text = extract_text_from_pdf_path("data/sample-utility-bill.pdf", cache=page_text_cache)
+                            extracted_utility_bill_data = extract_document(utility_bill_text, UTILITY_BILL)
                             st.session_state.extracted_utility_bill_data = extracted_utility_bill_data
                             st.success("Utility bill data extracted successfully!")
                             
@@ -274,13 +174,13 @@ if 'openai_api_key' in st.session_state:
                 
                 if bank_statement_file:
                     with st.spinner("Extracting text from bank statement..."):
-                        bank_statement_text = extract_text_from_pdf(bank_statement_file)
+                        bank_statement_text = extract_text_from_pdf(bank_statement_file, cache=page_text_cache)
                         st.session_state.bank_statement_text = bank_statement_text
                         
                     if st.button("Extract Bank Statement Data"):
                         with st.spinner("Analyzing bank statement with AI..."):
                             try:
-                                extracted_bank_statement_data = extract_data_with_openai(bank_statement_text, "bank statement")
+                                extracted_bank_statement_data = extract_document(bank_statement_text, BANK_STATEMENT)
                                 st.session_state.extracted_bank_statement_data = extracted_bank_statement_data
                                 st.success("Bank statement data extracted successfully!")
                                 
@@ -297,13 +197,13 @@ if 'openai_api_key' in st.session_state:
                 
                 if utility_bill_file:
                     with st.spinner("Extracting text from utility bill..."):
-                        utility_bill_text = extract_text_from_pdf(utility_bill_file)
+                        utility_bill_text = extract_text_from_pdf(utility_bill_file, cache=page_text_cache)
                         st.session_state.utility_bill_text = utility_bill_text
                         
                     if st.button("Extract Utility Bill Data"):
                         with st.spinner("Analyzing utility bill with AI..."):
                             try:
-                                extracted_utility_bill_data = extract_data_with_openai(utility_bill_text, "utility bill")
+                                extracted_utility_bill_data = extract_document(utility_bill_text, UTILITY_BILL)
                                 st.session_state.extracted_utility_bill_data = extracted_utility_bill_data
                                 st.success("Utility bill data extracted successfully!")
                                 
@@ -313,7 +213,33 @@ if 'openai_api_key' in st.session_state:
                                 st.dataframe(utility_bill_df, use_container_width=True)
                             except Exception as e:
                                 st.error(f"Error extracting utility bill data: {str(e)}")
-    
+
+            # Extract both documents concurrently and verify them in one pass
+            if bank_statement_file and utility_bill_file and backend == "openai":
+                if st.button("Extract and Verify Both Documents"):
+                    with st.spinner("Extracting and verifying documents concurrently..."):
+                        selected_analyses = st.session_state.get('selected_analyses', [])
+                        kyc_result = run_kyc_pipeline_sync(
+                            [
+                                KYCDocument(bank_statement_file.name, BANK_STATEMENT, bank_statement_text),
+                                KYCDocument(utility_bill_file.name, UTILITY_BILL, utility_bill_text),
+                            ],
+                            api_key=st.session_state.openai_api_key,
+                            image_analyses=selected_analyses or None,
+                            cache=extraction_cache,
+                            usage_log=st.session_state.token_usage
+                        )
+
+                    for name, error in kyc_result.errors.items():
+                        st.error(f"Error processing {name}: {error}")
+                    if bank_statement_file.name in kyc_result.extracted:
+                        st.session_state.extracted_bank_statement_data = kyc_result.extracted[bank_statement_file.name]
+                    if utility_bill_file.name in kyc_result.extracted:
+                        st.session_state.extracted_utility_bill_data = kyc_result.extracted[utility_bill_file.name]
+                    if kyc_result.verification:
+                        st.session_state.verification_results = kyc_result.verification
+                        st.success("Documents extracted and verified! See the Verification Results tab.")
+
     with tabs[1]:
         st.header("Image Analysis Integration")
         
@@ -369,7 +295,11 @@ if 'openai_api_key' in st.session_state:
                         verification_results = verify_documents(
                             st.session_state.extracted_bank_statement_data,
                             st.session_state.extracted_utility_bill_data,
-                            selected_analyses if include_images else None
+                            selected_analyses if include_images else None,
+                            api_key=st.session_state.get('openai_api_key'),
+                            cache=extraction_cache,
+                            usage_log=st.session_state.token_usage,
+                            provider=selected_provider()
                         )
                         st.session_state.verification_results = verification_results
                         st.success("Verification completed!")
@@ -457,4 +387,18 @@ if 'openai_api_key' in st.session_state:
             ):
                 st.success("Report downloaded successfully!")
 else:
-    st.warning("OpenAI API key is required. Please add it to your .env file or enter it in the sidebar.") 
\ No newline at end of file
+    st.warning("OpenAI API key is required. Please add it to your .env file or enter it in the sidebar, or choose the Local or Auto backend.") 
+
+# Token usage of this session's LLM calls, rendered last so it includes this run's calls
+with st.sidebar:
+    st.header("Token Usage")
+    usage = st.session_state.token_usage.summary()
+    if usage["calls"]:
+        st.metric("Prompt tokens cached", f"{usage['cached_tokens']:,} / {usage['prompt_tokens']:,}",
+                  f"{usage['cached_share']:.0%}", delta_color="off")
+        st.caption(f"{usage['api_calls']} API calls, {usage['calls'] - usage['api_calls']} from the local cache, "
+                   f"{usage['completion_tokens']:,} completion tokens, {usage['mean_latency_ms']:.0f} ms mean latency")
+        with st.expander("Per-call usage"):
+            st.dataframe(st.session_state.token_usage.to_frame(), use_container_width=True)
+    else:
+        st.caption("No LLM calls yet this session")
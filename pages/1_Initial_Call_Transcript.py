@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import date, datetime
+from arose.meeting_transcripts import TranscriptJob
+from utils import bind_application, save_application
 
 # Check if user is logged in
 if 'logged_in' not in st.session_state or not st.session_state.logged_in:
@@ -13,6 +15,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Load this session's application from the store, saving the previous run's changes
+bind_application()
+
 st.title("Step 1: Initial Call Transcript")
 st.markdown("Record initial call information, capture question set responses, and pre-populate fact-find")
 
@@ -91,10 +96,47 @@ with tab1:
     
     if transcript_file is not None:
         st.success(f"Transcript uploaded: {transcript_file.name}")
-        # In a real implementation, we would process the transcript here
-        st.text_area("Transcript Preview (Auto-Generated)", 
-                    "This is a placeholder for the transcript content that would be extracted from the uploaded file.",
-                    height=150, key="transcript_preview")
+        # Process each new upload on a background thread so the form stays usable meanwhile
+        job = st.session_state.get('transcript_job')
+        if job is None or st.session_state.get('transcript_file_id') != transcript_file.file_id:
+            st.session_state.transcript_file_id = transcript_file.file_id
+            job = st.session_state.transcript_job = TranscriptJob(transcript_file.getvalue(), transcript_file.name).start()
+            st.session_state.transcript_job_applied = False
+        
+        if job.done and job.error is None and not st.session_state.transcript_job_applied:
+            # Pre-populate the question set once; later edits in the form are kept
+            question_set = job.result.question_set()
+            for field, value in question_set.items():
+                st.session_state[field] = value
+            st.session_state.application_data['question_set'].update(question_set)
+            st.session_state.application_data['loan_info'].update(job.result.amounts())
+            st.session_state.transcript_job_applied = True
+        
+        # Poll the job while it runs; once it finishes, rerun the whole page to show and apply its answers
+        @st.fragment(run_every=0.5 if not job.done else None)
+        def transcript_progress():
+            if not job.done:
+                st.progress(job.progress, text=f"Processing transcript... {job.progress:.0%}")
+            elif not st.session_state.transcript_job_applied and job.error is None:
+                st.rerun()
+        
+        transcript_progress()
+        
+        if job.done and job.error is not None:
+            st.error(f"Could not read the transcript: {job.error}")
+        elif job.done:
+            answers = job.result
+            st.text_area("Transcript Preview (Auto-Generated)", answers.preview, height=150, key="transcript_preview")
+            found = {**answers.question_set(), **answers.amounts()}
+            if found:
+                st.markdown("**Answers found in the transcript** (pre-filled in the Initial Question Set):")
+                st.dataframe(pd.DataFrame({
+                    "Question": [field.replace('_', ' ').title() for field in found],
+                    "Answer": [str(value) for value in found.values()],
+                    "From": [answers.evidence.get(field, answers.evidence.get('loan_amount', '')) for field in found]
+                }), use_container_width=True)
+            else:
+                st.info("No question-set answers were found in the transcript.")
     elif use_demo_data:
         st.info("Demo transcript: A simulated transcript would be available here in a real implementation.")
 
@@ -108,7 +150,6 @@ with tab2:
     loan_purpose = st.selectbox(
         "What is the primary purpose of this loan?",
         ["Home Purchase", "Refinance", "Home Improvement", "Debt Consolidation", "Business", "Other"],
-        index=0 if use_demo_data else 0,
         key="loan_purpose"
     )
     
@@ -120,23 +161,22 @@ with tab2:
     property_type = st.selectbox(
         "What type of property are you looking to finance?",
         ["Single Family Home", "Multi-Family Home", "Condominium", "Townhouse", "Commercial Property", "Land"],
-        index=0 if use_demo_data else 0,
         key="property_type"
     )
     
     property_use = st.selectbox(
         "How will the property be used?",
         ["Primary Residence", "Secondary/Vacation Home", "Investment Property", "Business"],
-        index=0 if use_demo_data else 0,
         key="property_use"
     )
     
     # Financial Questions
     st.subheader("Financial Overview")
+    # Seeded through session state, which the transcript also writes, rather than a widget default
+    st.session_state.setdefault("loan_amount_range", demo_loan_amount_range if use_demo_data else "$100,000-$250,000")
     loan_amount_range = st.select_slider(
         "Approximate loan amount needed",
         options=["$50,000-$100,000", "$100,000-$250,000", "$250,000-$500,000", "$500,000-$1,000,000", "Over $1,000,000"],
-        value=demo_loan_amount_range if use_demo_data else "$100,000-$250,000",
         key="loan_amount_range"
     )
     
@@ -266,4 +306,7 @@ if st.button("Save and Continue"):
     st.markdown("✅ Meeting invite prepared")
     st.markdown("✅ Fact-find pre-populated with available information")
     
-    st.balloons() 
\ No newline at end of file
+    st.balloons() 
+
+# Save this run's changes to the application
+save_application()
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import os
 from datetime import datetime
+from utils import bind_application, save_application
 
 # Check if user is logged in
 if 'logged_in' not in st.session_state or not st.session_state.logged_in:
@@ -14,6 +15,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Load this session's application from the store, saving the previous run's changes
+bind_application()
+
 st.title("Step 2: Document Collection Form")
 st.markdown("Collect client documents and answers via form to pre-populate fact-find")
 
@@ -499,4 +503,7 @@ if st.button("Save and Continue"):
         if not all_required_uploaded:
             st.error("Please upload all required documents before proceeding.")
         if not all_form_complete:
-            st.error("Please complete all sections of the form before proceeding.") 
\ No newline at end of file
+            st.error("Please complete all sections of the form before proceeding.") 
+
+# Save this run's changes to the application
+save_application()
@@ -4,6 +4,8 @@ import numpy as np
 import plotly.express as px
 import time
 from datetime import datetime, timedelta
+from arose.meeting_transcripts import IncrementalExtractor, TranscriptJob
+from utils import bind_application, save_application
 
 # Check if user is logged in
 if 'logged_in' not in st.session_state or not st.session_state.logged_in:
@@ -16,6 +18,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Load this session's application from the store, saving the previous run's changes
+bind_application()
+
 st.title("Step 3: Fact-Find Completion")
 st.markdown("Complete the fact-find with client during the scheduled meeting")
 
@@ -81,10 +86,61 @@ with tab1:
     
     if transcript_file is not None:
         st.success(f"Transcript uploaded: {transcript_file.name}")
-        # In a real implementation, we would process the transcript here
-        st.text_area("Transcript Preview (Auto-Generated)", 
-                    "This is a placeholder for the transcript content that would be extracted from the uploaded file.",
-                    height=150, key="meeting_transcript_preview")
+        # Process each new upload on a background thread so the form stays usable meanwhile
+        # A corrected upload reuses the extractor, which re-reads only the chunks that changed
+        if 'meeting_transcript_extractor' not in st.session_state:
+            st.session_state.meeting_transcript_extractor = IncrementalExtractor()
+            st.session_state.meeting_transcript_values = {}
+        job = st.session_state.get('meeting_transcript_job')
+        if job is None or st.session_state.get('meeting_transcript_file_id') != transcript_file.file_id:
+            st.session_state.meeting_transcript_file_id = transcript_file.file_id
+            job = st.session_state.meeting_transcript_job = TranscriptJob(
+                transcript_file.getvalue(), transcript_file.name, st.session_state.meeting_transcript_extractor
+            ).start()
+            st.session_state.meeting_transcript_applied = False
+        
+        if job.done and job.error is None and not st.session_state.meeting_transcript_applied:
+            # Pre-populate only fields the transcript changed since the last revision; other edits in the form are kept
+            applied_values = st.session_state.meeting_transcript_values
+            for section, fields in job.result.fact_find().items():
+                changed = {field: value for field, value in fields.items() if applied_values.get(field) != value}
+                st.session_state.fact_find_data[section].update(changed)
+                for field, value in changed.items():
+                    st.session_state[f"ff_{field}"] = int(value) if isinstance(value, float) else value
+                applied_values.update(changed)
+            st.session_state.meeting_transcript_applied = True
+        
+        # Poll the job while it runs; once it finishes, rerun the whole page to show and apply its answers
+        @st.fragment(run_every=0.5 if not job.done else None)
+        def transcript_progress():
+            if not job.done:
+                st.progress(job.progress, text=f"Processing transcript... {job.progress:.0%}")
+            elif not st.session_state.meeting_transcript_applied and job.error is None:
+                st.rerun()
+        
+        transcript_progress()
+        
+        if job.done and job.error is not None:
+            st.error(f"Could not read the transcript: {job.error}")
+        elif job.done:
+            answers = job.result
+            extractor = job.extractor
+            if answers.revision > 1:
+                st.caption(f"Revision {answers.revision}: re-read {extractor.last_extracted} of "
+                           f"{extractor.last_extracted + extractor.last_reused} transcript chunks")
+            st.text_area("Transcript Preview (Auto-Generated)", answers.preview, height=150, key="meeting_transcript_preview")
+            found = {**answers.question_set(), **answers.amounts()}
+            found.pop('loan_amount_range', None)
+            if found:
+                st.markdown("**Answers found in the transcript** (pre-filled in the fact-find):")
+                st.dataframe(pd.DataFrame({
+                    "Question": [field.replace('_', ' ').title() for field in found],
+                    "Answer": [str(value) for value in found.values()],
+                    "From": [answers.evidence.get(field, '') for field in found],
+                    "Revision": [answers.provenance[field]['revision'] for field in found]
+                }), use_container_width=True)
+            else:
+                st.info("No fact-find answers were found in the transcript.")
 
 with tab2:
     st.header("Client Profile")
@@ -163,17 +219,20 @@ with tab3:
     st.subheader("Property Details")
     col1, col2 = st.columns(2)
     
+    # Fields a meeting transcript can fill are seeded through session state rather than widget defaults
+    st.session_state.setdefault("ff_property_type", property_details.get('property_type') or question_set.get('property_type') or "Single Family Home")
+    st.session_state.setdefault("ff_property_use", property_details.get('property_use') or question_set.get('property_use') or "Primary Residence")
+    st.session_state.setdefault("ff_property_value", int(property_details.get('property_value', 0)))
+    
     with col1:
         property_type = st.selectbox(
             "Property Type",
             ["Single Family Home", "Multi-Family Home", "Condominium", "Townhouse", "Commercial Property", "Land"],
-            index=["Single Family Home", "Multi-Family Home", "Condominium", "Townhouse", "Commercial Property", "Land"].index(property_details.get('property_type', question_set.get('property_type', "Single Family Home"))) if property_details.get('property_type') or question_set.get('property_type') else 0,
             key="ff_property_type"
         )
         property_value = st.number_input(
             "Estimated Property Value ($)", 
             min_value=0, 
-            value=int(property_details.get('property_value', 0)),
             step=10000, 
             key="ff_property_value"
         )
@@ -183,7 +242,6 @@ with tab3:
         property_use = st.selectbox(
             "Property Use",
             ["Primary Residence", "Secondary/Vacation Home", "Investment Property", "Business"],
-            index=["Primary Residence", "Secondary/Vacation Home", "Investment Property", "Business"].index(property_details.get('property_use', question_set.get('property_use', "Primary Residence"))) if property_details.get('property_use') or question_set.get('property_use') else 0,
             key="ff_property_use"
         )
         property_address = st.text_area(
@@ -201,24 +259,25 @@ with tab3:
     st.subheader("Loan Requirements")
     col1, col2 = st.columns(2)
     
+    st.session_state.setdefault("ff_loan_purpose", financial_details.get('loan_purpose') or question_set.get('loan_purpose') or "Home Purchase")
+    st.session_state.setdefault("ff_loan_amount", int(financial_details.get('loan_amount', 0)))
+    st.session_state.setdefault("ff_down_payment", int(financial_details.get('down_payment', 0)))
+    
     with col1:
         loan_purpose = st.selectbox(
             "Loan Purpose",
             ["Home Purchase", "Refinance", "Home Improvement", "Debt Consolidation", "Business", "Other"],
-            index=["Home Purchase", "Refinance", "Home Improvement", "Debt Consolidation", "Business", "Other"].index(financial_details.get('loan_purpose', question_set.get('loan_purpose', "Home Purchase"))) if financial_details.get('loan_purpose') or question_set.get('loan_purpose') else 0,
             key="ff_loan_purpose"
         )
         loan_amount = st.number_input(
             "Requested Loan Amount ($)", 
             min_value=0, 
-            value=int(financial_details.get('loan_amount', 0)),
             step=10000, 
             key="ff_loan_amount"
         )
         down_payment = st.number_input(
             "Down Payment Amount ($)", 
             min_value=0, 
-            value=int(financial_details.get('down_payment', 0)),
             step=5000, 
             key="ff_down_payment"
         )
@@ -269,6 +328,8 @@ with tab4:
             key="ff_job_title"
         )
         
+    st.session_state.setdefault("ff_annual_income", int(employment_details.get('annual_income', 0)))
+    
     with col2:
         years_employed = st.number_input(
             "Years with Current Employer/Business", 
@@ -280,7 +341,6 @@ with tab4:
         annual_income = st.number_input(
             "Annual Income ($)", 
             min_value=0, 
-            value=int(employment_details.get('annual_income', 0)),
             step=5000, 
             key="ff_annual_income"
         )
@@ -524,3 +584,6 @@ if st.button("Save and Complete Fact-Find"):
     st.markdown("✅ Complete client data set created")
     
     st.balloons()
+
+# Save this run's changes to the application
+save_application()
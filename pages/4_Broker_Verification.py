@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
+from utils import bind_application, save_application
 
 st.set_page_config(
     page_title="Broker Verification",
@@ -9,6 +10,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Load this session's application from the store, saving the previous run's changes
+bind_application()
+
 st.title("Step 4: Broker Verification")
 st.markdown("Verify and approve the transcoded client profile")
 
@@ -479,4 +483,7 @@ with tab4:
             # Display a few examples of how the system learned
             st.subheader("Machine Learning Feedback")
             for field in list(edits_made.keys())[:3]:  # Show up to 3 examples
-                st.write(f"✓ Learned that '{edits_made[field]['original']}' should be interpreted as '{edits_made[field]['new']}' for field '{field}'") 
\ No newline at end of file
+                st.write(f"✓ Learned that '{edits_made[field]['original']}' should be interpreted as '{edits_made[field]['new']}' for field '{field}'") 
+
+# Save this run's changes to the application
+save_application()
@@ -9,7 +9,17 @@ from sklearn.pipeline import Pipeline
 from sklearn.inspection import permutation_importance
 import joblib
 import os
+from dataclasses import asdict
 from datetime import datetime
+from arose.batch import build_matcher
+from arose.criteria import load_compiled_criteria, with_overrides
+from arose.llm_cache import ResponseCache
+from arose.matching import BORROWING_TYPE_SECTIONS, DEFAULT_BORROWING_TYPE, hard_constraint_columns, match_client
+from arose.providers import OpenAIProvider
+from arose.ranges import build_range_indexes
+from arose.search import build_search_index, load_embedder
+from arose.transcripts import TranscriptIngestor, criteria_overrides, transcript_paths
+from utils import bind_application, save_application
 
 # Check if user is logged in
 if 'logged_in' not in st.session_state or not st.session_state.logged_in:
@@ -22,6 +32,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Load this session's application from the store, saving the previous run's changes
+bind_application()
+
 st.title("Step 5: Lender Matching")
 st.markdown("Match the client profile to lenders with probability of success")
 
@@ -47,8 +60,8 @@ def load_lender_criteria_csv():
     csv_path = "data/lender_criteria.csv"
     
     try:
-        # Try to load the CSV file
-        return pd.read_csv(csv_path)
+        # Load the compiled criteria store (only recompiled when the CSV changes)
+        return load_compiled_criteria(csv_path)
     except FileNotFoundError:
         # If file doesn't exist, create a sample DataFrame with the same structure
         # as the attached CSV but with fewer rows for demonstration
@@ -67,11 +80,29 @@ def load_lender_criteria_csv():
         }
         
         df = pd.DataFrame(sample_data)
+        
+        # Write the same two-row header (section row above field row) as the real file
+        sections = ["", "Coverage", "", "", "Regulated Bridging", "", "", ""]
+        df.columns = pd.MultiIndex.from_arrays([sections, list(sample_data.keys())])
         df.to_csv(csv_path, index=False)
-        return df
+        return load_compiled_criteria(csv_path)
+
+# Build the matching indexes once per criteria version and reuse them across reruns
+@st.cache_resource
+def load_lender_indexes(source_sha256, _lender_criteria):
+    matcher = build_matcher(_lender_criteria)
+    return matcher.matrix, matcher.flag_index, build_range_indexes(matcher.matrix)
+
+# Transcript ingestion results, keyed by transcript content; shared across sessions
+@st.cache_resource
+def load_transcript_cache():
+    return ResponseCache()
 
 # Load lender criteria
-lender_criteria_df = load_lender_criteria_csv()
+lender_criteria = load_lender_criteria_csv()
+lender_criteria_df = lender_criteria.frame
+# "Section: Field" label of every criteria column, for showing overrides
+criteria_labels = {entry['column']: f"{entry['section']}: {entry['field']}" for entry in lender_criteria.schema}
 
 # Generate demo client profile if using demo data
 if use_demo_data:
@@ -86,6 +117,8 @@ if use_demo_data:
     # Demo loan requirements
     demo_loan_requirements = {
         'loan_purpose': "Home Purchase",
+        'borrowing_type': "Regulated Bridging",
+        'borrower_type': "Individuals",
         'loan_amount': 360000,
         'down_payment': 90000,
         'loan_term_preference': "30 years"
@@ -96,7 +129,8 @@ if use_demo_data:
         'property_type': "Single Family Home",
         'property_value': 450000,
         'property_use': "Primary Residence",
-        'property_location': "England"
+        'property_location': "England",
+        'security_type': "Residential"
     }
     
     # Demo financial profile
@@ -140,6 +174,8 @@ with client_col1:
     
     st.subheader("Loan Requirements")
     st.write(f"**Loan Purpose:** {loan_requirements.get('loan_purpose', '')}")
+    st.write(f"**Borrowing Type:** {loan_requirements.get('borrowing_type', DEFAULT_BORROWING_TYPE)}")
+    st.write(f"**Borrower Type:** {loan_requirements.get('borrower_type', '')}")
     st.write(f"**Loan Amount:** ${loan_requirements.get('loan_amount', 0):,}")
     st.write(f"**Down Payment:** ${loan_requirements.get('down_payment', 0):,}")
     st.write(f"**Preferred Term:** {loan_requirements.get('loan_term_preference', '')}")
@@ -150,6 +186,7 @@ with client_col2:
     st.write(f"**Property Value:** ${property_details.get('property_value', 0):,}")
     st.write(f"**Property Use:** {property_details.get('property_use', '')}")
     st.write(f"**Property Location:** {property_details.get('property_location', 'England')}")
+    st.write(f"**Security Type:** {property_details.get('security_type', '')}")
     
     st.subheader("Financial Profile")
     st.write(f"**Employment:** {financial_profile.get('employment_status', '')}")
@@ -172,6 +209,121 @@ st.download_button(
     mime="text/csv"
 )
 
+# Appetite stated on lender calls, with the criteria changes it supports; the sheet itself is not changed
+def ingest_transcripts(provider=None):
+    ingestor = TranscriptIngestor(provider=provider, cache=load_transcript_cache())
+    st.session_state.lender_matching['unstructured_criteria_results'] = {
+        lender: {
+            'overrides': [asdict(override) for override in criteria_overrides(signals, lender_criteria)],
+            'signals': asdict(signals),
+        }
+        for lender, signals in ingestor.ingest_all(transcript_paths()).items()
+    }
+
+st.header("Lender Call Transcripts")
+st.info("Appetite and policy stated by lenders on recorded calls, read from the transcripts in the data directory.")
+
+# The rule-based reading is cached per transcript, so this is a cache lookup after the first run;
+# results saved before overrides became proposals are read again
+stored_results = st.session_state.lender_matching['unstructured_criteria_results']
+if not stored_results or any(not isinstance(result['overrides'], list) for result in stored_results.values()):
+    ingest_transcripts()
+
+if 'openai_api_key' in st.session_state and st.button("Re-read Transcripts with OpenAI"):
+    with st.spinner("Extracting appetite from the transcripts..."):
+        ingest_transcripts(OpenAIProvider(st.session_state.openai_api_key, cache=load_transcript_cache()))
+
+transcript_results = st.session_state.lender_matching['unstructured_criteria_results']
+if transcript_results:
+    st.dataframe(pd.DataFrame([
+        {
+            "Lender": lender,
+            "Max LTV (%)": result['signals']['max_ltv'],
+            "Preferred Products": ", ".join(result['signals']['preferred_products']),
+            "Regions": ", ".join(result['signals']['regions']),
+            "Turnaround (days)": result['signals']['turnaround_days'],
+            "Source": result['signals']['source'],
+        }
+        for lender, result in transcript_results.items()
+    ]), use_container_width=True)
+    for lender, result in transcript_results.items():
+        with st.expander(f"{lender} - supporting quotes"):
+            for signal, quote, *subject in result['signals']['evidence']:
+                about = f" ({subject[0]})" if subject and subject[0] else ""
+                st.write(f"- **{signal}**{about}: \"{quote}\"")
+else:
+    st.write("No lender call transcripts found.")
+
+proposed_changes = [
+    {
+        "Lender": lender,
+        "Criterion": criteria_labels.get(override['column'], override['column']),
+        "Sheet": override['sheet_value'] or "(blank)",
+        "Stated on Call": override['value'] if isinstance(override['value'], str) else f"{override['value']:g}",
+        "Quote": override['quote'],
+        "Source": result['signals']['source'],
+    }
+    for lender, result in transcript_results.items()
+    for override in result['overrides']
+]
+applied_lenders = []
+if proposed_changes:
+    st.subheader("Proposed Criteria Changes")
+    st.caption(
+        "Changes the calls support: a blank or TBC product or region flag the lender says it covers, or a lower "
+        "LTV cap it stated for a product. A stated Y or N and a lower cap in the sheet are never changed."
+    )
+    st.dataframe(pd.DataFrame(proposed_changes), use_container_width=True)
+    applied_lenders = st.multiselect(
+        "Apply the proposed changes for these lenders when matching",
+        sorted({change["Lender"] for change in proposed_changes}),
+        default=[],
+        key="transcript_override_lenders",
+    )
+applied_overrides = {
+    lender: {override['column']: override['value'] for override in transcript_results[lender]['overrides']}
+    for lender in applied_lenders
+}
+
+# Match against the sheet, amended only by the call changes the broker chose to apply; the indexes
+# are built once per criteria and overrides version and reused across reruns
+matching_criteria = with_overrides(lender_criteria, applied_overrides)
+lender_matrix, flag_index, range_indexes = load_lender_indexes(matching_criteria.source_sha256, matching_criteria)
+
+# Embedding model for search, loaded (and downloaded if need be) once per process
+@st.cache_resource(show_spinner="Loading the search model...")
+def load_search_embedder():
+    return load_embedder()
+
+# Search index over transcripts and criteria notes, rebuilt only when the criteria or a transcript's
+# modification time or size changes, so reruns neither re-hash the transcripts nor touch the index
+@st.cache_resource(max_entries=1, show_spinner="Indexing lender transcripts...")
+def load_search_index(source_sha256, transcript_stamps, _lender_criteria):
+    return build_search_index([path for path, _, _ in transcript_stamps], _lender_criteria, embedder=load_search_embedder())
+
+def transcript_stamps():
+    stamps = []
+    for path in transcript_paths():
+        stat = os.stat(path)
+        stamps.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+st.header("Search Lender Knowledge")
+search_index = load_search_index(lender_criteria.source_sha256, transcript_stamps(), lender_criteria)
+
+search_query = st.text_input(
+    "Ask about lender appetite and criteria",
+    placeholder="e.g. who does revolving facilities for first-time developers?",
+    key="lender_search_query"
+)
+if search_query:
+    search_hits = search_index.search(search_query, k=5)
+    if not search_hits:
+        st.write("No matching passages.")
+    for hit in search_hits:
+        with st.expander(f"{hit.passage.lender} - {hit.passage.kind} ({hit.passage.location})"):
+            st.text(hit.passage.text)
+
 # Extract client data for matching
 def extract_client_data():
     # Convert credit score range to numeric value
@@ -204,6 +356,9 @@ def extract_client_data():
         "annual_income": financial_profile.get('annual_income', 0),
         "employment_years": financial_profile.get('years_employed', 0),
         "loan_amount": loan_requirements.get('loan_amount', 0),
+        "borrowing_type": loan_requirements.get('borrowing_type', DEFAULT_BORROWING_TYPE),
+        "borrower_type": loan_requirements.get('borrower_type'),
+        "security_type": property_details.get('security_type'),
         "bankruptcy": financial_profile.get('bankruptcy', 'No') != "No",
         "self_employed": financial_profile.get('employment_status', '') == "Self-Employed",
         "property_location": property_location
@@ -211,6 +366,48 @@ def extract_client_data():
     
     return client_data
 
+# What-if analysis: re-rank instantly as the broker moves the sliders
+st.header("What-If Analysis")
+st.info("Adjust the deal to see which lenders' stated loan range and LTV cap accept it.")
+
+what_if_client = extract_client_data()
+what_if_col1, what_if_col2 = st.columns(2)
+
+with what_if_col1:
+    borrowing_types = list(BORROWING_TYPE_SECTIONS.keys())
+    what_if_borrowing_type = st.selectbox(
+        "Borrowing Type",
+        borrowing_types,
+        index=borrowing_types.index(what_if_client["borrowing_type"]) if what_if_client["borrowing_type"] in borrowing_types else 0,
+        key="what_if_borrowing_type"
+    )
+    what_if_loan_amount = st.slider(
+        "Loan Amount (£)",
+        min_value=0,
+        max_value=10000000,
+        value=min(int(what_if_client["loan_amount"]), 10000000),
+        step=5000,
+        key="what_if_loan_amount"
+    )
+
+with what_if_col2:
+    what_if_ltv = st.slider(
+        "LTV (%)",
+        min_value=0,
+        max_value=100,
+        value=min(int(round(what_if_client["ltv_ratio"])), 100),
+        key="what_if_ltv"
+    )
+
+what_if_section = BORROWING_TYPE_SECTIONS[what_if_borrowing_type]
+if what_if_section in range_indexes:
+    accepting_lenders = range_indexes[what_if_section].accepting(what_if_loan_amount, ltv=what_if_ltv)
+    st.metric(f"Lenders Accepting ({what_if_section})", len(accepting_lenders))
+    if len(accepting_lenders) > 0:
+        st.write(", ".join(accepting_lenders))
+else:
+    st.warning(f"The lender criteria have no {what_if_section} section.")
+
 # Run Model button
 if st.button("Run Lender Matching Model"):
     with st.spinner("Running lender matching model..."):
@@ -225,103 +422,26 @@ if st.button("Run Lender Matching Model"):
         })
         st.dataframe(client_data_df, use_container_width=True)
         
-        # Match client against lender criteria
-        match_results = {}
+        # Rename the first (lender name) column to 'lender_name'; rename copies, so the
+        # cached criteria frame is left untouched
+        lender_criteria_df = lender_criteria_df.rename(columns={lender_criteria_df.columns[0]: 'lender_name'})
         
-        # Rename first column to 'lender_name' if it's not already named that
-        if 'lender_name' not in lender_criteria_df.columns and 'Lender' in lender_criteria_df.columns:
-            lender_criteria_df = lender_criteria_df.rename(columns={'Lender': 'lender_name'})
+        # Rule out lenders that reject the client's region, borrower, borrowing or security type
+        eligible, eliminated = flag_index.prefilter(hard_constraint_columns(lender_criteria.index, client_data))
         
-        # Check if lender_name column exists
-        if 'lender_name' not in lender_criteria_df.columns:
-            # Use the first column as lender_name
-            lender_criteria_df['lender_name'] = lender_criteria_df.iloc[:, 0]
+        if eliminated:
+            with st.expander(f"{len(eliminated)} lenders ruled out by hard criteria"):
+                st.dataframe(pd.DataFrame({
+                    "Lender": list(eliminated.keys()),
+                    "Ruled Out By": [", ".join(columns) for columns in eliminated.values()]
+                }), use_container_width=True)
         
-        # Process each lender
-        for _, lender_row in lender_criteria_df.iterrows():
-            try:
-                lender_name = lender_row["lender_name"]
-                
-                # Initialize match score
-                match_score = 0
-                max_possible_score = 0
-                
-                # Check location match
-                location_match = False
-                property_location = client_data["property_location"]
-                
-                # Check if the property location column exists in the lender criteria
-                if property_location in lender_criteria_df.columns:
-                    if lender_row.get(property_location) == 'Y':
-                        location_match = True
-                        match_score += 1
-                else:
-                    # Default to True if we can't check
-                    location_match = True
-                
-                max_possible_score += 1
-                
-                # Check loan amount within range
-                loan_amount_match = True
-                min_loan_size_col = next((col for col in lender_criteria_df.columns if 'Minimum Loan Size' in col or 'Min Loan' in col), None)
-                max_loan_size_col = next((col for col in lender_criteria_df.columns if 'Maximum Loan Size' in col or 'Max Loan' in col), None)
-                
-                if min_loan_size_col and max_loan_size_col:
-                    min_loan = lender_row.get(min_loan_size_col)
-                    max_loan = lender_row.get(max_loan_size_col)
-                    
-                    # Convert to numeric if possible
-                    try:
-                        min_loan = float(str(min_loan).replace(',', '').replace('£', ''))
-                        max_loan = float(str(max_loan).replace(',', '').replace('£', ''))
-                        
-                        if not (pd.isna(min_loan) or pd.isna(max_loan)):
-                            loan_amount_match = min_loan <= client_data["loan_amount"] <= max_loan
-                            if loan_amount_match:
-                                match_score += 1
-                    except (ValueError, TypeError):
-                        # If conversion fails, assume it matches
-                        pass
-                
-                max_possible_score += 1
-                
-                # Check LTV ratio
-                ltv_match = True
-                max_ltv_col = next((col for col in lender_criteria_df.columns if 'Max LTV' in col), None)
-                
-                if max_ltv_col:
-                    max_ltv = lender_row.get(max_ltv_col)
-                    
-                    # Convert to numeric if possible
-                    try:
-                        max_ltv = float(str(max_ltv).replace('%', ''))
-                        
-                        if not pd.isna(max_ltv):
-                            ltv_match = client_data["ltv_ratio"] <= max_ltv
-                            if ltv_match:
-                                match_score += 1
-                    except (ValueError, TypeError):
-                        # If conversion fails, assume it matches
-                        pass
-                
-                max_possible_score += 1
-                
-                # Calculate match percentage
-                match_percentage = (match_score / max_possible_score) * 100 if max_possible_score > 0 else 0
-                
-                # Store match results
-                match_results[lender_name] = {
-                    "match_percentage": match_percentage,
-                    "location_match": location_match,
-                    "loan_amount_match": loan_amount_match,
-                    "ltv_match": ltv_match
-                }
-                
-            except Exception as e:
-                st.error(f"Error processing lender {lender_row.get('lender_name', 'unknown')}: {str(e)}")
+        # Score the remaining lenders in one vectorised pass
+        ranked_lenders = match_client(lender_matrix, client_data, eligible=flag_index.to_mask(eligible))
+        match_results = ranked_lenders.set_index("lender_name").to_dict("index")
         
-        # Sort lenders by match percentage
-        sorted_lenders = sorted(match_results.items(), key=lambda x: x[1]["match_percentage"], reverse=True)
+        # Lenders sorted by match percentage
+        sorted_lenders = list(match_results.items())
         
         # Display top matching lenders
         st.header("Top Matching Lenders")
@@ -359,6 +479,11 @@ if st.button("Run Lender Matching Model"):
                     st.write(f"**Loan Amount Match:** {'✅' if match['loan_amount_match'] else '❌'}")
                     st.write(f"**LTV Match:** {'✅' if match['ltv_match'] else '❌'}")
                     
+                    if lender in applied_overrides:
+                        st.write("**Applied from Call:**")
+                        for column, value in applied_overrides[lender].items():
+                            st.write(f"- {criteria_labels.get(column, column)}: {value}")
+                    
                     # Get lender details
                     lender_details = lender_criteria_df[lender_criteria_df['lender_name'] == lender]
                     if not lender_details.empty:
@@ -399,6 +524,10 @@ if st.button("Run Lender Matching Model"):
         
         # Save results to session state
         st.session_state.lender_matching['matched_lenders'] = sorted_lenders
+        st.session_state.lender_matching['research_matrix_results'] = {'eliminated_lenders': eliminated}
         
         st.success("Lender matching completed successfully!")
-        st.balloons() 
\ No newline at end of file
+        st.balloons() 
+
+# Save this run's changes to the application
+save_application()
@@ -5,6 +5,7 @@ import plotly.express as px
 from datetime import datetime, timedelta
 import time
 import random
+from utils import bind_application, save_application
 
 st.set_page_config(
     page_title="Client Communication",
@@ -12,6 +13,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# Load this session's application from the store, saving the previous run's changes
+bind_application()
+
 st.title("Step 8: Client Communication")
 st.markdown("Present lender feedback to client and send templated email")
 
@@ -462,4 +466,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 # Final message
 st.success("🎉 Congratulations! You have successfully completed the entire loan origination process.")
-st.info("The client has been informed of the available loan options and next steps. Follow up with the client to finalize their preferred option.") 
\ No newline at end of file
+st.info("The client has been informed of the available loan options and next steps. Follow up with the client to finalize their preferred option.") 
+
+# Save this run's changes to the application
+save_application()
@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from arose.async_extraction import BANK_STATEMENT, UTILITY_BILL, KYCDocument, run_kyc_pipeline_sync
+
+# How long the mock server takes over each extraction
+EXTRACTION_SECONDS = 0.3
+
+
+class MockOpenAI(BaseHTTPRequestHandler):
+    """
+    A chat completions endpoint that answers every prompt with a small JSON
+    object, rejects the first utility bill extraction with a 429 and logs
+    each request's kind and start and end times.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        kind = next((t for t in (BANK_STATEMENT, UTILITY_BILL) if f"this {t} document" in prompt), "verification")
+
+        with server.lock:
+            rate_limited = kind == UTILITY_BILL and not server.rate_limited
+            server.rate_limited = server.rate_limited or rate_limited
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        started = time.monotonic()
+        try:
+            if rate_limited:
+                self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"retry-after-ms": "50"})
+                status = 429
+            else:
+                if kind != "verification":
+                    time.sleep(EXTRACTION_SECONDS)
+                content = json.dumps({"document_type": kind, "extracted_data": {}, "missing_fields": [], "warnings": []})
+                self._reply(200, {
+                    "id": "mock", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                })
+                status = 200
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+                server.requests.append((kind, status, started, time.monotonic()))
+
+    def _reply(self, status, payload, headers=()):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def mock_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockOpenAI)
+    server.lock = threading.Lock()
+    server.rate_limited = False
+    server.in_flight = server.max_in_flight = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_pipeline_against_mock_server(mock_server):
+    documents = [
+        KYCDocument("statement.pdf", BANK_STATEMENT, "Account holder: Jane Doe"),
+        KYCDocument("bill.pdf", UTILITY_BILL, "Supply address: 1 High Street"),
+    ]
+    result = run_kyc_pipeline_sync(documents, "test-key", base_url=f"http://127.0.0.1:{mock_server.server_port}/v1")
+
+    assert result.errors == {}
+    assert set(result.extracted) == {"statement.pdf", "bill.pdf"}
+    assert result.verification["document_type"] == "verification"
+
+    requests = mock_server.requests
+    # The 429 was retried and the retry succeeded
+    assert [status for kind, status, _, _ in requests if kind == UTILITY_BILL] == [429, 200]
+    # The two extractions were in flight at the same time
+    assert mock_server.max_in_flight >= 2
+    # Verification started only after both extractions had finished
+    extractions_done = max(end for kind, status, _, end in requests if kind != "verification" and status == 200)
+    [verification_started] = [start for kind, _, start, _ in requests if kind == "verification"]
+    assert verification_started >= extractions_done
@@ -0,0 +1,24 @@
+import pytest
+
+from arose.meeting_transcripts import extract_answers
+
+
+@pytest.mark.parametrize("line, field, value", [
+    ("My salary is 85,000 a year", "annual_income", 85000.0),
+    ("We would like to borrow 250,000 over 25 years", "loan_amount", 250000.0),
+    ("The purchase price is 400,000", "property_value", 400000.0),
+    ("We can put down 40,000 from savings", "down_payment", 40000.0),
+])
+def test_bare_grouped_amount_after_keyword(line, field, value):
+    assert getattr(extract_answers([line]), field) == value
+
+
+def test_bare_number_away_from_keywords_is_ignored():
+    answers = extract_answers(["Account reference 12,345,678 was opened in 2019",
+                               "I earn a decent amount from the business, my pension reference number is 45,000"])
+    assert answers.amounts() == {}
+
+
+def test_marked_amount_keeps_the_wider_keyword_window():
+    answers = extract_answers(["My salary, before the bonus the firm pays out each March, comes to £85k"])
+    assert answers.annual_income == 85000.0
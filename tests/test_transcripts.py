@@ -0,0 +1,76 @@
+import pytest
+
+from arose.criteria import load_compiled_criteria
+from arose.matching import MAX_LTV_FIELDS
+from arose.transcripts import AppetiteSignals, Turn, criteria_overrides, extract_chunk_signals
+
+
+@pytest.fixture(scope="module")
+def criteria():
+    return load_compiled_criteria("data/lender_criteria.csv")
+
+
+def _row(criteria, lender):
+    return criteria.frame.index[criteria.frame[criteria.schema[0]["column"]] == lender][0]
+
+
+def _flag(criteria, lender, field):
+    column = criteria.index.column("Borrowing Type", field)
+    return column, criteria.frame.at[_row(criteria, lender), column]
+
+
+def _cap(criteria, lender, section):
+    column = criteria.index.find(section, *MAX_LTV_FIELDS)
+    return column, criteria.values.at[_row(criteria, lender), column]
+
+
+@pytest.mark.parametrize("sentence", [
+    "We don't do commercial bridging any more.",
+    "Hopefully we might go semi commercial, but that'll be next year.",
+    "Other lenders do development finance, we tend to stay away.",
+    "I've got a high net worth client in Essex.",
+])
+def test_mentions_are_not_appetite(sentence):
+    signals = extract_chunk_signals([Turn(0, "Speaker 2", sentence)])
+    assert signals["preferred_products"] == [] and signals["regions"] == []
+
+
+def test_ltv_is_tied_to_the_product_in_its_sentence():
+    signals = extract_chunk_signals([Turn(0, "Speaker 2",
+                                          "On our light refurb product we do 80% net day one. "
+                                          "In theory we could do 90% net day one on purchase price.")])
+    assert signals["max_ltv"] == 90
+    assert signals["product_ltvs"] == {"Refurbishment Loans": 80}
+
+
+def test_other_lenders_figures_are_ignored():
+    signals = extract_chunk_signals([Turn(0, "Speaker 2", "Other lenders will give 90% loan to value on bridging.")])
+    assert signals["max_ltv"] is None and signals["product_ltvs"] == {}
+
+
+def test_stated_flags_and_lower_caps_stand(criteria):
+    # Lender 11's sheet says N to development exit and BTL term
+    assert _flag(criteria, "Lender 11", "Development Exit")[1] == "N"
+    signals = AppetiteSignals("Lender 11", preferred_products=["Development Exit", "Term Loans"],
+                              product_ltvs={"Development Exit": 95})
+    assert criteria_overrides(signals, criteria) == []
+
+
+def test_ltv_only_tightens_offered_products(criteria):
+    column, cap = _cap(criteria, "Lender 49", "Development Exit")
+    signals = AppetiteSignals("Lender 49", product_ltvs={"Development Exit": cap + 10})
+    assert criteria_overrides(signals, criteria) == []
+
+    signals = AppetiteSignals("Lender 49", product_ltvs={"Development Exit": cap - 5})
+    [override] = criteria_overrides(signals, criteria)
+    assert (override.column, override.value) == (column, cap - 5)
+
+
+def test_blank_flag_is_filled_and_then_offered(criteria):
+    flag, text = _flag(criteria, "Lender 9", "Development Exit")
+    assert text != text  # blank in the sheet
+    signals = AppetiteSignals("Lender 9", preferred_products=["Development Exit"],
+                              evidence=[["preferred_products", "we do development exit", "Development Exit"]])
+    [override] = criteria_overrides(signals, criteria)
+    assert (override.column, override.value, override.sheet_value) == (flag, "Y", None)
+    assert override.quote == "we do development exit"
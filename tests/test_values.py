@@ -0,0 +1,23 @@
+import math
+
+import pytest
+
+from arose.values import GBP, PERCENT, PERCENT_PM, TEXT, parse_cell
+
+
+@pytest.mark.parametrize("cell", ["%", "N/A %", "tbc %"])
+def test_percent_sign_without_number_is_text(cell):
+    parsed = parse_cell(cell)
+    assert parsed.unit == TEXT
+    assert math.isnan(parsed.value)
+
+
+@pytest.mark.parametrize("cell, value, unit", [
+    ("£3m", 3e6, GBP),
+    ("90% Net", 90.0, PERCENT),
+    ("0.85% pm", 0.85, PERCENT_PM),
+    ("1-1.3%", 1.0, PERCENT),
+])
+def test_parse_cell(cell, value, unit):
+    parsed = parse_cell(cell)
+    assert (parsed.value, parsed.unit) == (value, unit)
@@ -1,6 +1,11 @@
 import os
+import atexit
 import streamlit as st
 from dotenv import load_dotenv
+from arose.app_store import STEP_SCHEMAS, encode, new_application_id, open_store
+
+# Session state kept when switching application; everything else belongs to the application left
+SESSION_KEYS_KEPT = {"logged_in", "openai_api_key", "anthropic_api_key", "application_picker"}
 
 def load_api_keys():
     """
@@ -12,15 +17,171 @@ def load_api_keys():
     
     # Get API keys from environment variables
     openai_api_key = os.getenv("OPENAI_API_KEY")
+    anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
     
     # Store API keys in session state if they exist
     if openai_api_key:
         st.session_state.openai_api_key = openai_api_key
+    if anthropic_api_key:
+        st.session_state.anthropic_api_key = anthropic_api_key
     
     # Return status of API keys
     return {
-        "openai_api_key": openai_api_key is not None
+        "openai_api_key": openai_api_key is not None,
+        "anthropic_api_key": anthropic_api_key is not None
+    }
+
+@st.cache_resource
+def application_store():
+    """
+    The application store, shared by every session of this server so brokers
+    can open each other's applications. AROSE_STORE_URL selects the database
+    (a SQLite path or any SQLAlchemy URL); data/app_store.sqlite by default.
+    """
+    load_dotenv()
+    store = open_store(os.getenv("AROSE_STORE_URL"))
+    atexit.register(store.close)
+    return store
+
+def _client_name():
+    """Client name from the furthest step that has one, for labelling the application"""
+    for step, section in (("verified_profile", "client_profile"), ("fact_find_data", "client_profile"),
+                          ("form_responses", "personal_details"), ("application_data", "personal_info")):
+        details = (st.session_state.get(step) or {}).get(section) or {}
+        name = " ".join(part for part in (details.get("first_name"), details.get("last_name")) if part)
+        if name:
+            return name
+    return ""
+
+def load_application(application_id):
+    """
+    Put the application's stored steps into this session's state
+    """
+    store = application_store()
+    steps = store.load(application_id)
+    for step, sections in steps.items():
+        st.session_state[step] = sections
+    st.session_state.application_id = application_id
+    st.session_state.application_name = store.get_application(application_id)["name"]
+    st.session_state.application_stored = True
+    # Encoded sections as stored, to tell which ones later runs change
+    st.session_state.application_saved = {
+        (step, section): encode(value) for step, sections in steps.items() for section, value in sections.items()
+    }
+    st.query_params["application"] = application_id
+
+def _start_application():
+    """
+    Begin a new application in this session without adding it to the store;
+    save_application adds it once something has been entered
+    """
+    st.session_state.application_id = new_application_id()
+    st.session_state.application_name = ""
+    st.session_state.application_stored = False
+    st.session_state.application_saved = {}
+    st.query_params.pop("application", None)
+
+def save_application():
+    """
+    Write the step sections changed since the last load or save through the store.
+    The store batches the writes, so calling this on every rerun is cheap.
+    """
+    application_id = st.session_state.get("application_id")
+    if application_id is None:
+        return
+    store = application_store()
+    saved = st.session_state.application_saved
+    current = {}
+    for step, schema in STEP_SCHEMAS.items():
+        sections = st.session_state.get(step)
+        if not isinstance(sections, dict):
+            continue
+        for section in schema.sections:
+            if section in sections:
+                current[(step, section)] = sections[section]
+    encoded = {key: encode(value) for key, value in current.items()}
+    changed = [key for key in current if saved.get(key) != encoded[key]]
+
+    if not st.session_state.application_stored:
+        # Sections seen for the first time hold what the pages start with; the
+        # application is stored only once one of them changes, with all of them
+        if not any(key in saved for key in changed):
+            saved.update((key, encoded[key]) for key in changed)
+            return
+        store.create_application(application_id=application_id)
+        st.session_state.application_stored = True
+        st.query_params["application"] = application_id
+        changed = list(current)
+
+    for key in changed:
+        store.write(application_id, *key, current[key])
+        saved[key] = encoded[key]
+
+    if not st.session_state.application_name:
+        name = _client_name()
+        if name:
+            store.rename_application(application_id, name)
+            st.session_state.application_name = name
+
+def _switch_application(application_id=None):
+    """Save this session's application and open application_id, or a new one if None"""
+    save_application()
+    application_store().flush()
+    for key in list(st.session_state.keys()):
+        if key not in SESSION_KEYS_KEPT:
+            del st.session_state[key]
+    if application_id is None:
+        _start_application()
+    else:
+        load_application(application_id)
+
+def _open_picked_application():
+    _switch_application(st.session_state.application_picker)
+
+def _new_application():
+    _switch_application()
+
+def bind_application():
+    """
+    Tie this session to an application in the store and show the application
+    picker in the sidebar. Call it at the top of a page, before the page reads
+    its step state: the first call loads the application named in the URL (or
+    starts a new one, stored once something is entered), later calls save
+    what the previous run changed.
+    Returns the application ID.
+    """
+    store = application_store()
+    requested = st.query_params.get("application")
+    current = st.session_state.get("application_id")
+    if requested and requested != current and store.get_application(requested):
+        # A shared link to another application
+        if current is not None:
+            _switch_application(requested)
+        else:
+            load_application(requested)
+    elif current is None:
+        # A new session starts its own application; other brokers' cases open only by link or the picker
+        _start_application()
+    else:
+        save_application()
+        if not requested and st.session_state.application_stored:
+            st.query_params["application"] = current
+
+    application_id = st.session_state.application_id
+    applications = store.list_applications()
+    labels = {
+        application["application_id"]: f"{application['name'] or 'Untitled'} ({application['application_id'][:6]})"
+        for application in applications
     }
+    if not st.session_state.application_stored:
+        labels = {application_id: "New application (not saved yet)", **labels}
+    if st.session_state.get("application_picker") != application_id:
+        st.session_state.application_picker = application_id
+    st.sidebar.selectbox("Application", list(labels), format_func=labels.get, key="application_picker",
+                         on_change=_open_picked_application)
+    st.sidebar.button("New Application", on_click=_new_application)
+    st.sidebar.caption(f"Application ID: {application_id}")
+    return application_id
 
 def ensure_dir(directory):
     """